@@ -1 +1,32 @@
-"""Main module."""
+"""Main module.
+
+:func:`lookup` uses the database built by :mod:`browscapy.build`, opened on
+the first lookup or by :func:`preload`.
+"""
+from typing import TYPE_CHECKING
+
+from .lazy import LazyClassifier
+
+if TYPE_CHECKING:
+    from .classifier import Classifier
+
+#: LazyClassifier: Classifier of the user's database.
+CLASSIFIER = LazyClassifier()
+lookup = CLASSIFIER.lookup  # pylint: disable=invalid-name
+preload = CLASSIFIER.preload  # pylint: disable=invalid-name
+
+
+def __getattr__(name: str) -> object:
+    """Import :class:`~browscapy.classifier.Classifier` when first used.
+
+    Its backends and stores import sqlite3 and mmap, which programs only
+    calling :func:`lookup` need at the first lookup, if at all.
+    """
+    if name == 'Classifier':
+        # pylint: disable=import-outside-toplevel,redefined-outer-name
+        from .classifier import Classifier
+        return Classifier
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+__all__ = ('CLASSIFIER', 'Classifier', 'LazyClassifier', 'lookup', 'preload')
@@ -0,0 +1,160 @@
+"""Lookup backend scanning user agents with an Aho-Corasick automaton.
+
+A pattern can only match a user agent that contains all of its literal
+segments (the text between wildcards). An automaton of all literal segments
+finds the ones in a user agent in a single pass, whose cost depends on the
+user agent length but not on the number of patterns. Only the patterns whose
+segments were all found are then matched, which handles patterns starting
+with ``*`` as well as the others.
+
+:class:`AhoCorasick` has the same lookup API as
+:class:`~browscapy.frozen.FrozenTree`, so both can be used by
+:class:`~browscapy.classifier.Classifier`.
+"""
+import re
+from collections import Counter, deque
+from typing import (Deque, Dict, FrozenSet, Iterable, List, Optional, Set,
+                    Tuple, cast)
+
+from .frozen import FrozenTree
+from .matcher import Pattern, has_precedence
+
+_LITERAL = re.compile('[^*?]+')
+
+
+class Automaton:
+    """Find which of many strings occur in a text, in a single pass.
+
+    Attributes:
+        transitions (List[Dict[str, int]]): Next state of each state by
+            character. State 0 is the initial one.
+        failures (List[int]): State of the longest proper suffix of each
+            state's text that is also a prefix of some string.
+        outputs (List[Tuple[int, ...]]): Indexes of the strings ending at
+            each state, including the ones reached by failures.
+
+    """
+
+    def __init__(self, strings: Iterable[str]) -> None:
+        """Build the automaton of non-empty strings, indexed in order."""
+        self.transitions: List[Dict[str, int]] = [{}]
+        self.failures = [0]
+        self.outputs: List[Tuple[int, ...]] = [()]
+        for index, string in enumerate(strings):
+            state = 0
+            for char in string:
+                next_state = self.transitions[state].get(char)
+                if next_state is None:
+                    next_state = self.transitions[state][char] = \
+                        len(self.transitions)
+                    self.transitions.append({})
+                    self.failures.append(0)
+                    self.outputs.append(())
+                state = next_state
+            self.outputs[state] += (index,)
+        self._set_failures()
+
+    def _set_failures(self) -> None:
+        """Link each state to its failure state, in breadth-first order."""
+        queue: Deque[int] = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                failure = self.failures[state]
+                while failure and char not in self.transitions[failure]:
+                    failure = self.failures[failure]
+                failure = self.transitions[failure].get(char, 0)
+                self.failures[next_state] = failure
+                self.outputs[next_state] += self.outputs[failure]
+
+    def search(self, text: str) -> Set[int]:
+        """Return the indexes of the strings that occur in text."""
+        transitions, failures, outputs = (self.transitions, self.failures,
+                                          self.outputs)
+        found: Set[int] = set()
+        state = 0
+        for char in text:
+            while state and char not in transitions[state]:
+                state = failures[state]
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+
+class AhoCorasick:
+    """Find the best pattern for a user agent by its literal segments.
+
+    Each pattern is triggered by its least frequent literal segment. When a
+    scan finds the trigger, the other segments are checked and, if they were
+    also found, the pattern is matched.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, int]]) -> None:
+        """Build the automaton for (pattern, record) pairs."""
+        #: Original pattern of each record
+        self._patterns: Dict[int, str] = {}
+        #: Compiled pattern, record and literal segment ids of each pattern
+        self._items: List[Tuple[Pattern, int, FrozenSet[int]]] = []
+        #: Patterns without literal segments
+        self._always: List[int] = []
+
+        literal_ids: Dict[str, int] = {}
+        for pattern, record in patterns:
+            self._patterns[record] = pattern
+            compiled = Pattern(pattern)
+            literals = cast(List[str], _LITERAL.findall(compiled.pattern))
+            ids = frozenset(literal_ids.setdefault(literal, len(literal_ids))
+                            for literal in literals)
+            self._items.append((compiled, record, ids))
+
+        frequencies = Counter(literal for _, _, ids in self._items
+                              for literal in ids)
+        #: Patterns triggered by each literal segment
+        self._triggers: List[List[int]] = [[] for _ in literal_ids]
+        for index, (_, _, ids) in enumerate(self._items):
+            if ids:
+                _, trigger = min((frequencies[literal], literal)
+                                 for literal in ids)
+                self._triggers[trigger].append(index)
+            else:
+                self._always.append(index)
+        self.automaton = Automaton(literal_ids)
+
+    @classmethod
+    def from_frozen(cls, tree: FrozenTree) -> 'AhoCorasick':
+        """Build the automaton for the patterns of a frozen tree."""
+        return cls(tree.patterns())
+
+    def __len__(self) -> int:
+        """Return the number of patterns."""
+        return len(self._items)
+
+    def pattern(self, record: int) -> str:
+        """Return the browscap pattern of a record."""
+        return self._patterns[record]
+
+    def lookup(self, user_agent: str) -> Optional[int]:
+        """Return the record id of the best matching pattern, if any.
+
+        See :func:`browscapy.matcher.has_precedence` for the best pattern
+        criteria.
+        """
+        user_agent = user_agent.lower()
+        found = self.automaton.search(user_agent)
+        candidates = list(self._always)
+        for literal in found:
+            candidates.extend(index for index in self._triggers[literal]
+                              if self._items[index][2] <= found)
+
+        best: Optional[int] = None
+        best_score, best_pattern = -1, ''
+        for index in candidates:
+            compiled, record, _ = self._items[index]
+            does_match, score = compiled.match(user_agent)
+            if does_match and has_precedence(score, compiled.pattern,
+                                             best_score, best_pattern):
+                best, best_score, best_pattern = \
+                    record, score, compiled.pattern
+        return best
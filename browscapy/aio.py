@@ -0,0 +1,185 @@
+"""Look up user agents from asyncio code without blocking the event loop.
+
+:class:`AsyncClassifier` answers cache hits immediately. Misses are searched
+in an executor: a thread pool sharing the classifier's tree or a process pool
+whose workers open the same memory-mapped tree file (see
+:mod:`browscapy.mapped`). Concurrent lookups of the same user agent wait for
+a single search. The number of searches is limited: callers of other new
+user agents wait for a free one before any task is created, so that bursts
+of new user agents pile up neither in the executor queue nor as tasks.
+
+Reads of stores that are not in memory, like
+:class:`~browscapy.storage.SQLiteStore`, run in threads too.
+"""
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import (Callable, Dict, Optional, Sequence, Union, cast,
+                    overload)
+
+from .classifier import Classifier, Match
+from .mapped import MappedTree
+from .properties import Properties
+from .storage import Store
+from .table import PropertiesTable
+
+# Distinguish cache misses from user agents without properties (None)
+_MISSING = object()
+# Tree of a worker process, opened by _open_tree
+_worker_tree: Optional[MappedTree] = None
+
+
+class AsyncClassifier:
+    """Asyncio facade of a :class:`~browscapy.classifier.Classifier`.
+
+    Attributes:
+        classifier (Classifier): Provides the cache and the properties.
+        executor (Executor): Runs the tree searches. None means the event
+            loop's default thread pool.
+        max_pending (int): Maximum number of searches at once. Lookups of
+            other new user agents wait for one to finish.
+
+    """
+
+    def __init__(self, classifier: Classifier,
+                 executor: Optional[Executor] = None,
+                 max_pending: int = 64) -> None:
+        """Search the classifier's tree in threads of the executor."""
+        self.classifier = classifier
+        self.executor = executor
+        self.max_pending = max_pending
+        #: Search the record id of a user agent in a worker process, or
+        #: None to use the classifier's current tree
+        self._lookup_record: Optional[Callable[[str], Optional[int]]] = None
+        #: Searches in progress by user agent
+        self._pending: Dict[str, 'asyncio.Future[Optional[Match]]'] = {}
+        #: Free searches
+        self._semaphore = asyncio.Semaphore(max_pending)
+        self._owns_executor = False
+
+    @classmethod
+    def with_processes(cls, tree_path: str, table: Store,
+                       workers: Optional[int] = None,
+                       cache_size: int = 4096,
+                       max_pending: int = 64) -> 'AsyncClassifier':
+        """Search a tree file in worker processes.
+
+        Each worker maps the file created by :func:`browscapy.mapped.dump`,
+        so they share the same memory. Use :meth:`close` to stop them.
+        """
+        classifier = Classifier(MappedTree(tree_path), table, cache_size)
+        executor = ProcessPoolExecutor(workers, initializer=_open_tree,
+                                       initargs=(tree_path,))
+        async_classifier = cls(classifier, executor, max_pending)
+        async_classifier._lookup_record = _lookup_in_worker
+        async_classifier._owns_executor = True
+        return async_classifier
+
+    @overload
+    async def lookup(self, user_agent: str) -> Optional[Properties]:
+        """Return all properties."""
+
+    @overload  # noqa: F811
+    async def lookup(self,  # pylint: disable=function-redefined
+                     user_agent: str,
+                     fields: Sequence[str]) -> Optional[Dict[str, str]]:
+        """Return only the properties in fields."""
+
+    async def lookup(self, user_agent: str,  # noqa: F811
+                     fields: Optional[Sequence[str]] = None) \
+            -> Union[Optional[Properties], Optional[Dict[str, str]]]:
+        # pylint: disable=function-redefined
+        """Return the properties of the best pattern for user_agent, if any.
+
+        Same results, projections and cache as :meth:`Classifier.lookup`.
+        """
+        classifier = self.classifier
+        if classifier.normalizer is not None:
+            user_agent = classifier.normalizer(user_agent)
+        match = await self._get_match(user_agent)
+        if match is None:
+            return None
+        # Other stores read files, which would block the event loop
+        in_memory = isinstance(classifier.table, PropertiesTable)
+        loop = asyncio.get_running_loop()
+        if fields is not None:
+            hot_fields = classifier.hot_fields
+            if in_memory or hot_fields is not None \
+                    and hot_fields.covers(fields):
+                return classifier.project(match.record, fields)
+            return await loop.run_in_executor(
+                self._get_store_executor(), classifier.project,
+                match.record, fields)
+        if match.properties is None:
+            properties = classifier.table[match.record] if in_memory \
+                else await loop.run_in_executor(
+                    self._get_store_executor(), classifier.table.__getitem__,
+                    match.record)
+            match = Match(match.record, properties)
+            if classifier.cache is not None:
+                classifier.cache.put(user_agent, match)
+        return match.properties
+
+    async def _get_match(self, user_agent: str) -> Optional[Match]:
+        """Return the cached match or wait for its search."""
+        cache = self.classifier.cache
+        if cache is not None:
+            cached = cache.get(user_agent, _MISSING)
+            if cached is not _MISSING:
+                return cast(Optional[Match], cached)
+        future = self._pending.get(user_agent)
+        if future is None:
+            await self._semaphore.acquire()
+            # Another caller may have started the search meanwhile
+            future = self._pending.get(user_agent)
+            if future is None:
+                future = asyncio.ensure_future(self._search(user_agent))
+                self._pending[user_agent] = future
+                future.add_done_callback(
+                    lambda _: self._finish_search(user_agent))
+            else:
+                self._semaphore.release()
+        # A cancelled caller doesn't cancel the search for the others
+        return await asyncio.shield(future)
+
+    async def _search(self, user_agent: str) -> Optional[Match]:
+        """Search the tree in the executor and cache the match."""
+        loop = asyncio.get_running_loop()
+        lookup = self._lookup_record or self.classifier.tree.lookup
+        record = await loop.run_in_executor(self.executor, lookup, user_agent)
+        match = None if record is None else Match(record, None)
+        if self.classifier.cache is not None:
+            self.classifier.cache.put(user_agent, match)
+        return match
+
+    def _get_store_executor(self) -> Optional[Executor]:
+        """Return the executor of store reads, which need threads.
+
+        Stores can't be sent to the worker processes of
+        :meth:`with_processes`, so they use the default thread pool.
+        """
+        return None if self._owns_executor else self.executor
+
+    def _finish_search(self, user_agent: str) -> None:
+        """Forget a finished search and free its place."""
+        del self._pending[user_agent]
+        self._semaphore.release()
+
+    def close(self) -> None:
+        """Stop the workers and close the tree of :meth:`with_processes`.
+
+        Otherwise, the executor and the tree belong to the caller.
+        """
+        if self._owns_executor:
+            cast(Executor, self.executor).shutdown()
+            cast(MappedTree, self.classifier.tree).close()
+
+
+def _open_tree(tree_path: str) -> None:
+    """Map the tree file in a worker process."""
+    global _worker_tree  # pylint: disable=global-statement,invalid-name
+    _worker_tree = MappedTree(tree_path)
+
+
+def _lookup_in_worker(user_agent: str) -> Optional[int]:
+    """Search the tree of a worker process."""
+    return cast(MappedTree, _worker_tree).lookup(user_agent)
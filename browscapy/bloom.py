@@ -0,0 +1,161 @@
+"""Bloom filter of pattern heads, to skip the literal subtrees of the root.
+
+The head of a pattern is its text before the first wildcard. A pattern
+without a leading wildcard can only match user agents starting with its head,
+so if no head is a prefix of the user agent, no pattern of the root's literal
+subtrees matches and the lookup visits only the ones starting with a
+wildcard, like the default ``*``.
+
+:class:`PrefixFilter` answers that question with one Bloom filter probe of
+the first :data:`PREFIX_SIZE` user agent characters, plus exact checks of the
+few heads shorter than that. False positives only cost the descent that
+happens without the filter; there are no false negatives.
+
+Hashes come from :func:`zlib.crc32` and :func:`zlib.adler32` instead of
+:func:`hash`, which changes between processes, so the bits are the same in
+all of them. They are much faster than cryptographic hashes and good enough
+for short strings.
+"""
+import math
+import zlib
+from typing import FrozenSet, Iterable, Iterator, Optional, Tuple
+
+#: int: Number of head characters in the Bloom filter.
+PREFIX_SIZE = 8
+#: float: Default probability of a false positive.
+FALSE_POSITIVE_RATE = 0.01
+
+_WILDCARDS = ('*', '?')
+
+
+def get_head(pattern: str) -> str:
+    """Return the text before the first wildcard."""
+    end = len(pattern)
+    for wildcard in _WILDCARDS:
+        position = pattern.find(wildcard)
+        if 0 <= position < end:
+            end = position
+    return pattern[:end]
+
+
+class BloomFilter:
+    """Set of strings with false positives but no false negatives.
+
+    Attributes:
+        bit_count (int): Number of bits.
+        hash_count (int): Bits set by each string.
+
+    """
+
+    def __init__(self, capacity: int,
+                 false_positive_rate: float = FALSE_POSITIVE_RATE,
+                 size: Optional[int] = None) -> None:
+        """Size the filter for capacity strings.
+
+        Args:
+            capacity: Expected number of strings.
+            false_positive_rate: Target probability of false positives. If
+                size is given, it only limits the number of hashes.
+            size: Number of bytes, whatever the false positive rate.
+
+        Raises:
+            ValueError: The rate is not between 0 and 1 or size is not
+                positive.
+
+        """
+        capacity = max(capacity, 1)
+        if not 0 < false_positive_rate < 1:
+            raise ValueError('The false positive rate must be between 0 and '
+                             '1')
+        if size is None:
+            bit_count = math.ceil(-capacity * math.log(false_positive_rate)
+                                  / math.log(2) ** 2)
+            size = (bit_count + 7) // 8
+        elif size <= 0:
+            raise ValueError('The size must be positive')
+        self.bit_count = size * 8
+        # Each hash costs a probe. A large fixed size would have many, with a
+        # false positive rate already below the target one with these.
+        max_hash_count = math.ceil(-math.log2(false_positive_rate))
+        self.hash_count = max(1, min(round(self.bit_count / capacity
+                                           * math.log(2)), max_hash_count))
+        self._bits = bytearray(size)
+
+    def __len__(self) -> int:
+        """Return the size in bytes."""
+        return len(self._bits)
+
+    def add(self, key: str) -> None:
+        """Set the bits of key."""
+        for bit in self._get_bits(key):
+            self._bits[bit >> 3] |= 1 << (bit & 7)
+
+    def __contains__(self, key: object) -> bool:
+        """Return False if key was never added, True if it may have been."""
+        if not isinstance(key, str):
+            return False
+        bits = self._bits
+        for bit in self._get_bits(key):
+            if not bits[bit >> 3] & 1 << (bit & 7):
+                return False
+        return True
+
+    def get_false_positive_rate(self, count: int) -> float:
+        """Return the expected false positive rate after count strings."""
+        return (1 - math.exp(-self.hash_count * count / self.bit_count)) \
+            ** self.hash_count
+
+    def _get_bits(self, key: str) -> Iterator[int]:
+        """Yield the bits of key by double hashing."""
+        data = key.encode()
+        bit, step = zlib.crc32(data), zlib.adler32(data) | 1
+        bit_count = self.bit_count
+        for _ in range(self.hash_count):
+            yield bit % bit_count
+            bit += step
+
+
+class PrefixFilter:
+    """Tell whether a user agent may start with a pattern head.
+
+    Attributes:
+        prefix_size (int): Number of head characters in the Bloom filter.
+        short_heads (FrozenSet[str]): Heads shorter than prefix_size, checked
+            exactly.
+        bloom (BloomFilter): First prefix_size characters of the other
+            heads.
+
+    """
+
+    def __init__(self, patterns: Iterable[str],
+                 prefix_size: int = PREFIX_SIZE,
+                 false_positive_rate: float = FALSE_POSITIVE_RATE,
+                 size: Optional[int] = None) -> None:
+        """Add the heads of the patterns not starting with a wildcard.
+
+        See :class:`BloomFilter` for false_positive_rate and size.
+        """
+        heads = {get_head(pattern.lower()) for pattern in patterns}
+        heads.discard('')
+        self.prefix_size = prefix_size
+        self.short_heads: FrozenSet[str] = frozenset(
+            head for head in heads if len(head) < prefix_size)
+        #: Lengths of the short heads, to slice the user agent
+        self._short_lengths: Tuple[int, ...] = tuple(sorted(
+            {len(head) for head in self.short_heads}))
+        prefixes = {head[:prefix_size] for head in heads
+                    if len(head) >= prefix_size}
+        self.bloom = BloomFilter(len(prefixes), false_positive_rate, size)
+        for prefix in prefixes:
+            self.bloom.add(prefix)
+
+    def may_match(self, user_agent: str) -> bool:
+        """Return whether a head may be a prefix of a lower-case user agent.
+
+        False means no head is.
+        """
+        for length in self._short_lengths:
+            if user_agent[:length] in self.short_heads:
+                return True
+        return len(user_agent) >= self.prefix_size \
+            and user_agent[:self.prefix_size] in self.bloom
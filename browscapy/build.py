@@ -0,0 +1,232 @@
+"""Build the browscapy database from browscap.csv.
+
+The CSV file is streamed through a generator pipeline, so only the tree, the
+properties table and the inheritance parents are kept in memory:
+
+1. :func:`read_rows` skips the version rows and yields positional rows;
+2. :func:`normalize` converts them to :class:`Properties`;
+3. :class:`~browscapy.inheritance.Resolver` flattens the inheritance;
+4. :func:`build` stores the properties and inserts the patterns in the tree.
+
+Tree insertion can also run in multiple processes. Patterns are split by
+their first characters, so each partition becomes an independent subtree,
+and the subtrees are inserted into the final tree like new nodes.
+"""
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional, Set,
+                    Tuple, cast)
+
+from .database import Database
+from .frozen import NO_RECORD
+from .inheritance import Resolver
+from .mapped import dump
+from .node import FullPattern, Node, PartialPattern, Tree
+from .properties import Properties
+from .storage import Store
+from .table import FIELDS
+
+#: Callable[[int], None]: Receive the number of patterns added so far.
+Progress = Callable[[int], None]
+# pylint: disable=invalid-name
+#: A browscap pattern and its record id.
+Pattern = Tuple[str, int]
+#: Subtree nodes in pre-order: pattern, record and number of children.
+EncodedTree = List[Tuple[str, int, int]]
+# pylint: enable=invalid-name
+
+#: int: Number of partitions per worker process, for load balancing.
+PARTITIONS_PER_WORKER = 16
+
+
+def read_rows(csv_path: str) -> Iterator[List[str]]:
+    """Yield the rows after the header, with the header as the first row.
+
+    Browscap files start with version rows before the header, which has a
+    "PropertyName" column.
+    """
+    with open(csv_path, newline='', encoding='utf-8') as csv_file:
+        reader = csv.reader(csv_file)
+        for row in reader:
+            if FIELDS[0] in row:
+                yield row
+                break
+        else:
+            raise ValueError(f'No header found in "{csv_path}"')
+        yield from reader
+
+
+def normalize(rows: Iterator[List[str]]) -> Iterator[Properties]:
+    """Convert the rows from :func:`read_rows` to properties.
+
+    Columns are reordered by the header, values are stripped and empty rows
+    are skipped.
+    """
+    header = next(rows)
+    try:
+        get_values = itemgetter(*[header.index(field) for field in FIELDS])
+    except ValueError as error:
+        raise ValueError(f'Missing browscap column: {error}') from error
+    for row in rows:
+        if row:
+            values = cast(Tuple[str, ...], get_values(row))
+            yield Properties(*[value.strip() for value in values])
+
+
+def read_parent_names(csv_path: str) -> Set[str]:
+    """Return the names of the rows that are parents of others."""
+    rows = read_rows(csv_path)
+    parent_index = next(rows).index('Parent')
+    return {row[parent_index] for row in rows if row}
+
+
+def read_properties(csv_path: str) -> Iterator[Properties]:
+    """Yield the properties of each row with inheritance resolved."""
+    resolver = Resolver(read_parent_names(csv_path))
+    return resolver.resolve(normalize(read_rows(csv_path)))
+
+
+def add_patterns(tree: Tree, properties: Iterable[Properties],
+                 progress: Optional[Progress] = None,
+                 progress_interval: int = 10000) -> int:
+    """Store properties, insert their patterns and return how many.
+
+    The properties are appended to the tree's store.
+    """
+    count = 0
+    for count, row in enumerate(properties, 1):
+        tree.add_properties(row)
+        if progress is not None and count % progress_interval == 0:
+            progress(count)
+    return count
+
+
+def build(csv_path: str, table: Store,
+          progress: Optional[Progress] = None,
+          workers: Optional[int] = 1) -> Tree:
+    """Return a tree with all browscap patterns, storing their properties.
+
+    Args:
+        csv_path: Path of a browscap.csv file.
+        table: Receives the resolved properties of all patterns. It is the
+            store of the tree nodes.
+        progress: Called periodically with the number of patterns added.
+        workers: Number of processes building the tree. None means the number
+            of processors. The resulting tree is the same.
+
+    """
+    rows = read_properties(csv_path)
+    if workers == 1:
+        tree = Tree(store=table)
+        count = add_patterns(tree, rows, progress)
+    else:
+        patterns = [(row.PropertyName, table.append(row)) for row in rows]
+        tree = build_parallel(patterns, workers, progress, table)
+        count = len(patterns)
+    if progress is not None:
+        progress(count)
+    return tree
+
+
+def build_parallel(patterns: List[Pattern], workers: Optional[int] = None,
+                   progress: Optional[Progress] = None,
+                   store: Optional[Store] = None) -> Tree:
+    """Build a tree from patterns already in the store, in parallel.
+
+    The patterns are split by their first characters into partitions. As
+    patterns of different partitions have different prefixes, each partition
+    is an independent subtree, built by a worker process. Finally, the root of
+    each subtree is inserted into the final tree, which creates the nodes
+    shared by different partitions. None as store means
+    :attr:`FullPattern.DATABASE`.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_size = len(patterns) // (workers * PARTITIONS_PER_WORKER) + 1
+    partitions = list(partition(patterns, max_size))
+    tree = Tree(store=store)
+    count = 0
+    with ProcessPoolExecutor(workers) as executor:
+        subtrees = executor.map(_build_subtree, partitions, chunksize=4)
+        for encoded, partition_patterns in zip(subtrees, partitions):
+            tree.add_subtree(decode_subtree(encoded, store))
+            count += len(partition_patterns)
+            if progress is not None:
+                progress(count)
+    return tree
+
+
+def partition(patterns: List[Pattern], max_size: int, depth: int = 0) \
+        -> Iterator[List[Pattern]]:
+    """Split patterns by their first characters into independent groups.
+
+    Patterns are grouped by their character at depth. Groups larger than
+    max_size are split again by the next character. A pattern with exactly
+    depth characters is in a group by itself.
+    """
+    groups: Dict[str, List[Pattern]] = {}
+    for pattern in patterns:
+        key = pattern[0][depth:depth + 1]
+        groups.setdefault(key, []).append(pattern)
+    for key, group in groups.items():
+        if len(group) > max_size and key:
+            yield from partition(group, max_size, depth + 1)
+        else:
+            yield group
+
+
+def _build_subtree(patterns: List[Pattern]) -> EncodedTree:
+    """Build the subtree of a partition in a worker process.
+
+    The subtree is encoded as a list to avoid deep recursion when pickling.
+    """
+    tree = Tree()
+    for pattern, record in patterns:
+        tree.add_node(FullPattern.from_record(pattern, record))
+    # A partition has a single root
+    return encode_subtree(tree.children[0])
+
+
+def encode_subtree(root: Node) -> EncodedTree:
+    """List the nodes in pre-order with their record and children count."""
+    encoded: EncodedTree = []
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        record = node.record if isinstance(node, FullPattern) else NO_RECORD
+        children = node.children
+        encoded.append((node.pattern, record, len(children)))
+        nodes.extend(reversed(children))
+    return encoded
+
+
+def decode_subtree(encoded: EncodedTree, store: Optional[Store] = None) \
+        -> Node:
+    """Rebuild the nodes listed by :func:`encode_subtree`."""
+    root: Optional[Node] = None
+    # Nodes still missing some children, and how many
+    parents: List[Tuple[Node, int]] = []
+    for pattern, record, children_count in encoded:
+        node: Node = PartialPattern(pattern) if record == NO_RECORD \
+            else FullPattern.from_record(pattern, record, store)
+        if parents:
+            parent, missing = parents.pop()
+            parent.put_child(node)
+            if missing > 1:
+                parents.append((parent, missing - 1))
+        else:
+            root = node
+        if children_count:
+            parents.append((node, children_count))
+    return cast(Node, root)
+
+
+def build_database(csv_path: str, progress: Optional[Progress] = None) \
+        -> None:
+    """Build the tree and properties, saving them in the user's database."""
+    database = Database(readonly=False)
+    frozen = build(csv_path, database.table, progress).freeze()
+    # Readers opening the new table wait for the tree of its generation
+    database.close()
+    dump(frozen, str(database.tree_filename), database.table.generation)
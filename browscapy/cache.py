@@ -0,0 +1,84 @@
+"""Bounded least-recently-used cache for lookup results."""
+from collections import OrderedDict
+from threading import Lock
+from typing import Generic, NamedTuple, Optional, TypeVar, Union, overload
+
+# pylint: disable=invalid-name
+Key = TypeVar('Key')
+Value = TypeVar('Value')
+Default = TypeVar('Default')
+# pylint: enable=invalid-name
+
+
+class CacheInfo(NamedTuple):  # pylint: disable=too-few-public-methods
+    """Cache statistics."""
+
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+
+
+class LRUCache(Generic[Key, Value]):
+    """Keep the most recently used values, up to a maximum number of keys.
+
+    It is safe to use the same cache in multiple threads.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        """Create an empty cache that can store maxsize keys."""
+        if maxsize < 1:
+            raise ValueError('Cache size must be positive')
+        self.maxsize = maxsize
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self._values: 'OrderedDict[Key, Value]' = OrderedDict()
+        self._lock = Lock()
+
+    @overload
+    def get(self, key: Key) -> Optional[Value]:
+        """Return the value, or None."""
+
+    @overload  # noqa: F811
+    def get(self, key: Key,  # pylint: disable=function-redefined
+            default: Default) -> Union[Value, Default]:
+        """Return the value, or default."""
+
+    def get(self, key: Key,  # noqa: F811
+            default: Optional[Default] = None) \
+            -> Union[Value, Optional[Default]]:
+        # pylint: disable=function-redefined
+        """Return the value of key and mark it as the most recently used."""
+        with self._lock:
+            try:
+                value = self._values[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._values.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Key, value: Value) -> None:
+        """Store a value, discarding the least recently used if full."""
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            if len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all values and reset the statistics."""
+        with self._lock:
+            self._values.clear()
+            self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def info(self) -> CacheInfo:
+        """Return the cache statistics."""
+        return CacheInfo(self.hits, self.misses, self.evictions,
+                         len(self._values), self.maxsize)
+
+    def __len__(self) -> int:
+        """Return the number of cached keys."""
+        return len(self._values)
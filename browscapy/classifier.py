@@ -0,0 +1,134 @@
+"""Find the browscap properties of user agents."""
+from typing import Dict, NamedTuple, Optional, Sequence, Union, cast, overload
+
+from .aho import AhoCorasick
+from .cache import CacheInfo, LRUCache
+from .frozen import FrozenTree
+from .normalize import Normalizer
+from .properties import Properties
+from .storage import HotFields, Store
+
+#: Lookup backends, returning the record id of a user agent.
+Backend = Union[FrozenTree, AhoCorasick]  # pylint: disable=invalid-name
+
+# Distinguish cache misses from user agents without properties (None)
+_MISSING = object()
+
+
+class Match(NamedTuple):  # pylint: disable=too-few-public-methods
+    """Cached result of a user agent with a matching pattern."""
+
+    record: int
+    #: All properties once a full lookup read them, otherwise None
+    properties: Optional[Properties]
+
+
+class Classifier:
+    """Look up user agents in a tree and fetch their properties.
+
+    Attributes:
+        tree (Backend): Backend returning the record of a user agent. Use
+            :meth:`browscapy.node.Tree.freeze` for a mutable tree or
+            :class:`~browscapy.aho.AhoCorasick` to scan user agents.
+        table (Store): Properties of each record.
+        cache (LRUCache): Matches of the most recent user agents, or None if
+            caching is disabled. Full lookups keep the properties, so their
+            hits don't read the table; projections only need the record.
+        hot_fields (HotFields): Properties of all records kept in memory for
+            projections, or None.
+        normalizer (Normalizer): Rewrites user agents before the cache and
+            the lookup, or None.
+
+    """
+
+    def __init__(self, tree: Backend, table: Store, cache_size: int = 4096,
+                 hot_fields: Optional[Sequence[str]] = None,
+                 normalizer: Optional[Normalizer] = None) -> None:
+        """Use the tree and the table, caching cache_size results.
+
+        Args:
+            tree: Lookup backend.
+            table: Properties storage.
+            cache_size: Number of user agents in the cache. Zero disables the
+                cache.
+            hot_fields: Properties to read from all records now, to answer
+                projections on them without the table (see
+                :data:`browscapy.storage.HOT_FIELDS`). Useful when the table
+                is not in memory.
+            normalizer: Collapses variants of user agents into one cache
+                entry, raising the hit ratio. The user agents must not need
+                the removed text to match their patterns.
+
+        """
+        # pylint: disable=too-many-arguments
+        self.tree = tree
+        self.table = table
+        self.cache: Optional[LRUCache[str, Optional[Match]]] = \
+            LRUCache(cache_size) if cache_size else None
+        self.hot_fields = HotFields(table, hot_fields) if hot_fields else None
+        self.normalizer = normalizer
+
+    @overload
+    def lookup(self, user_agent: str) -> Optional[Properties]:
+        """Return all properties."""
+
+    @overload  # noqa: F811
+    def lookup(self, user_agent: str,  # pylint: disable=function-redefined
+               fields: Sequence[str]) -> Optional[Dict[str, str]]:
+        """Return only the properties in fields."""
+
+    def lookup(self, user_agent: str,  # noqa: F811
+               fields: Optional[Sequence[str]] = None) \
+            -> Union[Optional[Properties], Optional[Dict[str, str]]]:
+        # pylint: disable=function-redefined
+        """Return the properties of the best pattern for user_agent, if any.
+
+        If fields is given, only these properties are decoded and returned
+        by name, e.g. ``lookup(user_agent, fields=('Browser', 'Platform'))``.
+        """
+        match = self.lookup_match(user_agent, read=fields is None)
+        if match is None:
+            return None
+        if fields is None:
+            return match.properties
+        return self.project(match.record, fields)
+
+    def lookup_record(self, user_agent: str) -> Optional[int]:
+        """Return the record of the best pattern for user_agent, if any."""
+        match = self.lookup_match(user_agent)
+        return None if match is None else match.record
+
+    def lookup_match(self, user_agent: str, read: bool = False) \
+            -> Optional[Match]:
+        """Return the cached or searched match of user_agent, if any.
+
+        The cache key is the user agent after the normalizer, if any. If read
+        is true, the properties are read from the table unless cached, and
+        then cached.
+        """
+        if self.normalizer is not None:
+            user_agent = self.normalizer(user_agent)
+        cached = _MISSING if self.cache is None \
+            else self.cache.get(user_agent, _MISSING)
+        if cached is _MISSING:
+            record = self.tree.lookup(user_agent)
+            match = None if record is None else Match(record, None)
+        else:
+            match = cast(Optional[Match], cached)
+            if match is None or match.properties is not None or not read:
+                return match
+        if match is not None and read:
+            match = Match(match.record, self.table[match.record])
+        if self.cache is not None:
+            self.cache.put(user_agent, match)
+        return match
+
+    def project(self, record: int, fields: Sequence[str]) -> Dict[str, str]:
+        """Return some properties of a record, from memory if possible."""
+        if self.hot_fields is not None and self.hot_fields.covers(fields):
+            return self.hot_fields.project(record, fields)
+        return self.table.project(record, fields)
+
+    def cache_info(self) -> Optional[CacheInfo]:
+        """Return the cache statistics, or None if there's no cache."""
+        return None if self.cache is None else self.cache.info()
@@ -1,27 +1,105 @@
-"""Disk cache for browscap data."""
-import shelve
+"""Disk cache for browscap data.
+
+The tree and the table are replaced by different files, so a reader may open
+one before and the other after an update or a rebuild:
+
+- An update appends records and saves the table before the tree, so a table
+  read after mapping a tree has all of its records;
+- A rebuild renumbers the records. Both files have the generation of their
+  build, and :func:`load` opens them again while they differ.
+"""
+import os
+import time
 from pathlib import Path
-# Skip bandit low-severity issue
-from pickle import HIGHEST_PROTOCOL  # nosec
+from typing import Optional, Tuple
+
+from .mapped import MappedTree
+from .table import PropertiesTable
+
+#: int: Times :func:`load` opens the files before giving up on a rebuild.
+LOAD_ATTEMPTS = 50
+#: float: Seconds between the attempts, while the tree is being written.
+LOAD_INTERVAL = 0.1
+
+
+class Database:
+    """Properties table stored in the user's home folder.
+
+    Attributes:
+        table (PropertiesTable): Properties of all browscap patterns.
+        folder (Path): Folder of the files, created when the table is saved.
+        filename (Path): Properties table file.
+        tree_filename (Path): Frozen tree file (see :mod:`browscapy.mapped`).
+
+    """
 
+    def __init__(self, readonly: bool = True,
+                 load_table: Optional[bool] = None) -> None:
+        """Load the table or, if not readonly, create an empty one.
 
-class Database:  # pylint: disable=too-few-public-methods
-    """Key-value database."""
+        Args:
+            readonly: Whether :meth:`close` should not save the table.
+            load_table: Whether to load the stored table. By default, only
+                readonly databases are loaded. Load a writable database to
+                update it. Empty tables start a new generation.
 
-    def __init__(self, readonly: bool = True) -> None:
-        """Create folder if needed."""
-        flag = 'r' if readonly else 'n'
+        """
+        self.readonly = readonly
         # Ignore: error: Expression type contains "Any" (has type "Type[Path]")
         # How to solve it?
-        folder = Path.home() / '.browscapy'  # type: ignore
-        filename = folder / 'cache'
+        self.folder = Path.home() / '.browscapy'  # type: ignore
+        self.filename = self.folder / 'properties'
+        self.tree_filename = self.folder / 'tree'
 
-        # Ignore wrong pylint error because it's a PosixPath, not PurePath
-        if not folder.exists():  # pylint: disable=no-member
-            folder.mkdir()       # pylint: disable=no-member
+        if load_table is None:
+            load_table = readonly
+        if load_table:
+            self.table = self.read_table()
+        else:
+            self.table = PropertiesTable(
+                generation=int.from_bytes(os.urandom(4), 'big'))
 
-        self.shelve = shelve.open(str(filename), flag, HIGHEST_PROTOCOL)
+    def read_table(self) -> PropertiesTable:
+        """Return the stored table, read again."""
+        with open(str(self.filename), 'rb') as table_file:
+            return PropertiesTable.load(table_file)
 
     def close(self) -> None:
-        """Close the shelve, persisting the data."""
-        self.shelve.close()
+        """Persist the table if it's not readonly.
+
+        The file is written with a temporary name and then renamed, so readers
+        never find a partial file.
+        """
+        if self.readonly:
+            return
+        # Ignore wrong pylint error because it's a PosixPath, not PurePath
+        self.folder.mkdir(exist_ok=True)  # pylint: disable=no-member
+        tmp_filename = f'{self.filename}.tmp'
+        with open(tmp_filename, 'wb') as table_file:
+            self.table.dump(table_file)
+        os.replace(tmp_filename, str(self.filename))
+
+
+def load(database: Optional[Database] = None) \
+        -> Tuple[MappedTree, PropertiesTable]:
+    """Open the tree and properties built by :mod:`browscapy.build`.
+
+    The tree is mapped before the table is read, and both are opened again
+    while a rebuild replaces them. The table of the database argument, if
+    any, is not used: it may be older than the tree.
+
+    Raises:
+        ValueError: The generations still differ after :data:`LOAD_ATTEMPTS`.
+
+    """
+    database = database or Database(load_table=False)
+    for attempt in range(LOAD_ATTEMPTS):
+        if attempt:
+            time.sleep(LOAD_INTERVAL)
+        tree = MappedTree(str(database.tree_filename))
+        table = database.read_table()
+        if tree.generation == table.generation:
+            return tree, table
+        tree.close()
+    raise ValueError(f'The tree and the table in "{database.folder}" are '
+                     f'from different builds')
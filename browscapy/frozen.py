@@ -0,0 +1,272 @@
+"""Compact and read-only version of the tree, used to match user agents.
+
+A :class:`~browscapy.node.Tree` has one Python object per node, each one with
+its own pattern string and children dictionary. After the tree is built, it
+can be frozen into a few flat arrays:
+
+- Nodes are numbered in breadth-first order, the root being node 0, so the
+  children of a node are consecutive and can be stored as a range;
+- A node stores only its pattern suffix (label), the full pattern being its
+  parent's pattern followed by the label. All labels are concatenated in one
+  string;
+- Children are sorted by the lower-case first character of their labels, so
+  the candidates for a user agent character are found by binary search.
+
+Patterns starting with a wildcard can't be skipped by their first character.
+Optionally, :meth:`FrozenTree.build_index` indexes them by literal substrings
+(see :mod:`browscapy.index`), so that lookups don't visit their subtrees.
+For the other patterns, :meth:`FrozenTree.build_prefix_filter` adds a Bloom
+filter of their heads (see :mod:`browscapy.bloom`), so that lookups of
+unknown user agents skip the literal subtrees of the root.
+"""
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .bloom import FALSE_POSITIVE_RATE, PREFIX_SIZE, PrefixFilter
+from .index import TokenIndex
+from .matcher import Pattern, has_precedence, match_prefix
+from .matcher import compile as compile_pattern
+from .node import FullPattern, Node, Parent, PartialPattern, Tree
+from .storage import Store
+
+#: int: Record of nodes without properties (PartialPattern).
+NO_RECORD = -1
+#: int: Maximum number of compiled patterns kept by a frozen tree.
+COMPILED_CACHE_SIZE = 4096
+
+_WILDCARD_KEYS = ord('*'), ord('?')
+
+
+class FrozenTree:
+    """Read-only tree with the same lookup semantics as :class:`Tree`.
+
+    Attributes:
+        text (str): All node labels concatenated.
+        label_offsets (Sequence[int]): Node i label is
+            ``text[label_offsets[i]:label_offsets[i + 1]]``.
+        first_children (Sequence[int]): Node i children are the nodes from
+            ``first_children[i]`` to ``first_children[i + 1]`` (exclusive).
+        keys (Sequence[int]): Lower-case first character code of each label.
+        records (Sequence[int]): Property record id of each node or
+            :data:`NO_RECORD`.
+        parents (Sequence[int]): Parent of each node (the root is its own
+            parent).
+        record_nodes (Sequence[int]): Node of each record id (the root for
+            records not in the tree).
+        compiled (Dict[int, Pattern]): Compiled patterns of recently matched
+            records, up to :data:`COMPILED_CACHE_SIZE`. The oldest ones are
+            discarded first. The arrays are the compact representation of
+            all patterns, so none is compiled ahead.
+        index (Optional[TokenIndex]): Patterns starting with a wildcard, used
+            instead of their subtrees if not None.
+        prefix_filter (Optional[PrefixFilter]): Heads of the patterns not
+            starting with a wildcard. If not None, the literal subtrees of
+            the root are skipped when no head is a user agent prefix.
+
+    The sequences are arrays, but can be any sequence of integers, e.g.
+    memory views (see :mod:`browscapy.mapped`).
+
+    """
+
+    def __init__(self, text: str, label_offsets: Sequence[int],
+                 first_children: Sequence[int], keys: Sequence[int],
+                 records: Sequence[int], parents: Sequence[int],
+                 record_nodes: Sequence[int]) -> None:
+        """Store the arrays. Use :meth:`from_tree` to build them."""
+        # pylint: disable=too-many-arguments
+        self.text = text
+        self.label_offsets = label_offsets
+        self.first_children = first_children
+        self.keys = keys
+        self.records = records
+        self.parents = parents
+        self.record_nodes = record_nodes
+        self.compiled: Dict[int, Pattern] = {}
+        self.index: Optional[TokenIndex] = None
+        self.prefix_filter: Optional[PrefixFilter] = None
+
+    @classmethod
+    def from_tree(cls, tree: Tree) -> 'FrozenTree':
+        """Convert a tree to the flat representation."""
+        labels: List[str] = ['']
+        first_children = array('I', [1])
+        keys, records = array('I', [0]), array('i', [NO_RECORD])
+        parents, record_nodes = array('I', [0]), array('I')
+        queue: Deque[Tuple[int, Parent]] = deque([(0, tree)])
+        node_count = 1
+
+        while queue:
+            index, parent = queue.popleft()
+            start = parent.prefix_length
+            children = list(parent.children_by_char.values())
+            children.sort(key=lambda child: child.pattern[start:].lower())
+            for child in children:
+                label = child.pattern[start:]
+                labels.append(label)
+                keys.append(ord(label.lower()[0]))
+                parents.append(index)
+                if isinstance(child, FullPattern):
+                    records.append(child.record)
+                    if child.record >= len(record_nodes):
+                        extra = child.record + 1 - len(record_nodes)
+                        record_nodes.extend(array('I', [0]) * extra)
+                    record_nodes[child.record] = node_count
+                else:
+                    records.append(NO_RECORD)
+                queue.append((node_count, child))
+                node_count += 1
+            first_children.append(node_count)
+
+        label_offsets = array('I', [0])
+        for label in labels:
+            label_offsets.append(label_offsets[-1] + len(label))
+
+        return cls(''.join(labels), label_offsets, first_children, keys,
+                   records, parents, record_nodes)
+
+    def thaw(self, store: Optional[Store] = None) -> Tree:
+        """Return a mutable tree with the same nodes and records.
+
+        Args:
+            store: Properties of the records, or None for
+                :attr:`FullPattern.DATABASE`.
+
+        """
+        tree = Tree(store=store)
+        nodes: List[Parent] = [tree]
+        patterns = ['']
+        for node in range(1, len(self.keys)):
+            parent = self.parents[node]
+            pattern = patterns[parent] + self.label(node)
+            record = self.records[node]
+            child: Node = PartialPattern(pattern) if record == NO_RECORD \
+                else FullPattern.from_record(pattern, record, store)
+            nodes[parent].put_child(child)
+            nodes.append(child)
+            patterns.append(pattern)
+        return tree
+
+    def label(self, node: int) -> str:
+        """Return the pattern suffix of a node."""
+        return self.text[self.label_offsets[node]:
+                         self.label_offsets[node + 1]]
+
+    def pattern(self, record: int) -> str:
+        """Return the browscap pattern of a record."""
+        labels: List[str] = []
+        node = self.record_nodes[record]
+        while node:
+            labels.append(self.label(node))
+            node = self.parents[node]
+        return ''.join(reversed(labels))
+
+    def patterns(self) -> Iterator[Tuple[str, int]]:
+        """Yield the pattern and record id of each record in the tree."""
+        for record, node in enumerate(self.record_nodes):
+            if node:
+                yield self.pattern(record), record
+
+    def build_index(self) -> None:
+        """Index the patterns starting with a wildcard by substrings."""
+        self.index = TokenIndex((pattern, record)
+                                for pattern, record in self.patterns()
+                                if pattern[0] in '*?')
+
+    def build_prefix_filter(self, prefix_size: int = PREFIX_SIZE,
+                            false_positive_rate: float = FALSE_POSITIVE_RATE,
+                            size: Optional[int] = None) -> None:
+        """Filter the heads of the patterns not starting with a wildcard.
+
+        See :class:`~browscapy.bloom.PrefixFilter` for the arguments.
+
+        The filter is not built by default because it made lookups slower
+        on the synthetic benchmark: the descent already stops at the first
+        literal character differing from the user agent, so skipping the
+        literal subtrees saves little. User agents sharing their first
+        characters with patterns but only matching the default were about
+        2-3 us slower with it (about 8-13 us without), and the lookups of
+        known user agents did not measurably change. Measure it on real
+        data before enabling it.
+        """
+        self.prefix_filter = PrefixFilter(
+            (pattern for pattern, _ in self.patterns()
+             if pattern[0] not in '*?'),
+            prefix_size, false_positive_rate, size)
+
+    def lookup(self, user_agent: str) -> Optional[int]:
+        """Return the record id of the best matching pattern, if any.
+
+        Same algorithm as :meth:`browscapy.node.Tree.lookup`.
+        """
+        user_agent = user_agent.lower()
+        best: Optional[int] = None
+        best_score, best_pattern = -1, ''
+        if self.index is not None:
+            best, best_score, best_pattern = self.index.search(user_agent)
+        # Nodes matching the user agent beginning, their lower-case patterns
+        # and whether they have no wildcard
+        nodes: List[Tuple[int, str, bool]] = [(0, '', True)]
+
+        while nodes:
+            parent, parent_pattern, literal = nodes.pop()
+            for node in self._get_candidates(parent, len(parent_pattern),
+                                             user_agent, literal):
+                label = self.label(node).lower()
+                pattern = parent_pattern + label
+                if not match_prefix(pattern, user_agent):
+                    continue  # No descendant can match
+                record = self.records[node]
+                if record != NO_RECORD:
+                    compiled = self.compiled.get(record) \
+                        or self._compile(record, pattern)
+                    does_match, score = compiled.match(user_agent)
+                    if does_match and has_precedence(score, pattern,
+                                                     best_score, best_pattern):
+                        best, best_score, best_pattern = record, score, pattern
+                nodes.append((node, pattern, literal and '*' not in label
+                              and '?' not in label))
+
+        return best
+
+    def _compile(self, record: int, pattern: str) -> Pattern:
+        """Compile the pattern of a record and keep the most recent ones."""
+        compiled = self.compiled
+        if len(compiled) >= COMPILED_CACHE_SIZE:
+            try:
+                del compiled[next(iter(compiled))]
+            except (KeyError, RuntimeError, StopIteration):
+                pass  # Changed by another thread
+        compiled[record] = pattern_object = compile_pattern(pattern)
+        return pattern_object
+
+    def _get_candidates(self, parent: int, position: int, user_agent: str,
+                        literal: bool) -> Iterator[int]:
+        """Yield the children that may match a lower-case user agent.
+
+        See :meth:`browscapy.node.Parent.get_candidates`.
+        """
+        start = self.first_children[parent]
+        end = self.first_children[parent + 1]
+        if not literal:
+            yield from range(start, end)
+            return
+        # The index has the patterns starting with a wildcard
+        keys: Tuple[int, ...] = () if parent == 0 and self.index is not None \
+            else _WILDCARD_KEYS
+        if position < len(user_agent):
+            keys += (ord(user_agent[position]),)
+        for key in keys:
+            # Different cases of a letter have the same key
+            node = bisect_left(self.keys, key, start, end)
+            # At the root, the prefix filter may exclude all literal patterns.
+            # It's only checked if there are literal candidates.
+            if parent == 0 and self.prefix_filter is not None \
+                    and key not in _WILDCARD_KEYS and node < end \
+                    and self.keys[node] == key \
+                    and not self.prefix_filter.may_match(user_agent):
+                return
+            while node < end and self.keys[node] == key:
+                yield node
+                node += 1
@@ -0,0 +1,100 @@
+"""Inverted index of literal substrings, for patterns starting with wildcards.
+
+Tree descent can't skip patterns like ``*Googlebot*``, because they may match
+any user agent beginning. Instead, each of these patterns is indexed by one
+substring of :data:`TOKEN_SIZE` characters taken from its literal segments
+(the text between wildcards). If the pattern matches a user agent, the user
+agent contains all of its literal segments, and so the indexed token. A
+lookup only matches the patterns indexed by the tokens of the user agent.
+
+Patterns without a literal segment long enough are always matched.
+"""
+import re
+from collections import Counter
+from typing import (Dict, Iterable, List, Optional, Set, Tuple, Union,
+                    cast)
+
+from .matcher import Pattern, has_precedence
+
+#: int: Number of characters of the indexed substrings.
+TOKEN_SIZE = 4
+
+_LITERAL = re.compile('[^*?]+')
+
+
+def get_tokens(pattern: str, size: int = TOKEN_SIZE) -> Set[str]:
+    """Return the substrings of a pattern that have no wildcards."""
+    literals = cast(List[str], _LITERAL.findall(pattern))
+    return {literal[start:start + size] for literal in literals
+            for start in range(len(literal) - size + 1)}
+
+
+class TokenIndex:
+    """Find the candidate patterns for a user agent by its substrings.
+
+    Each pattern is indexed by its least frequent token among all patterns,
+    to keep the candidate lists short. Patterns are compiled once, when
+    indexed.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[Union[str, Pattern], int]],
+                 token_size: int = TOKEN_SIZE) -> None:
+        """Index the (pattern, record) pairs. Patterns may be compiled."""
+        self.token_size = token_size
+        compiled_patterns = [
+            (pattern if isinstance(pattern, Pattern) else Pattern(pattern),
+             record) for pattern, record in patterns]
+        pattern_tokens = [get_tokens(compiled.pattern, token_size)
+                          for compiled, _ in compiled_patterns]
+        frequencies = Counter(token for tokens in pattern_tokens
+                              for token in tokens)
+
+        #: Compiled patterns and records indexed by a token
+        self._postings: Dict[str, List[Tuple[Pattern, int]]] = {}
+        #: Patterns without tokens
+        self._unindexed: List[Tuple[Pattern, int]] = []
+        for item, tokens in zip(compiled_patterns, pattern_tokens):
+            if tokens:
+                _, token = min((frequencies[token], token)
+                               for token in tokens)
+                self._postings.setdefault(token, []).append(item)
+            else:
+                self._unindexed.append(item)
+
+    def __len__(self) -> int:
+        """Return the number of indexed patterns."""
+        return len(self._unindexed) + sum(len(items) for items
+                                          in self._postings.values())
+
+    def get_candidates(self, user_agent: str) -> List[Tuple[Pattern, int]]:
+        """Return the compiled patterns and records that may match.
+
+        The user agent must be in lower case.
+        """
+        candidates = list(self._unindexed)
+        size = self.token_size
+        postings = self._postings
+        for token in {user_agent[start:start + size]
+                      for start in range(len(user_agent) - size + 1)}:
+            candidates.extend(postings.get(token, ()))
+        return candidates
+
+    def search(self, user_agent: str) -> Tuple[Optional[int], int, str]:
+        """Return the record, score and pattern of the best match.
+
+        The user agent must be in lower case. If there's no match, the record
+        is None.
+        """
+        best: Optional[int] = None
+        best_score, best_pattern = -1, ''
+        for compiled, record in self.get_candidates(user_agent):
+            does_match, score = compiled.match(user_agent)
+            if does_match and has_precedence(score, compiled.pattern,
+                                             best_score, best_pattern):
+                best, best_score, best_pattern = \
+                    record, score, compiled.pattern
+        return best, best_score, best_pattern
+
+    def lookup(self, user_agent: str) -> Optional[int]:
+        """Return the record of the best indexed pattern, if any."""
+        return self.search(user_agent.lower())[0]
@@ -0,0 +1,92 @@
+"""Resolve browscap Parent inheritance once, while building the database.
+
+A browscap row may leave properties empty to inherit them from the row named
+in its Parent property, which may have a parent itself. Storing resolved rows
+makes each lookup a single record fetch.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from .properties import Properties
+
+#: Set[str]: Properties that are never inherited.
+OWN_FIELDS = {'PropertyName', 'Parent'}
+
+_INHERITED = [field not in OWN_FIELDS for field in Properties._fields]
+
+
+def inherit(properties: Properties, parent: Properties) -> Properties:
+    """Return properties with empty values replaced by the parent's ones."""
+    return Properties(*[
+        parent_value if inherited and not value else value
+        for value, parent_value, inherited
+        in zip(properties, parent, _INHERITED)])
+
+
+class Resolver:
+    """Resolve the inheritance of a stream of rows.
+
+    Parents are usually found before their children. Otherwise, children wait
+    until their parents are resolved.
+    """
+
+    def __init__(self, parent_names: Optional[Set[str]] = None) -> None:
+        """Remember only the resolved rows with the given names.
+
+        Args:
+            parent_names: Names of all rows that are parents of other rows.
+                If None, all resolved rows are kept in memory.
+
+        """
+        self.parent_names = parent_names
+        #: Resolved parents by name
+        self._parents: Dict[str, Properties] = {}
+        #: Rows waiting for their parents, by parent name
+        self._pending: Dict[str, List[Properties]] = {}
+
+    def resolve(self, rows: Iterable[Properties]) -> Iterator[Properties]:
+        """Yield the resolved rows, not necessarily in the same order.
+
+        Raises:
+            ValueError: A parent doesn't exist or there is a cycle.
+
+        """
+        for row in rows:
+            yield from self._add(row)
+        if self._pending:
+            raise ValueError(self._describe_pending())
+
+    def _add(self, row: Properties) -> Iterator[Properties]:
+        """Resolve a row and the ones that were waiting for it."""
+        rows = [row]
+        while rows:
+            row = rows.pop()
+            parent_name = row.Parent
+            if parent_name:
+                if parent_name == row.PropertyName:
+                    raise ValueError(f'"{parent_name}" is its own parent')
+                parent = self._parents.get(parent_name)
+                if parent is None:
+                    self._pending.setdefault(parent_name, []).append(row)
+                    continue
+                row = inherit(row, parent)
+            name = row.PropertyName
+            if self.parent_names is None or name in self.parent_names \
+                    or name in self._pending:
+                self._parents[name] = row
+            yield row
+            rows.extend(self._pending.pop(name, ()))
+
+    def _describe_pending(self) -> str:
+        """Explain why some rows could not be resolved."""
+        parents = {row.PropertyName: row.Parent
+                   for rows in self._pending.values() for row in rows}
+        for name in parents:
+            chain = [name]
+            while chain[-1] in parents:
+                parent = parents[chain[-1]]
+                if parent in chain:
+                    cycle = chain[chain.index(parent):] + [parent]
+                    return 'Inheritance cycle: ' + ' -> '.join(cycle)
+                chain.append(parent)
+        missing = sorted(set(self._pending) - set(parents))
+        return 'Unknown parents: ' + ', '.join(missing)
@@ -0,0 +1,135 @@
+"""Classifier that opens its tree and properties on first use.
+
+Importing browscapy doesn't touch the disk. :class:`LazyClassifier` calls its
+loader, by default :func:`browscapy.database.load`, only when the first
+lookup needs it, so short-lived programs that may not look up anything don't
+pay for loading. Long-running programs can start loading in a background
+thread with :meth:`LazyClassifier.preload` and do other work meanwhile::
+
+    import browscapy
+
+    ready = browscapy.preload()  # returns at once
+    ...
+    browscapy.lookup(user_agent)  # waits for the load, if still running
+
+The classifier and its backends are imported by the first load too, so the
+import itself stays cheap.
+"""
+import threading
+from typing import (TYPE_CHECKING, Callable, Dict, Optional, Sequence, Tuple,
+                    Union)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from .classifier import Backend, Classifier
+    from .normalize import Normalizer
+    from .properties import Properties
+    from .storage import Store
+
+# pylint: disable=invalid-name
+#: Return the lookup backend and the properties of its records.
+Loader = Callable[[], Tuple['Backend', 'Store']]
+# pylint: enable=invalid-name
+
+
+def _load_database() -> Tuple['Backend', 'Store']:
+    """Open the user's database, importing its modules only now."""
+    from .database import load  # pylint: disable=import-outside-toplevel
+    return load()
+
+
+class LazyClassifier:
+    """Create a :class:`~browscapy.classifier.Classifier` when needed.
+
+    Attributes:
+        loader (Loader): Opens the tree and the properties.
+        cache_size (int): Cache size of the classifier.
+        hot_fields (Sequence[str]): Properties kept in memory by the
+            classifier, or None.
+        normalizer (Normalizer): Normalizer of the classifier, or None.
+
+    """
+
+    def __init__(self, loader: Loader = _load_database,
+                 cache_size: int = 4096,
+                 hot_fields: Optional[Sequence[str]] = None,
+                 normalizer: Optional['Normalizer'] = None) -> None:
+        """Remember how to create the classifier, without loading it."""
+        # pylint: disable=too-many-arguments
+        self.loader = loader
+        self.cache_size = cache_size
+        self.hot_fields = hot_fields
+        self.normalizer = normalizer
+        self._classifier: Optional['Classifier'] = None
+        #: Load in progress or done, None before the first one or after a
+        #: failure
+        self._future: Optional['Future[Classifier]'] = None
+        self._lock = threading.Lock()
+
+    def preload(self, background: bool = True) -> 'Future[Classifier]':
+        """Start loading, if not started, and return its readiness future.
+
+        Args:
+            background: Whether to load in a daemon thread and return at
+                once. Otherwise, load in the current thread and return a done
+                future.
+
+        The future's result is the classifier or the exception of the loader.
+        After a failure, the next call loads again.
+        """
+        # pylint: disable=import-outside-toplevel
+        from concurrent.futures import Future
+        with self._lock:
+            future = self._future
+            if future is not None:
+                return future
+            future = self._future = Future()
+        if background:
+            threading.Thread(target=self._load, args=(future,),
+                             name='browscapy-preload', daemon=True).start()
+        else:
+            self._load(future)
+        return future
+
+    @property
+    def classifier(self) -> 'Classifier':
+        """Return the classifier, loading it or waiting for its load.
+
+        Raises:
+            Exception: Raised by the loader.
+
+        """
+        classifier = self._classifier
+        if classifier is None:
+            classifier = self.preload(background=False).result()
+        return classifier
+
+    def is_loaded(self) -> bool:
+        """Return whether lookups can start without waiting."""
+        return self._classifier is not None
+
+    def lookup(self, user_agent: str,
+               fields: Optional[Sequence[str]] = None) \
+            -> Union[Optional['Properties'], Optional[Dict[str, str]]]:
+        """Look up user_agent as :meth:`Classifier.lookup` does."""
+        classifier = self._classifier or self.classifier
+        if fields is None:
+            return classifier.lookup(user_agent)
+        return classifier.lookup(user_agent, fields)
+
+    def _load(self, future: 'Future[Classifier]') -> None:
+        """Create the classifier and resolve the future."""
+        # pylint: disable=import-outside-toplevel
+        from .classifier import Classifier
+        try:
+            tree, store = self.loader()
+            classifier = Classifier(tree, store, self.cache_size,
+                                    self.hot_fields, self.normalizer)
+        except BaseException as exception:  # pylint: disable=broad-except
+            with self._lock:
+                self._future = None
+            future.set_exception(exception)
+        else:
+            self._classifier = classifier
+            future.set_result(classifier)
@@ -0,0 +1,156 @@
+"""Binary file format for frozen trees, queried directly from a memory map.
+
+Loading a pickled tree means creating hundreds of thousands of objects in
+each process. Instead, a :class:`~browscapy.frozen.FrozenTree` is written to a
+file with its arrays as they are in memory, and :class:`MappedTree` uses them
+straight from a read-only memory map. Processes opening the same file share
+the operating system's page cache and start without deserialization.
+
+File layout (native byte order, 4-byte unsigned integers unless stated):
+
+- Header: magic ``b'BRCP'``, byte order mark ``0x01020304``, format version,
+  generation (see :class:`~browscapy.table.PropertiesTable`), number of
+  nodes (n), number of records (r) and text size in bytes;
+- Label byte offsets into the text (n + 1);
+- First children (n + 1);
+- Keys (n);
+- Records (n, signed);
+- Parents (n);
+- Record nodes (r);
+- UTF-8 text with all labels.
+"""
+import mmap
+import os
+import struct
+from array import array
+from typing import List, Literal, Optional, Tuple, cast
+
+from .frozen import FrozenTree
+
+#: int: Version of the file format. Incremented on incompatible changes.
+FORMAT_VERSION = 2
+
+_MAGIC = b'BRCP'
+_BYTE_ORDER_MARK = 0x01020304
+_HEADER = struct.Struct('=4sIIIIII')
+_ITEM_SIZE = 4
+
+# pylint: disable=invalid-name
+#: Typecode of the unsigned and signed integer sections
+Typecode = Literal['I', 'i']
+# pylint: enable=invalid-name
+
+
+def dump(tree: FrozenTree, path: str, generation: int = 0) -> None:
+    """Write a frozen tree to a file that :class:`MappedTree` can open.
+
+    The generation is the one of the table with the tree records. The file
+    is written to a temporary name first and then renamed, so processes
+    opening the path never see a partial file.
+    """
+    encoded_labels = [tree.label(node).encode()
+                      for node in range(len(tree.keys))]
+    byte_offsets = array('I', [0])
+    for label in encoded_labels:
+        byte_offsets.append(byte_offsets[-1] + len(label))
+    text = b''.join(encoded_labels)
+
+    header = _HEADER.pack(_MAGIC, _BYTE_ORDER_MARK, FORMAT_VERSION,
+                          generation, len(tree.keys), len(tree.record_nodes),
+                          len(text))
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as dump_file:
+        dump_file.write(header)
+        for values in (byte_offsets, tree.first_children, tree.keys,
+                       tree.records, tree.parents, tree.record_nodes):
+            # Arrays, or memory views of a mapped tree: both are buffers
+            dump_file.write(memoryview(cast('array[int]', values)).tobytes())
+        dump_file.write(text)
+    os.replace(tmp_path, path)
+
+
+class MappedTree(FrozenTree):
+    """Frozen tree whose arrays are views of a memory-mapped file.
+
+    Use :meth:`close` or a ``with`` statement to release the file.
+
+    Attributes:
+        generation (int): Generation of the table with the tree records.
+
+    """
+
+    def __init__(self, path: str) -> None:
+        """Map the file and create views of its sections."""
+        with open(path, 'rb') as tree_file:
+            self._mmap = mmap.mmap(tree_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        self._views: List[memoryview] = []
+        try:
+            generation, node_count, record_count, text_size = \
+                self._read_header(path)
+            sections: Tuple[Tuple[int, Typecode], ...] = (
+                (node_count + 1, 'I'), (node_count + 1, 'I'),
+                (node_count, 'I'), (node_count, 'i'),
+                (node_count, 'I'), (record_count, 'I'))
+            offset = _HEADER.size
+            size = sum(count for count, _ in sections) * _ITEM_SIZE
+            if offset + size + text_size != len(self._mmap):
+                raise ValueError(f'Truncated or corrupt tree file "{path}"')
+            arrays: List[memoryview] = []
+            for count, typecode in sections:
+                arrays.append(self._get_view(offset, count, typecode))
+                offset += count * _ITEM_SIZE
+        except Exception:
+            self.close()
+            raise
+        self._text_start = offset
+        # The text is decoded per label in :meth:`label`
+        super().__init__('', *arrays)
+        self.generation = generation
+
+    def _read_header(self, path: str) -> Tuple[int, int, int, int]:
+        """Validate the header, return the generation and section sizes."""
+        if len(self._mmap) < _HEADER.size:
+            raise ValueError(f'Not a browscapy tree file: "{path}"')
+        magic, byte_order_mark, version, generation, node_count, \
+            record_count, text_size = cast(
+                Tuple[bytes, int, int, int, int, int, int],
+                _HEADER.unpack_from(self._mmap))
+        if magic != _MAGIC:
+            raise ValueError(f'Not a browscapy tree file: "{path}"')
+        if byte_order_mark != _BYTE_ORDER_MARK:
+            raise ValueError(f'Tree file "{path}" has a different byte order')
+        if version != FORMAT_VERSION:
+            raise ValueError(f'Tree file "{path}" has format version '
+                             f'{version}, expected {FORMAT_VERSION}')
+        return generation, node_count, record_count, text_size
+
+    def _get_view(self, offset: int, count: int, typecode: Typecode) \
+            -> memoryview:
+        """Return a typed view of a file section, without copying it."""
+        view = memoryview(self._mmap)[offset:offset + count * _ITEM_SIZE]
+        self._views.append(view)
+        typed_view = view.cast(typecode)
+        self._views.append(typed_view)
+        return typed_view
+
+    def label(self, node: int) -> str:
+        """Return the pattern suffix of a node."""
+        start = self._text_start + self.label_offsets[node]
+        end = self._text_start + self.label_offsets[node + 1]
+        return self._mmap[start:end].decode()
+
+    def close(self) -> None:
+        """Release the views and the memory map."""
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._mmap.close()
+
+    def __enter__(self) -> 'MappedTree':
+        """Return self to be used in a ``with`` statement."""
+        return self
+
+    def __exit__(self, *_: Optional[object]) -> None:
+        """Close the file."""
+        self.close()
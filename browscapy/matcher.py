@@ -2,45 +2,200 @@
 
 This simplified matcher accepts the special characters "*" and "?" in the
 pattern, meaning any set of characters and a single character, respectively.
+
+Patterns can be compiled once (see :func:`compile`) into literal segments
+between stars, which are then found with C-level string methods.
 """
-from typing import Tuple
+from typing import Optional, Tuple
+
+# pylint: disable=invalid-name
+#: A segment between stars and, if it has question marks, its literal pieces
+#: and their offsets in the segment.
+Segment = Tuple[str, Optional[Tuple[Tuple[int, str], ...]]]
+# pylint: enable=invalid-name
 
 
 def match(pattern: str, string: str) -> Tuple[bool, int]:
     """Return whether string matches pattern, and chars in common.
 
     The common chars count is how many chars in the pattern match the
-    string, excluding "*" and "?".
+    string, excluding "*" and "?". Case is ignored.
+
+    Stars match any number of characters, as in :mod:`fnmatch`, by searching
+    the segments between stars from left to right (see :class:`Pattern`).
+    The leftmost position of a segment always leaves the most room for the
+    next ones, so there's no backtracking.
+    """
+    return Pattern(pattern).match(string.lower())
+
+
+def match_prefix(pattern: str, string: str) -> bool:
+    """Return whether pattern matches the beginning of string.
+
+    In other words, whether ``pattern + "*"`` matches string. A tree node can
+    only lead to a match if its pattern, which is a prefix of all its
+    descendants' patterns, matches the beginning of the user agent. Both
+    arguments must be lower case.
+    """
+    if '*' not in pattern and '?' not in pattern:
+        return string.startswith(pattern)
+    texts = pattern.split('*')
+    if not _match_at(_get_segment(texts[0]), string, 0):
+        return False
+    # The segments after stars, including the last one, are searched from
+    # left to right. The implicit trailing star matches the rest.
+    start = len(texts[0])
+    for text in texts[1:]:
+        if text:
+            position = _find(_get_segment(text), string, start, len(string))
+            if position < 0:
+                return False
+            start = position + len(text)
+    return True
+
+
+def has_precedence(score: int, pattern: str, other_score: int,
+                   other_pattern: str) -> bool:
+    """Return whether a matching pattern is better than another one.
+
+    The best pattern has the most characters in common with the user agent
+    (wildcards excluded). Ties are broken by the longest pattern and, to be
+    deterministic, by the lowest one in lexicographical order.
+    """
+    if score != other_score:
+        return score > other_score
+    if len(pattern) != len(other_pattern):
+        return len(pattern) > len(other_pattern)
+    return pattern < other_pattern
+
+
+class Pattern:
+    """Browscap pattern split into the literal segments between stars.
+
+    The first segment must be at the string beginning and the last one at its
+    end, unless the pattern has no star, when the only segment must be equal
+    to the string. The middle segments are searched from left to right.
+
+    Attributes:
+        pattern (str): Lower-case browscap pattern.
+        score (int): Number of characters that are not wildcards.
+
+    """
+
+    __slots__ = ('pattern', 'score', '_head', '_middle', '_tail',
+                 '_min_length')
+
+    def __init__(self, pattern: str) -> None:
+        """Split the pattern in segments."""
+        self.pattern = pattern = pattern.lower()
+        self.score = len(pattern) - pattern.count('*') - pattern.count('?')
+        self._min_length = len(pattern) - pattern.count('*')
+        segments = pattern.split('*')
+        self._head = _get_segment(segments[0])
+        #: Optional[Segment]: None if there's no star
+        self._tail = _get_segment(segments[-1]) if len(segments) > 1 \
+            else None
+        self._middle = tuple(_get_segment(segment)
+                             for segment in segments[1:-1] if segment)
+
+    def __eq__(self, other: object) -> bool:
+        """Compiled patterns are equal if their patterns are."""
+        return isinstance(other, Pattern) and other.pattern == self.pattern
+
+    def __hash__(self) -> int:
+        """Hash the pattern."""
+        return hash(self.pattern)
+
+    def match(self, string: str) -> Tuple[bool, int]:
+        """Return whether a lower-case string matches and chars in common.
+
+        Same as :func:`match`, but the string is not converted to lower case.
+        """
+        head, tail = self._head, self._tail
+        if len(string) < self._min_length \
+                or (tail is None and len(string) != len(head[0])) \
+                or not _match_at(head, string, 0):
+            return False, _count_common(head[0], string)
+
+        if tail is None:
+            return True, self.score
+        end = len(string) - len(tail[0])
+        if not _match_at(tail, string, end):
+            return False, _count_literals(head[0])
+
+        start = len(head[0])
+        for segment in self._middle:
+            position = _find(segment, string, start, end)
+            if position < 0:
+                return False, _count_literals(head[0])
+            start = position + len(segment[0])
+        return True, self.score
+
+    def __repr__(self) -> str:
+        """Show the pattern."""
+        return f'Pattern({self.pattern!r})'
+
+
+def compile(pattern: str) -> Pattern:  # pylint: disable=redefined-builtin
+    """Return a compiled pattern, faster to match many times."""
+    return Pattern(pattern)
+
+
+def _get_segment(text: str) -> Segment:
+    """Return a segment with the pieces between its question marks."""
+    if '?' not in text:
+        return text, None
+    pieces = []
+    start = 0
+    for piece in text.split('?'):
+        if piece:
+            pieces.append((start, piece))
+        start += len(piece) + 1
+    return text, tuple(pieces)
+
+
+def _match_at(segment: Segment, string: str, position: int) -> bool:
+    """Return whether segment is found at position of string."""
+    text, pieces = segment
+    if pieces is None:
+        return string.startswith(text, position)
+    return position + len(text) <= len(string) and all(
+        string.startswith(piece, position + offset)
+        for offset, piece in pieces)
+
+
+def _find(segment: Segment, string: str, start: int, end: int) -> int:
+    """Return the first segment position between start and end, or -1.
+
+    The whole segment must be between start and end.
     """
-    chars_matched, pat_i, str_i = 0, 0, 0
-    string = string.lower()
-
-    while pat_i < len(pattern) and str_i < len(string):
-        pat_char = pattern[pat_i]
-        str_char = string[str_i]
-        if pat_char == '*':
-            next_pat_i = pat_i + 1
-            pat_i -= 1  # By default, match * again in the next iteration
-            if next_pat_i < len(pattern):  # Check the next (non-*) char
-                next_pat_char = pattern[next_pat_i]
-                if next_pat_char == str_char:  # There's a match after *
-                    # Compute a future match
-                    chars_matched += 1
-                    pat_i += 2  # Next iter will match the 2nd char after *
-        elif pat_char == str_char:
-            chars_matched += 1
-        elif pat_char != '?':  # Don't count '?' as a matching character
+    text, pieces = segment
+    if pieces is None:
+        return string.find(text, start, end)
+    last = end - len(text)  # Last possible position
+    if not pieces:  # Only question marks
+        return start if start <= last else -1
+    # Search the first piece and check the others
+    first_offset, first_piece = pieces[0]
+    position = string.find(first_piece, start + first_offset, end)
+    while 0 <= position and position - first_offset <= last:
+        if _match_at(segment, string, position - first_offset):
+            return position - first_offset
+        position = string.find(first_piece, position + 1, end)
+    return -1
+
+
+def _count_common(pattern: str, string: str) -> int:
+    """Return how many literal chars match from the beginning."""
+    count = 0
+    for pat_char, str_char in zip(pattern, string):
+        if pat_char == str_char:
+            count += 1
+        elif pat_char != '?':
             break
-        # Always move both indexes
-        pat_i += 1
-        str_i += 1
-
-    # There's a match if the string is over and:
-    # - The pattern is also over; or
-    # - The rest of the pattern is only a star
-    does_match = (str_i == len(string)
-                  and (pat_i == len(pattern)
-                       or (pat_i < len(pattern)
-                           and pattern[pat_i] == '*')))
-
-    return does_match, chars_matched
+    return count
+
+
+def _count_literals(text: str) -> int:
+    """Return the number of characters that are not question marks."""
+    return len(text) - text.count('?')
@@ -14,55 +14,81 @@ The properties above allow a fast search by descending the only sibling
 having a substring of the new node's patterns.
 """
 from abc import ABC, abstractmethod
-from shelve import DbfilenameShelf
-from typing import List, Union, cast
+from bisect import bisect_left
+from itertools import islice
+from typing import (TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional,
+                    Sequence, Tuple, Union, cast)
 
+from .matcher import compile as compile_pattern
+from .matcher import has_precedence, match_prefix
 from .properties import Properties
+from .storage import Store
+
+if TYPE_CHECKING:
+    from .frozen import FrozenTree  # pylint: disable=cyclic-import
 
 # pylint: disable=invalid-name
 # Due to list invariance.
 NodeList = List[Union['Node', 'PartialPattern', 'FullPattern']]
+NodeDict = Dict[str, Union['Node', 'PartialPattern', 'FullPattern']]
 # pylint: enable=invalid-name
 
+#: str: Greater than any character, to find strings starting with a prefix.
+_MAX_CHAR = chr(0x10ffff)
+
 
 class SearchResult:
     """Store the best result while searching a new node's parent.
 
-    The class variables prevent sending parameters in several calls, including
-    recursive ones. As we don't use multiple threads or process, this is safe.
-    """
+    Each search has its own instance, so trees can be built by different
+    threads at the same time.
 
-    #: int: Number of characters in common since the pattern beginning.
-    score: int
-    #: Parent: The proper parent for a new node.
-    parent: 'Parent'
-    #: Parent: The grandparent of the new node.
-    grandparent: 'Parent'
+    Attributes:
+        score (int): Number of characters in common since the pattern
+            beginning.
+        parent (Parent): The proper parent for a new node.
+        grandparent (Parent): The grandparent of the new node.
 
-    @classmethod
-    def reset(cls, parent: 'Parent') -> None:
-        """Prepare for a search."""
-        cls.parent = parent
-        cls.grandparent = None
-        cls.score = 0
+    """
 
-    @classmethod
-    def update(cls, extra_score: int, parent: 'Node', grandparent: 'Parent') \
-            -> None:
+    def __init__(self, parent: 'Parent') -> None:
+        """Prepare for a search starting at parent."""
+        self.score = 0
+        self.parent = parent
+        self.grandparent: Optional['Parent'] = None
+
+    def update(self, extra_score: int, parent: 'Node',
+               grandparent: 'Parent') -> None:
         """Update a result."""
-        cls.score += extra_score
-        cls.parent, cls.grandparent = parent, grandparent
+        self.score += extra_score
+        self.parent, self.grandparent = parent, grandparent
 
 
 class Parent(ABC):
-    """Have a Node list as children."""
+    """Have Node children indexed by the first character they differ.
+
+    Siblings share the same :attr:`prefix_length` first characters and differ
+    in the next one, which is their key in :attr:`children_by_char`.
+    """
 
-    def __init__(self, children: NodeList = None) -> None:
+    def __init__(self, children: Optional[NodeList] = None) -> None:
         """Initialize children."""
-        self.children = children or []
+        self.children_by_char: NodeDict = {}
+        for child in children or []:
+            self.put_child(child)
+
+    @property
+    def children(self) -> NodeList:
+        """Return the children in insertion order."""
+        return list(self.children_by_char.values())
+
+    @property
+    def prefix_length(self) -> int:
+        """Return the number of characters all children have in common."""
+        return 0
 
     @abstractmethod
-    def add_child(self, child: 'FullPattern', parent: 'Parent') -> None:
+    def add_child(self, child: 'FullPattern', result: SearchResult) -> None:
         """Add a child as one of this node's children.
 
         You should probably use :meth:`add_node` so the new node can be a
@@ -70,31 +96,84 @@ class Parent(ABC):
         """
         pass  # pragma: no cover
 
-    def find_parent(self, node: 'Node') -> None:
-        """Return the proper parent Node for a new node.
+    def find_parent(self, node: 'Node') -> SearchResult:
+        """Return the search result with the proper parent for a new node.
 
-        Recursively search for the node's parent. The best match has the most
-        characters in common (from the beginning, consecutive) and, as a second
-        criteria, it's the shortest string (closer to the root).
+        Iteratively descend the only child sharing the next character with the
+        node's pattern. The best match has the most characters in common (from
+        the beginning, consecutive) and, as a second criteria, it's the
+        shortest string (closer to the root).
         """
-        for child in self.children:
-            extra_score: int = child.get_score(node.pattern)
-            if extra_score > 0:
-                SearchResult.update(extra_score, child, self)
-                SearchResult.parent.find_parent(node)
+        result = SearchResult(self)
+        pattern = node.pattern
+        parent: Parent = self
+        while True:
+            child = parent.get_child(pattern, result.score)
+            if child is None:
                 break
+            extra_score = child.get_score(pattern, result.score)
+            result.update(extra_score, child, parent)
+            if result.score < len(child.pattern):
+                break  # Patterns differ before the child's pattern ends
+            parent = child
+        return result
+
+    def get_child(self, pattern: str, start: int) -> Optional['Node']:
+        """Return the child sharing the character at start, if any.
+
+        All children share the characters before start, which is the length
+        of this node's pattern, and siblings differ in the next one.
+        """
+        if start < len(pattern):
+            return self.children_by_char.get(pattern[start])
+        return None
+
+    def put_child(self, child: 'Node') -> None:
+        """Add a child or replace the one with the same key.
+
+        A replaced child keeps its position among its siblings.
+        """
+        self.children_by_char[child.pattern[self.prefix_length]] = child
+
+    def get_candidates(self, user_agent: str, literal: bool) \
+            -> Iterator['Node']:
+        """Yield the children that may match a lower-case user agent.
+
+        If this node's pattern has no wildcard (literal), only the children
+        with the same user agent's character or a wildcard are yielded.
+        Otherwise, the user agent position is unknown and all children are
+        yielded.
+        """
+        if not literal:
+            yield from self.children_by_char.values()
+            return
+        keys: Tuple[str, ...] = ('*', '?')
+        position = self.prefix_length
+        if position < len(user_agent):
+            char = user_agent[position]
+            keys += (char, char.upper()) if char.upper() != char else (char,)
+        for key in keys:
+            child = self.children_by_char.get(key)
+            if child is not None:
+                yield child
 
 
 class Node(Parent):
     """A Node contains a pattern and others nodes as children."""
 
-    def __init__(self, pattern: str, children: NodeList = None) -> None:
+    def __init__(self, pattern: str,
+                 children: Optional[NodeList] = None) -> None:
         """Assign pattern and optional children."""
-        super().__init__(children)
         self.pattern = pattern
+        super().__init__(children)
+
+    @property
+    def prefix_length(self) -> int:
+        """Return the pattern length, which all children start with."""
+        return len(self.pattern)
 
     @abstractmethod
-    def add_child(self, child: 'FullPattern', parent: Parent) -> None:
+    def add_child(self, child: 'FullPattern', result: SearchResult) -> None:
         """Add a child as one of this node's children and return result.
 
         You should probably use :meth:`add_node` so the new node can be a
@@ -103,10 +182,12 @@ class Node(Parent):
         """
         pass  # pragma: no cover
 
-    def get_score(self, pattern: str) -> int:
-        """Return the increase in the number of common characters."""
+    def get_score(self, pattern: str, start: int) -> int:
+        """Return the increase in the number of common characters.
+
+        Both patterns are known to be equal before the start index.
+        """
         length = 0
-        start = SearchResult.score
         for char1, char2 in zip(self.pattern[start:], pattern[start:]):
             if char1 != char2:
                 break
@@ -119,29 +200,61 @@ class FullPattern(Node):
 
     Attributes:
         properties (Properties): Browscap properties.
+        record (int): Properties record id in the store.
+        store (Store): Properties of the node's record, by default
+            :attr:`DATABASE`.
+        compiled (Pattern): Compiled pattern for faster matching.
         children (List[Node]): Children nodes.
         pattern (str): Browscap pattern.
 
     """
 
-    DATABASE: DbfilenameShelf
+    #: Store: Default store of all nodes.
+    DATABASE: Store
+    # Store of this node, if not the default one
+    _store: Optional[Store] = None
+
+    def __init__(self, properties: Properties,
+                 store: Optional[Store] = None) -> None:
+        """Build a node from a browscap pattern string.
 
-    def __init__(self, properties: Properties) -> None:
-        """Build a node from a browscap pattern string."""
+        The properties are appended to the store, by default
+        :attr:`DATABASE`.
+        """
         super().__init__(properties.PropertyName)
-        self.properties = properties
+        if store is not None:
+            self._store = store
+        self.record = self.store.append(properties)
+        self.compiled = compile_pattern(self.pattern)
+
+    @classmethod
+    def from_record(cls, pattern: str, record: int,
+                    store: Optional[Store] = None) -> 'FullPattern':
+        """Build a node for properties already in the store."""
+        node = cls.__new__(cls)
+        Node.__init__(node, pattern)
+        if store is not None:
+            node._store = store  # pylint: disable=protected-access
+        node.record = record
+        node.compiled = compile_pattern(pattern)
+        return node
+
+    @property
+    def store(self) -> Store:
+        """Return the store of this node's properties."""
+        return self.DATABASE if self._store is None else self._store
 
     @property
     def properties(self) -> Properties:
-        """Return properties from database."""
-        return cast(Properties, self.DATABASE[self.pattern])
+        """Return properties from the store."""
+        return self.store[self.record]
 
     @properties.setter
     def properties(self, value: Properties) -> None:
-        """Store properties in database."""
-        self.DATABASE[self.pattern] = value
+        """Store properties."""
+        self.store[self.record] = value
 
-    def add_child(self, child: 'FullPattern', parent: Parent) -> None:
+    def add_child(self, child: 'FullPattern', result: SearchResult) -> None:
         """Add the child. May create a new PartialPattern node.
 
         For example, when a pattern 'ab' is added to pattern 'ac', a new
@@ -152,40 +265,47 @@ class FullPattern(Node):
             raise ValueError(msg)
 
         # From now on, patterns are different
-        if SearchResult.score == len(self.pattern):
+        if result.score == len(self.pattern):
             # Self's pattern is contained in child's, so we add a new child.
-            self.children.append(child)
+            self.put_child(child)
+        elif result.score == len(child.pattern):
+            # Child's pattern is contained in self's, so self is a grandchild.
+            child.put_child(self)
+            cast(Parent, result.grandparent).put_child(child)
         else:  # They have a non-empty difference
-            self._create_partial_pattern(child, parent)
+            self._create_partial_pattern(child, result)
 
-    def _create_partial_pattern(self, child: 'FullPattern', parent: Parent) \
-            -> None:
+    def _create_partial_pattern(self, child: 'FullPattern',
+                                result: SearchResult) -> None:
         """Create partial pattern as a parent node with the common chars."""
-        common_prefix = child.pattern[:SearchResult.score]
+        common_prefix = child.pattern[:result.score]
         children: NodeList = [self, child]
         partial_pattern = PartialPattern(common_prefix, children)
         # Replace self by the new PartialPattern
-        parent.children.remove(self)
-        parent.children.append(partial_pattern)
+        cast(Parent, result.grandparent).put_child(partial_pattern)
 
 
 class PartialPattern(Node):
     """Partial browscap pattern in common with children."""
 
-    def add_child(self, child: FullPattern, parent: Parent) -> None:
+    def add_child(self, child: FullPattern, result: SearchResult) -> None:
         """Add a child node. If patterns are equal, create a FullPattern.
 
         When this partial node's pattern and child's are the same, this node
         is replaced by FullPattern node.
         """
-        # Assume that child's pattern size >= self's
-        if SearchResult.score == len(self.pattern):
+        grandparent = cast(Parent, result.grandparent)
+        if result.score == len(self.pattern):
             if len(child.pattern) == len(self.pattern):
-                self._become_full_pattern(child, parent)
+                self._become_full_pattern(child, grandparent)
             else:  # > (child has a suffix)
-                self.children.append(child)
+                self.put_child(child)
+        elif result.score == len(child.pattern):
+            # Child's pattern is contained in self's, so self is a grandchild.
+            child.put_child(self)
+            grandparent.put_child(child)
         else:  # New PartialPattern
-            self._split_pattern(child)
+            self._split_pattern(child, result)
 
     def _become_full_pattern(self, full_pattern: FullPattern,
                              parent: Parent) -> None:
@@ -194,31 +314,222 @@ class PartialPattern(Node):
         Add self's children to full_pattern, then replace self with
         full_pattern in the parent children list.
         """
-        full_pattern.children.extend(self.children)
-        parent.children.remove(self)
-        parent.children.append(full_pattern)
+        # Same pattern, so same keys
+        full_pattern.children_by_char.update(self.children_by_char)
+        parent.put_child(full_pattern)
 
-    def _split_pattern(self, full_pattern: FullPattern) -> None:
+    def _split_pattern(self, full_pattern: FullPattern,
+                       result: SearchResult) -> None:
         """Create a new PartialPattern parent with a smaller pattern size.
 
         This node will be the parent and its copy and full_pattern, the
         children.
         """
-        self_copy = PartialPattern(self.pattern, self.children)
-        smaller_prefix = self.pattern[:SearchResult.score]
+        self_copy = PartialPattern(self.pattern)
+        # Same pattern, so same keys
+        self_copy.children_by_char = self.children_by_char
+        smaller_prefix = self.pattern[:result.score]
         self.pattern = smaller_prefix
-        self.children = [self_copy, full_pattern]
+        self.children_by_char = {}
+        self.put_child(self_copy)
+        self.put_child(full_pattern)
 
 
 class Tree(Parent):
-    """Store nodes to match user agents. In other words, the root node."""
+    """Store nodes to match user agents. In other words, the root node.
+
+    Attributes:
+        store (Store): Properties of the nodes added by
+            :meth:`add_properties`, or None for :attr:`FullPattern.DATABASE`.
+
+    """
+
+    def __init__(self, children: Optional[NodeList] = None,
+                 store: Optional[Store] = None) -> None:
+        """Create a tree whose nodes may have their own store."""
+        super().__init__(children)
+        self.store = store
+
+    def add_properties(self, properties: Properties) -> FullPattern:
+        """Store properties and add a node for their pattern."""
+        node = FullPattern(properties, self.store)
+        self.add_node(node)
+        return node
 
     def add_node(self, node: FullPattern) -> None:
         """Search for the proper parent and add node as its child."""
-        SearchResult.reset(parent=self)
-        self.find_parent(node)
-        SearchResult.parent.add_child(node, SearchResult.grandparent)
+        result = self.find_parent(node)
+        result.parent.add_child(node, result)
+
+    def add_subtree(self, root: Node) -> None:
+        """Add a node that may have children, like :meth:`add_node` does.
+
+        Root's pattern must not be a prefix of patterns already in the tree,
+        unless root has no children, so root's descendants are still in the
+        right place. This is the case for subtrees built from the partitions
+        of :func:`browscapy.build.partition`.
+        """
+        result = self.find_parent(root)
+        result.parent.add_child(cast(FullPattern, root), result)
+
+    def add_child(self, child: Node, result: SearchResult) -> None:
+        """Add child to the root level."""
+        self.put_child(child)
+
+    def remove_node(self, pattern: str) -> FullPattern:
+        """Remove and return the FullPattern with the given pattern.
+
+        The tree becomes the same as if the pattern had never been added, so
+        PartialPattern nodes left with a single child are removed too.
 
-    def add_child(self, child: Node, parent: Parent) -> None:
-        """Append child to children list."""
-        self.children.append(child)
+        Raises:
+            KeyError: There is no FullPattern with this pattern.
+
+        """
+        # Ancestors of the node, from the root
+        path: List[Parent] = [self]
+        node = self.get_child(pattern, 0)
+        while node is not None and node.pattern != pattern:
+            if not pattern.startswith(node.pattern):
+                raise KeyError(pattern)
+            path.append(node)
+            node = node.get_child(pattern, len(node.pattern))
+        if not isinstance(node, FullPattern):
+            raise KeyError(pattern)
+
+        parent = path[-1]
+        children = node.children
+        if len(children) > 1:
+            partial_pattern = PartialPattern(pattern)
+            partial_pattern.children_by_char = node.children_by_char
+            parent.put_child(partial_pattern)
+        elif children:
+            parent.put_child(children[0])
+        else:
+            del parent.children_by_char[pattern[parent.prefix_length]]
+            if isinstance(parent, PartialPattern) \
+                    and len(parent.children_by_char) == 1:
+                # Replace the parent by its only child
+                path[-2].put_child(parent.children[0])
+        node.children_by_char = {}
+        return node
+
+    def freeze(self, token_index: bool = False,
+               prefix_filter: bool = False) -> 'FrozenTree':
+        """Return a compact and read-only copy of this tree for lookups.
+
+        Args:
+            token_index: Index the patterns starting with a wildcard by
+                literal substrings (see :meth:`FrozenTree.build_index`).
+            prefix_filter: Filter the heads of the other patterns (see
+                :meth:`FrozenTree.build_prefix_filter`).
+
+        """
+        # pylint: disable=cyclic-import
+        from .frozen import FrozenTree
+        frozen = FrozenTree.from_tree(self)
+        if token_index:
+            frozen.build_index()
+        if prefix_filter:
+            frozen.build_prefix_filter()
+        return frozen
+
+    def lookup(self, user_agent: str) -> Optional[FullPattern]:
+        """Return the FullPattern that best matches user_agent, if any.
+
+        Only the branches whose pattern matches the beginning of the user
+        agent are visited, because a child pattern always starts with its
+        parent's. See :func:`has_precedence` for the best pattern criteria.
+        """
+        user_agent = user_agent.lower()
+        best: Optional[FullPattern] = None
+        best_score, best_pattern = -1, ''
+        # Nodes matching the user agent beginning and whether their patterns
+        # have no wildcard
+        nodes: List[Tuple[Parent, bool]] = [(self, True)]
+
+        while nodes:
+            parent, literal = nodes.pop()
+            for node in parent.get_candidates(user_agent, literal):
+                pattern = node.pattern.lower()
+                if not match_prefix(pattern, user_agent):
+                    continue  # No descendant can match
+                if isinstance(node, FullPattern):
+                    does_match, score = node.compiled.match(user_agent)
+                    if does_match and has_precedence(score, pattern,
+                                                     best_score, best_pattern):
+                        best, best_score, best_pattern = node, score, pattern
+                suffix = pattern[parent.prefix_length:]
+                nodes.append((node, literal and '*' not in suffix
+                              and '?' not in suffix))
+
+        return best
+
+    def lookup_many(self, user_agents: Iterable[str],
+                    chunk_size: int = 10000) \
+            -> Iterator[Optional[FullPattern]]:
+        """Yield the best pattern of each user agent, in the same order.
+
+        Same results as :meth:`lookup`, but each chunk of user agents is
+        deduplicated, sorted and searched together. While a pattern has no
+        wildcards, the user agents starting with it are a range of the sorted
+        list, found by binary search, so shared prefixes are compared once per
+        chunk instead of once per user agent.
+        """
+        iterator = iter(user_agents)
+        chunk = list(islice(iterator, chunk_size))
+        while chunk:
+            lower_chunk = [user_agent.lower() for user_agent in chunk]
+            sorted_user_agents = sorted(set(lower_chunk))
+            best = self._lookup_sorted(sorted_user_agents)
+            positions = {user_agent: position for position, user_agent
+                         in enumerate(sorted_user_agents)}
+            for user_agent in lower_chunk:
+                yield best[positions[user_agent]]
+            chunk = list(islice(iterator, chunk_size))
+
+    def _lookup_sorted(self, user_agents: List[str]) \
+            -> List[Optional[FullPattern]]:
+        """Return the best pattern of each sorted lower-case user agent."""
+        best: List[Optional[FullPattern]] = [None] * len(user_agents)
+        best_scores = [-1] * len(user_agents)
+        best_patterns = [''] * len(user_agents)
+        # Nodes, whether their patterns have no wildcard and the positions of
+        # the user agents that match their beginning. The positions are a
+        # range while the pattern has no wildcards.
+        nodes: List[Tuple[Parent, bool, Sequence[int]]] = [
+            (self, True, range(len(user_agents)))]
+
+        while nodes:
+            parent, literal, positions = nodes.pop()
+            for node in parent.get_candidates('', False):
+                pattern = node.pattern.lower()
+                suffix = pattern[parent.prefix_length:]
+                node_literal = literal and '*' not in suffix \
+                    and '?' not in suffix
+                if node_literal:
+                    parent_range = cast(range, positions)
+                    start = bisect_left(user_agents, pattern,
+                                        parent_range.start, parent_range.stop)
+                    end = bisect_left(user_agents, pattern + _MAX_CHAR, start,
+                                      parent_range.stop)
+                    node_positions: Sequence[int] = range(start, end)
+                else:
+                    node_positions = [
+                        position for position in positions
+                        if match_prefix(pattern, user_agents[position])]
+                if not node_positions:
+                    continue  # No descendant can match
+                if isinstance(node, FullPattern):
+                    for position in node_positions:
+                        does_match, score = node.compiled.match(
+                            user_agents[position])
+                        if does_match and has_precedence(
+                                score, pattern, best_scores[position],
+                                best_patterns[position]):
+                            best[position] = node
+                            best_scores[position] = score
+                            best_patterns[position] = pattern
+                nodes.append((node, node_literal, node_positions))
+
+        return best
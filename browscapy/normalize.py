@@ -0,0 +1,65 @@
+"""Rewrite user agents so that their variants share a cache entry.
+
+Real traffic has many variants of the same user agent: different case,
+repeated spaces or tokens that change on every install or session, like
+GUIDs. They all have the same properties, but each one is a cache miss.
+:class:`Normalizer` lower-cases the user agent, applies its :class:`Rule`
+objects and collapses whitespace before the cache and the lookup.
+
+Rules should only remove text that no pattern needs. Replacing a volatile
+token by its fixed prefix, e.g. ``build/kot49h`` by ``build/``, keeps the
+matches of patterns with a star after the prefix.
+"""
+import re
+from typing import NamedTuple, Pattern, Sequence
+
+
+class Rule(NamedTuple):  # pylint: disable=too-few-public-methods
+    """Replace the matches of a regular expression in lower-case text."""
+
+    regex: Pattern[str]
+    replacement: str
+
+
+def rule(expression: str, replacement: str = '') -> Rule:
+    """Compile a rule, by default removing the matches."""
+    return Rule(re.compile(expression), replacement)
+
+
+#: Rule: Remove GUIDs, with or without braces.
+GUID_RULE = rule(r'\{?[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-'
+                 r'[0-9a-f]{12}\}?')
+#: Rule: Keep only "build/" of Android build ids, e.g. "build/kot49h".
+BUILD_ID_RULE = rule(r'(build/)[^;)\s]+', r'\1')
+#: Tuple[Rule, ...]: Rules of :class:`Normalizer` by default.
+DEFAULT_RULES = (GUID_RULE,)
+
+
+class Normalizer:
+    """Canonical form of user agents for caching and lookup.
+
+    Backends ignore case and whitespace runs are rare in patterns, so
+    user agents that differ only in those have the same result.
+
+    Attributes:
+        rules (Tuple[Rule, ...]): Applied in order to the lower-case user
+            agent.
+        collapse_whitespace (bool): Whether to strip the user agent and
+            replace whitespace runs by a single space, after the rules.
+
+    """
+
+    def __init__(self, rules: Sequence[Rule] = DEFAULT_RULES,
+                 collapse_whitespace: bool = True) -> None:
+        """Apply rules and, optionally, collapse whitespace."""
+        self.rules = tuple(rules)
+        self.collapse_whitespace = collapse_whitespace
+
+    def __call__(self, user_agent: str) -> str:
+        """Return the canonical form of user_agent."""
+        user_agent = user_agent.lower()
+        for regex, replacement in self.rules:
+            user_agent = regex.sub(replacement, user_agent)
+        if self.collapse_whitespace:
+            user_agent = ' '.join(user_agent.split())
+        return user_agent
@@ -0,0 +1,321 @@
+"""Share one loaded database among many processes through a Unix socket.
+
+The server loads the tree and the properties once and answers batches of user
+agents. Clients only keep sockets, so many worker processes can classify user
+agents with the memory of one database.
+
+Protocol (big-endian). Each message is a frame:
+
+- Header: request id and body size (4-byte unsigned integers);
+- Body: a list of items, i.e., the number of items (2-byte unsigned integer)
+  followed by each item size (4-byte unsigned integer) and bytes.
+
+A request body lists UTF-8 user agents. The response has the same request id
+and lists, for each user agent, its encoded properties or an empty item if no
+pattern matches. Encoded properties are a list of UTF-8 values in
+:class:`~browscapy.properties.Properties` order.
+
+Requests on a connection are answered in order, so a client can send up to
+:data:`MAX_PIPELINE` requests before reading the responses (pipelining).
+"""
+import argparse
+import asyncio
+import os
+import socket
+import struct
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from itertools import islice
+from queue import Empty, Full, LifoQueue
+from threading import Lock
+from typing import (Awaitable, Iterable, Iterator, List, Optional, Sequence,
+                    Tuple, cast)
+
+from .cache import LRUCache
+from .classifier import Backend
+from .database import load
+from .properties import Properties
+from .storage import Store
+
+#: str: Default socket path, in the database folder.
+SOCKET_PATH = os.path.join(os.path.expanduser('~'), '.browscapy', 'socket')
+#: int: Maximum number of user agents in a request.
+MAX_BATCH = (1 << 16) - 1
+#: int: Maximum number of requests sent on a connection before reading.
+MAX_PIPELINE = 64
+
+_HEADER = struct.Struct('!II')
+_COUNT = struct.Struct('!H')
+_SIZE = struct.Struct('!I')
+
+
+def pack(items: Sequence[bytes]) -> bytes:
+    """Encode a list of items as a message body."""
+    if len(items) > MAX_BATCH:
+        raise ValueError(f'At most {MAX_BATCH} items per message')
+    parts = [_COUNT.pack(len(items))]
+    for item in items:
+        parts.append(_SIZE.pack(len(item)))
+        parts.append(item)
+    return b''.join(parts)
+
+
+def unpack(body: bytes) -> List[bytes]:
+    """Decode a message body into its list of items."""
+    count, = cast(Tuple[int], _COUNT.unpack_from(body))
+    offset = _COUNT.size
+    items = []
+    for _ in range(count):
+        size, = cast(Tuple[int], _SIZE.unpack_from(body, offset))
+        offset += _SIZE.size
+        items.append(body[offset:offset + size])
+        offset += size
+    if offset != len(body):
+        raise ValueError('Malformed message body')
+    return items
+
+
+class Server:
+    """Answer lookup requests with a tree and a properties table.
+
+    Attributes:
+        tree (Backend): Returns the record of a user agent.
+        table (Store): Properties of each record.
+        cache (LRUCache): Encoded properties of recent user agents.
+        executor (Executor): Answers the requests, so that the event loop
+            keeps reading and writing. None means the event loop's default
+            thread pool.
+
+    """
+
+    def __init__(self, tree: Backend, table: Store,
+                 cache_size: int = 65536,
+                 executor: Optional[Executor] = None) -> None:
+        """Serve lookups in tree, caching cache_size user agents."""
+        self.tree = tree
+        self.table = table
+        self.cache: LRUCache[bytes, bytes] = LRUCache(cache_size)
+        self.executor = executor
+        #: Encoded properties of recent records
+        self._records: LRUCache[int, bytes] = LRUCache(cache_size)
+
+    def answer(self, body: bytes) -> bytes:
+        """Return the response body for a request body."""
+        return pack([self._encode(user_agent)
+                     for user_agent in unpack(body)])
+
+    def _encode(self, user_agent: bytes) -> bytes:
+        """Return the encoded properties of an encoded user agent."""
+        encoded = self.cache.get(user_agent)
+        if encoded is None:
+            record = self.tree.lookup(user_agent.decode())
+            if record is None:
+                encoded = b''
+            else:
+                encoded = self._records.get(record)
+                if encoded is None:
+                    encoded = pack(
+                        [value.encode() for value in self.table[record]])
+                    self._records.put(record, encoded)
+            self.cache.put(user_agent, encoded)
+        return encoded
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        """Answer the requests of a connection until it is closed.
+
+        Requests are read while the previous ones are answered and written.
+        Otherwise, a client sending requests before reading would fill both
+        socket buffers and wait for a server waiting for it.
+        """
+        loop = asyncio.get_running_loop()
+        # Request ids and their future response bodies, in order, and then
+        # None if the client has no more requests
+        answers: 'asyncio.Queue[Optional[Tuple[int, Awaitable[bytes]]]]' \
+            = asyncio.Queue()
+        # Requests read but not written yet
+        slots = asyncio.Semaphore(MAX_PIPELINE)
+        write_task = asyncio.ensure_future(
+            self._write(answers, slots, writer))
+        try:
+            while True:
+                header = await reader.readexactly(_HEADER.size)
+                request_id, size = cast(Tuple[int, int],
+                                        _HEADER.unpack(header))
+                body = await reader.readexactly(size)
+                await slots.acquire()
+                if write_task.done():
+                    return  # The connection is broken
+                answers.put_nowait((request_id, loop.run_in_executor(
+                    self.executor, self.answer, body)))
+        except asyncio.IncompleteReadError as error:
+            if not error.partial:  # Closed between requests
+                answers.put_nowait(None)
+                await write_task
+        except ConnectionError:
+            pass
+        finally:
+            write_task.cancel()
+            writer.close()
+
+    @staticmethod
+    async def _write(
+            answers: 'asyncio.Queue[Optional[Tuple[int, Awaitable[bytes]]]]',
+            slots: asyncio.Semaphore, writer: asyncio.StreamWriter) -> None:
+        """Write the responses in order and free their slots.
+
+        The connection is closed when a request is not in the protocol.
+        """
+        try:
+            while True:
+                answer = await answers.get()
+                if answer is None:
+                    return
+                request_id, future = answer
+                body = await future
+                writer.write(_HEADER.pack(request_id, len(body)) + body)
+                await writer.drain()
+                slots.release()
+        except (ConnectionError, ValueError, struct.error,
+                UnicodeDecodeError):
+            pass  # Closed by the client or not speaking the protocol
+        finally:
+            writer.close()
+            slots.release()  # The reader may wait for a slot
+
+    async def serve(self, path: str = SOCKET_PATH) -> None:
+        """Listen on a Unix socket forever."""
+        if os.path.exists(path):
+            os.remove(path)
+        server = await asyncio.start_unix_server(self.handle, path)
+        async with server:
+            await server.serve_forever()
+
+
+class Client:
+    """Thread-safe client keeping a pool of connections to a server.
+
+    Connections are created when needed and reused. Up to pool_size idle
+    connections are kept open.
+    """
+
+    def __init__(self, path: str = SOCKET_PATH, pool_size: int = 4,
+                 timeout: Optional[float] = 10.0) -> None:
+        """Connect to the server at path when the first lookup is made."""
+        self.path = path
+        self.timeout = timeout
+        self._pool: 'LifoQueue[socket.socket]' = LifoQueue(pool_size)
+        self._lock = Lock()
+        self._next_id = 0
+
+    def lookup(self, user_agent: str) -> Optional[Properties]:
+        """Return the properties of the best pattern for user_agent, if any."""
+        return self.lookup_many([user_agent])[0]
+
+    def lookup_many(self, user_agents: Iterable[str],
+                    batch_size: int = 1000, window: int = 8) \
+            -> List[Optional[Properties]]:
+        """Return the properties of each user agent, in the same order.
+
+        User agents are sent in batches of batch_size. Up to window batches
+        are sent before reading their responses.
+        """
+        batch_size = min(batch_size, MAX_BATCH)
+        window = min(window, MAX_PIPELINE)
+        iterator = iter(user_agents)
+        results: List[Optional[Properties]] = []
+        with self._connect() as connection:
+            # Request ids waiting for responses, in order
+            in_flight: List[int] = []
+            batch = list(islice(iterator, batch_size))
+            while batch or in_flight:
+                if batch and len(in_flight) < window:
+                    in_flight.append(self._send(connection, batch))
+                    batch = list(islice(iterator, batch_size))
+                    continue
+                results.extend(self._receive(connection, in_flight.pop(0)))
+        return results
+
+    def close(self) -> None:
+        """Close the idle connections."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                return
+
+    @contextmanager
+    def _connect(self) -> Iterator[socket.socket]:
+        """Borrow a connection and return it to the pool if it still works.
+
+        A connection with an error may have unread responses, so it is
+        closed.
+        """
+        try:
+            connection = self._pool.get_nowait()
+        except Empty:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.timeout)
+            connection.connect(self.path)
+        try:
+            yield connection
+        except BaseException:
+            connection.close()
+            raise
+        try:
+            self._pool.put_nowait(connection)
+        except Full:
+            connection.close()
+
+    def _send(self, connection: socket.socket, user_agents: List[str]) \
+            -> int:
+        """Send a request and return its id."""
+        with self._lock:
+            request_id = self._next_id
+            self._next_id = (self._next_id + 1) & 0xffffffff
+        body = pack([user_agent.encode() for user_agent in user_agents])
+        connection.sendall(_HEADER.pack(request_id, len(body)) + body)
+        return request_id
+
+    def _receive(self, connection: socket.socket, request_id: int) \
+            -> Iterator[Optional[Properties]]:
+        """Read the response of a request and decode its properties."""
+        response_id, size = cast(Tuple[int, int], _HEADER.unpack(
+            self._read(connection, _HEADER.size)))
+        if response_id != request_id:
+            raise ConnectionError(f'Expected response {request_id}, got '
+                                  f'{response_id}')
+        for item in unpack(self._read(connection, size)):
+            yield Properties(*[value.decode() for value in unpack(item)]) \
+                if item else None
+
+    @staticmethod
+    def _read(connection: socket.socket, size: int) -> bytes:
+        """Read exactly size bytes."""
+        chunks = []
+        while size:
+            chunk = connection.recv(size)
+            if not chunk:
+                raise ConnectionError('Connection closed by the server')
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the server from the command line."""
+    parser = argparse.ArgumentParser(
+        description='Answer browscapy lookups over a Unix socket.')
+    parser.add_argument('--socket', default=SOCKET_PATH,
+                        help=f'socket path (default: {SOCKET_PATH})')
+    parser.add_argument('--cache-size', type=int, default=65536,
+                        help='number of cached user agents')
+    args = parser.parse_args(argv)
+    tree, table = load()
+    server = Server(tree, table, cast(int, args.cache_size))
+    try:
+        asyncio.run(server.serve(cast(str, args.socket)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tree.close()
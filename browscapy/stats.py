@@ -0,0 +1,248 @@
+"""Opt-in counters and timings of lookups and builds.
+
+The instrumented functions, like :meth:`browscapy.node.Node.get_score`, are
+the hottest ones, so they have no instrumentation code. Instead,
+:func:`enable` replaces them with wrappers that update a :class:`Stats`
+object, and :func:`disable` restores the original functions. Disabled
+instrumentation costs nothing.
+
+Counters:
+
+- ``nodes_visited``: lookup candidates of tree nodes;
+- ``get_score``: pattern comparisons while inserting nodes;
+- ``match`` and ``match_prefix``: pattern matches;
+- ``table_reads``: properties store reads;
+- ``cache_hits`` and ``cache_misses``: classifier cache results.
+
+Timings are kept in histograms named by the timed method, e.g.
+``Tree.lookup``. After each timed call, the hook, if any, receives the
+timing name, the user agent or pattern, the duration and the counter
+increments during the call, which explain why a user agent is slow.
+
+Instrumentation applies to all threads of the process, but not to build
+worker processes.
+"""
+from collections import Counter
+from functools import wraps
+from time import perf_counter
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional,
+                    Protocol, Tuple, cast)
+
+from . import (aho, cache, classifier, frozen, matcher, node, storage,
+               table)
+
+# pylint: disable=invalid-name
+#: Receive the timing name, argument, duration and counter increments.
+Hook = Callable[[str, str, float, Dict[str, int]], None]
+#: Return the wrapper of a function, named by a counter or timing name.
+Wrap = Callable[[str, 'Function'], 'Function']
+# pylint: enable=invalid-name
+
+
+class Function(Protocol):  # pylint: disable=too-few-public-methods
+    """An instrumented function, or its wrapper."""
+
+    def __call__(self, *args: object, **kwargs: object) -> object:
+        """Call the function."""
+
+
+# Functions whose calls are counted: owner, attribute and counter name
+_COUNTED: Tuple[Tuple[object, str, str], ...] = (
+    (node.Node, 'get_score', 'get_score'),
+    (matcher.Pattern, 'match', 'match'),
+    (node, 'match_prefix', 'match_prefix'),
+    (frozen, 'match_prefix', 'match_prefix'),
+    (table.PropertiesTable, '__getitem__', 'table_reads'),
+    (table.PropertiesTable, 'get', 'table_reads'),
+    (table.PropertiesTable, 'project', 'table_reads'),
+    (storage.RecordFileStore, '__getitem__', 'table_reads'),
+    (storage.RecordFileStore, 'project', 'table_reads'),
+    (storage.SQLiteStore, '__getitem__', 'table_reads'),
+    (storage.SQLiteStore, 'project', 'table_reads'))
+# Generators whose items are counted: owner, attribute and counter name
+_YIELDS_COUNTED: Tuple[Tuple[object, str, str], ...] = (
+    (node.Parent, 'get_candidates', 'nodes_visited'),
+    (frozen.FrozenTree, '_get_candidates', 'nodes_visited'))
+# Methods whose durations are recorded: owner and attribute
+_TIMED: Tuple[Tuple[type, str], ...] = (
+    (node.Tree, 'lookup'), (node.Tree, 'add_node'),
+    (frozen.FrozenTree, 'lookup'), (aho.AhoCorasick, 'lookup'),
+    (classifier.Classifier, 'lookup'))
+
+#: Stats: The enabled statistics, or None if disabled.
+STATS: Optional['Stats'] = None
+# Replaced functions: owner, attribute and original function
+_originals: List[Tuple[object, str, Function]] = []
+
+
+class Histogram:
+    """Count durations in power-of-two microsecond buckets.
+
+    Bucket 0 counts durations below 1 µs and bucket b > 0 counts the ones
+    from 2 ** (b - 1) to 2 ** b µs.
+
+    Attributes:
+        buckets (List[int]): Number of durations in each bucket.
+        count (int): Number of durations.
+        total (float): Sum of durations in seconds.
+        max (float): Longest duration in seconds.
+
+    """
+
+    def __init__(self) -> None:
+        """Create an empty histogram."""
+        self.buckets: List[int] = []
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        """Count a duration."""
+        bucket = int(seconds * 1e6).bit_length()
+        if bucket >= len(self.buckets):
+            self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent: float) -> float:
+        """Return an upper bound in seconds for a percentile of durations."""
+        rank = self.count * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and seen:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return a summary in microseconds."""
+        return {'count': self.count,
+                'mean_us': self.total / self.count * 1e6 if self.count else 0,
+                'p50_us': self.percentile(50) * 1e6,
+                'p99_us': self.percentile(99) * 1e6,
+                'max_us': self.max * 1e6}
+
+
+class Stats:
+    """Counters and timing histograms.
+
+    Attributes:
+        counters (Counter): Number of events by name.
+        timings (Dict[str, Histogram]): Durations by method name.
+        hook (Hook): Called after each timed call, if not None.
+
+    """
+
+    def __init__(self, hook: Optional[Hook] = None) -> None:
+        """Start with no events."""
+        self.counters: 'Counter[str]' = Counter()
+        self.timings: Dict[str, Histogram] = {}
+        self.hook = hook
+
+    def time(self, name: str, function: Function) -> Function:
+        """Return a wrapper that records the durations of function.
+
+        The second argument, the user agent or pattern node, is passed to the
+        hook.
+        """
+        counters = self.counters
+
+        @wraps(function)
+        def wrapper(*args: object, **kwargs: object) -> object:
+            before = counters.copy() if self.hook is not None else None
+            start = perf_counter()
+            result = function(*args, **kwargs)
+            seconds = perf_counter() - start
+            self.timings.setdefault(name, Histogram()).add(seconds)
+            if self.hook is not None and before is not None:
+                argument = args[1]
+                if isinstance(argument, node.Node):
+                    argument = argument.pattern
+                self.hook(name, str(argument), seconds,
+                          dict(counters - before))
+            return result
+        return wrapper
+
+    def count(self, name: str, function: Function) -> Function:
+        """Return a wrapper that counts the calls of function."""
+        counters = self.counters
+
+        @wraps(function)
+        def wrapper(*args: object, **kwargs: object) -> object:
+            counters[name] += 1
+            return function(*args, **kwargs)
+        return wrapper
+
+    def count_yields(self, name: str, function: Function) -> Function:
+        """Return a wrapper that counts the items of a generator function."""
+        counters = self.counters
+
+        @wraps(function)
+        def wrapper(*args: object, **kwargs: object) -> Iterator[object]:
+            for item in cast(Iterable[object], function(*args, **kwargs)):
+                counters[name] += 1
+                yield item
+        return wrapper
+
+    def count_cache(self, name: str, function: Function) -> Function:
+        """Return a wrapper of :meth:`LRUCache.get` counting hits and misses.
+
+        The counters are named by suffixing name with ``_hits`` and
+        ``_misses``.
+        """
+        counters = self.counters
+
+        @wraps(function)
+        def wrapper(*args: object, **kwargs: object) -> object:
+            value = function(*args, **kwargs)
+            default = args[2] if len(args) > 2 else kwargs.get('default')
+            counters[f'{name}_misses' if value is default
+                     else f'{name}_hits'] += 1
+            return value
+        return wrapper
+
+    def reset(self) -> None:
+        """Discard all counters and timings."""
+        self.counters.clear()
+        self.timings.clear()
+
+    def as_dict(self) -> Dict[str, object]:
+        """Return the counters and timing summaries."""
+        return {'counters': dict(self.counters),
+                'timings': {name: histogram.as_dict()
+                            for name, histogram in self.timings.items()}}
+
+
+def enable(hook: Optional[Hook] = None) -> Stats:
+    """Start collecting statistics in a new :data:`STATS` and return it."""
+    global STATS  # pylint: disable=global-statement
+    disable()
+    stats = Stats(hook)
+    for owner, attribute, name in _COUNTED:
+        _replace(owner, attribute, stats.count, name)
+    for owner, attribute, name in _YIELDS_COUNTED:
+        _replace(owner, attribute, stats.count_yields, name)
+    for owner, attribute in _TIMED:
+        _replace(owner, attribute, stats.time,
+                 f'{owner.__name__}.{attribute}')
+    _replace(cache.LRUCache, 'get', stats.count_cache, 'cache')
+    STATS = stats
+    return stats
+
+
+def disable() -> None:
+    """Restore the original functions. :data:`STATS` becomes None."""
+    global STATS  # pylint: disable=global-statement
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+    STATS = None
+
+
+def _replace(owner: object, attribute: str, wrap: Wrap, name: str) -> None:
+    """Replace a function by its wrapper, remembering the original."""
+    original = cast(Function, getattr(owner, attribute))
+    _originals.append((owner, attribute, original))
+    setattr(owner, attribute, wrap(name, original))
@@ -0,0 +1,341 @@
+"""Storage backends of browscap properties, addressed by record id.
+
+All backends implement :class:`Store`:
+
+- :class:`~browscapy.table.PropertiesTable` keeps all records in memory,
+  compressed by column;
+- :class:`RecordFileStore` reads records from a memory-mapped file, so only
+  the pages of the records used take memory, shared by all processes;
+- :class:`SQLiteStore` reads records from a SQLite database, which other
+  processes may read at the same time.
+
+A tree uses :data:`browscapy.node.FullPattern.DATABASE` unless it is given
+its own store, so different trees can use different backends.
+
+Most callers need only a few properties. :meth:`Store.project` decodes only
+the requested ones, and :class:`HotFields` keeps the most used ones of every
+record in memory, in front of a slower store.
+"""
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from typing import (Dict, Iterable, Iterator, List, Optional, Sequence,
+                    Tuple, cast)
+
+from .properties import Properties
+
+_FIELDS = Properties._fields
+_FIELD_INDEXES = {field: index for index, field in enumerate(_FIELDS)}
+
+#: Tuple[str, ...]: Properties most callers need.
+HOT_FIELDS = ('Browser', 'Version', 'Platform', 'isMobileDevice', 'Crawler')
+
+
+class Store(ABC):
+    """Properties storage where records are numbered from zero."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Return the number of records."""
+
+    @abstractmethod
+    def __getitem__(self, record: int) -> Properties:
+        """Return the properties of a record."""
+
+    def __iter__(self) -> Iterator[Properties]:
+        """Yield the properties of each record, in order."""
+        for record in range(len(self)):
+            yield self[record]
+
+    def __setitem__(self, record: int, properties: Properties) -> None:
+        """Replace the properties of an existing record."""
+        raise TypeError(f'{type(self).__name__} is read-only')
+
+    def project(self, record: int, fields: Sequence[str]) -> Dict[str, str]:
+        """Return only some properties of a record, by name.
+
+        Backends override this method to avoid decoding the other ones.
+
+        Raises:
+            KeyError: A field is not a property name.
+
+        """
+        properties = self[record]
+        return {field: properties[_FIELD_INDEXES[field]] for field in fields}
+
+    def append(self, properties: Properties) -> int:
+        """Store properties and return their record id."""
+        raise TypeError(f'{type(self).__name__} is read-only')
+
+    def close(self) -> None:
+        """Release resources. Writable stores save their records."""
+
+
+class RecordFileStore(Store):
+    """Read-only store of records in a memory-mapped file.
+
+    File layout (native byte order): magic ``b'BRCR'``, byte order mark
+    ``0x01020304``, format version and number of records (n) as 4-byte
+    unsigned integers, followed by n + 1 record offsets as 8-byte unsigned
+    integers and the records. A record is its UTF-8 values separated by NUL
+    characters.
+    """
+
+    #: int: Version of the file format. Incremented on incompatible changes.
+    FORMAT_VERSION = 1
+
+    _MAGIC = b'BRCR'
+    _BYTE_ORDER_MARK = 0x01020304
+    _HEADER = struct.Struct('=4sIII')
+
+    def __init__(self, path: str) -> None:
+        """Map the file and its offset index."""
+        with open(path, 'rb') as records_file:
+            self._mmap = mmap.mmap(records_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        try:
+            self._length = self._read_header(path)
+            start = self._HEADER.size
+            end = start + (self._length + 1) * 8
+            if end > len(self._mmap):
+                raise ValueError(f'Truncated records file "{path}"')
+            self._offsets = memoryview(self._mmap)[start:end].cast('Q')
+        except Exception:
+            self._mmap.close()
+            raise
+
+    @classmethod
+    def dump(cls, records: Iterable[Properties], path: str) -> None:
+        """Write records to a file, atomically replacing path.
+
+        Raises:
+            ValueError: A value has a NUL character.
+
+        """
+        offsets = array('Q', [0])
+        encoded: List[bytes] = []
+        for properties in records:
+            if any('\0' in value for value in properties):
+                raise ValueError(f'NUL character in "{properties[0]}"')
+            encoded.append('\0'.join(properties).encode())
+            offsets.append(offsets[-1] + len(encoded[-1]))
+        data_start = cls._HEADER.size + len(offsets) * offsets.itemsize
+        for index, offset in enumerate(offsets):
+            offsets[index] = offset + data_start
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as records_file:
+            records_file.write(cls._HEADER.pack(
+                cls._MAGIC, cls._BYTE_ORDER_MARK, cls.FORMAT_VERSION,
+                len(encoded)))
+            records_file.write(offsets.tobytes())
+            for record in encoded:
+                records_file.write(record)
+        os.replace(tmp_path, path)
+
+    def _read_header(self, path: str) -> int:
+        """Validate the header and return the number of records."""
+        if len(self._mmap) < self._HEADER.size:
+            raise ValueError(f'Not a browscapy records file: "{path}"')
+        magic, byte_order_mark, version, length = cast(
+            Tuple[bytes, int, int, int], self._HEADER.unpack_from(self._mmap))
+        if magic != self._MAGIC:
+            raise ValueError(f'Not a browscapy records file: "{path}"')
+        if byte_order_mark != self._BYTE_ORDER_MARK \
+                or version != self.FORMAT_VERSION:
+            raise ValueError(f'Incompatible records file "{path}" (version '
+                             f'{version}), please rebuild it')
+        return length
+
+    def __len__(self) -> int:
+        """Return the number of records."""
+        return self._length
+
+    def __getitem__(self, record: int) -> Properties:
+        """Decode the properties of a record."""
+        return Properties(*self._read(record).split('\0'))
+
+    def project(self, record: int, fields: Sequence[str]) -> Dict[str, str]:
+        """Split the record only up to the last requested property."""
+        indexes = [_FIELD_INDEXES[field] for field in fields]
+        values = self._read(record).split('\0', max(indexes, default=0) + 1)
+        return {field: values[index] for field, index in zip(fields, indexes)}
+
+    def _read(self, record: int) -> str:
+        """Decode the text of a record."""
+        if not 0 <= record < self._length:
+            raise IndexError(record)
+        return self._mmap[self._offsets[record]:
+                          self._offsets[record + 1]].decode()
+
+    def close(self) -> None:
+        """Release the memory map."""
+        self._offsets.release()
+        self._mmap.close()
+
+
+class SQLiteStore(Store):
+    """Store of records in a SQLite database file.
+
+    Each thread has its own connection. Writes are saved by :meth:`commit`
+    or :meth:`close`. Read-only stores can be used by many processes while
+    another one writes, as the database uses write-ahead logging.
+    """
+
+    _TABLE = 'properties'
+
+    def __init__(self, path: str, readonly: bool = False) -> None:
+        """Open or create the database file."""
+        self.path = path
+        self.readonly = readonly
+        self._local = threading.local()
+        columns = ', '.join(f'"{field}" TEXT' for field in _FIELDS)
+        connection = self._connection
+        if not readonly:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(f'CREATE TABLE IF NOT EXISTS {self._TABLE} '
+                               f'(record INTEGER PRIMARY KEY, {columns})')
+        self._select = f'SELECT * FROM {self._TABLE} WHERE record = ?'
+        placeholders = ', '.join('?' * (len(_FIELDS) + 1))
+        self._insert = f'INSERT OR REPLACE INTO {self._TABLE} VALUES ' \
+            f'({placeholders})'
+        self._length: Optional[int] = None
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the current thread."""
+        connection: Optional[sqlite3.Connection] = getattr(
+            self._local, 'connection', None)
+        if connection is None:
+            if self.readonly:
+                connection = sqlite3.connect(f'file:{self.path}?mode=ro',
+                                             uri=True)
+            else:
+                connection = sqlite3.connect(self.path)
+            self._local.connection = connection
+        return connection
+
+    def __len__(self) -> int:
+        """Return the number of records."""
+        if self._length is None:
+            row = cast(Tuple[Optional[int]], self._connection.execute(
+                f'SELECT MAX(record) FROM {self._TABLE}').fetchone())
+            self._length = 0 if row[0] is None else row[0] + 1
+        return self._length
+
+    def __getitem__(self, record: int) -> Properties:
+        """Read the properties of a record."""
+        row = cast(Optional[Tuple[str, ...]], self._connection.execute(
+            self._select, (record,)).fetchone())
+        if row is None:
+            raise IndexError(record)
+        return Properties(*row[1:])
+
+    def project(self, record: int, fields: Sequence[str]) -> Dict[str, str]:
+        """Select only the requested columns."""
+        for field in fields:
+            if field not in _FIELD_INDEXES:
+                raise KeyError(field)
+        columns = ', '.join(f'"{field}"' for field in fields)
+        row = cast(Optional[Tuple[str, ...]], self._connection.execute(
+            f'SELECT {columns} FROM {self._TABLE} WHERE record = ?',
+            (record,)).fetchone())
+        if row is None:
+            raise IndexError(record)
+        return dict(zip(fields, row))
+
+    def __setitem__(self, record: int, properties: Properties) -> None:
+        """Replace the properties of an existing record."""
+        if not 0 <= record < len(self):
+            raise IndexError(record)
+        self._write(record, properties)
+
+    def append(self, properties: Properties) -> int:
+        """Store properties and return their record id."""
+        record = len(self)
+        self._write(record, properties)
+        self._length = record + 1
+        return record
+
+    def commit(self) -> None:
+        """Save the changes of the current thread's connection."""
+        self._connection.commit()
+
+    def close(self) -> None:
+        """Save the changes and close the current thread's connection."""
+        connection: Optional[sqlite3.Connection] = getattr(
+            self._local, 'connection', None)
+        if connection is not None:
+            if not self.readonly:
+                connection.commit()
+            connection.close()
+            self._local.connection = None
+
+    def _write(self, record: int, properties: Properties) -> None:
+        """Insert or replace a record."""
+        if self.readonly:
+            raise TypeError('SQLiteStore is read-only')
+        if len(properties) != len(_FIELDS):
+            raise ValueError(f'Expected {len(_FIELDS)} properties, got '
+                             f'{len(properties)}')
+        self._connection.execute(self._insert, (record, *properties))
+
+
+class HotFields:
+    """Keep some properties of every record in memory.
+
+    Values are interned per field and each record stores their codes, like
+    :class:`~browscapy.table.PropertiesTable` does for all fields. Use it in
+    front of stores that read from disk.
+
+    Attributes:
+        fields (Tuple[str, ...]): Names of the kept properties.
+
+    """
+
+    def __init__(self, store: Store, fields: Sequence[str] = HOT_FIELDS) \
+            -> None:
+        """Read the fields of all records of the store."""
+        self.fields = tuple(fields)
+        self._indexes = {field: index for index, field
+                         in enumerate(self.fields)}
+        codes: List[Dict[str, int]] = [{} for _ in self.fields]
+        columns: List[List[int]] = [[] for _ in self.fields]
+        for record in range(len(store)):
+            values = store.project(record, self.fields)
+            for field_codes, column, field in zip(codes, columns,
+                                                  self.fields):
+                column.append(field_codes.setdefault(values[field],
+                                                     len(field_codes)))
+        #: Distinct values of each field
+        self._values = [list(field_codes) for field_codes in codes]
+        #: Value codes of each field, one per record
+        self._columns = [array('H' if len(field_codes) <= 1 << 16 else 'I',
+                               column)
+                         for field_codes, column in zip(codes, columns)]
+
+    def __len__(self) -> int:
+        """Return the number of records."""
+        return len(self._columns[0]) if self._columns else 0
+
+    def covers(self, fields: Sequence[str]) -> bool:
+        """Return whether all fields are kept."""
+        return all(field in self._indexes for field in fields)
+
+    def project(self, record: int, fields: Sequence[str]) -> Dict[str, str]:
+        """Return kept properties of a record, by name.
+
+        Raises:
+            KeyError: A field is not kept.
+
+        """
+        projection = {}
+        for field in fields:
+            index = self._indexes[field]
+            projection[field] = self._values[index][
+                self._columns[index][record]]
+        return projection
@@ -0,0 +1,194 @@
+"""Columnar storage of browscap properties.
+
+Most properties are repeated low-cardinality strings (e.g. "true", "Win10",
+"Chrome"). Each column keeps its distinct values once and each row (record)
+stores only small integer codes, in arrays whose item size grows with the
+column cardinality.
+"""
+import json
+import struct
+from array import array
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple, cast
+
+from .properties import Properties
+from .storage import Store
+
+#: Tuple[str, ...]: Property names in column order.
+FIELDS: Tuple[str, ...] = Properties._fields
+#: Dict[str, int]: Column index of each property name.
+FIELD_INDEXES: Dict[str, int] = {field: index
+                                 for index, field in enumerate(FIELDS)}
+
+#: int: Version of the file format. Incremented on incompatible changes.
+FORMAT_VERSION = 2
+
+# Smallest array type codes and the number of codes they can store
+_TYPECODES = (('B', 1 << 8), ('H', 1 << 16), ('I', 1 << 32))
+# Magic, byte order mark, version, generation, number of records and JSON
+# size
+_HEADER = struct.Struct('=4sIIIII')
+_MAGIC = b'BRCT'
+_BYTE_ORDER_MARK = 0x01020304
+
+
+class PropertiesTable(Store):
+    """Store browscap properties as interned values per column.
+
+    Records are numbered from zero in insertion order.
+
+    Attributes:
+        values (List[List[str]]): Distinct values of each column.
+        columns (List[array]): Value codes of each column, one per record.
+        generation (int): Build of the records, stored with the table and
+            the tree to check that they match.
+
+    """
+
+    def __init__(self, values: Optional[List[List[str]]] = None,
+                 columns: Optional[List['array[int]']] = None,
+                 generation: int = 0) -> None:
+        """Create an empty table or use loaded values and columns."""
+        self.generation = generation
+        self.values: List[List[str]] = values or [[] for _ in FIELDS]
+        self.columns: List['array[int]'] = \
+            columns or [array('B') for _ in FIELDS]
+        # Code of each value, built only when needed for new records
+        self._codes: List[Dict[str, int]] = []
+
+    def __len__(self) -> int:
+        """Return the number of records."""
+        return len(self.columns[0])
+
+    def __getitem__(self, record: int) -> Properties:
+        """Decode all properties of a record."""
+        return Properties(*[values[column[record]] for values, column
+                            in zip(self.values, self.columns)])
+
+    def __setitem__(self, record: int, properties: Properties) -> None:
+        """Replace the properties of an existing record."""
+        for index, value in enumerate(properties):
+            code = self._encode(index, value)  # May replace the column
+            self.columns[index][record] = code
+
+    def append(self, properties: Properties) -> int:
+        """Store properties and return their record id."""
+        if len(properties) != len(FIELDS):
+            raise ValueError(f'Expected {len(FIELDS)} properties, got '
+                             f'{len(properties)}')
+        for index, value in enumerate(properties):
+            code = self._encode(index, value)  # May replace the column
+            self.columns[index].append(code)
+        return len(self) - 1
+
+    def get(self, record: int, field: str) -> str:
+        """Decode only one property of a record."""
+        index = FIELD_INDEXES[field]
+        return self.values[index][self.columns[index][record]]
+
+    def project(self, record: int, fields: Sequence[str]) -> Dict[str, str]:
+        """Decode only some properties of a record, by name."""
+        values, columns = self.values, self.columns
+        projection = {}
+        for field in fields:
+            index = FIELD_INDEXES[field]
+            projection[field] = values[index][columns[index][record]]
+        return projection
+
+    def view(self, record: int) -> 'PropertiesView':
+        """Return a view that decodes properties only when accessed."""
+        return PropertiesView(self, record)
+
+    def dump(self, table_file: BinaryIO) -> None:
+        """Write the table to a binary file.
+
+        The header is followed by the column values and type codes in JSON
+        and then by the raw bytes of each column.
+        """
+        metadata: Dict[str, object] = {
+            'fields': FIELDS,
+            'values': self.values,
+            'typecodes': [column.typecode for column in self.columns]
+        }
+        encoded = json.dumps(metadata).encode()
+        table_file.write(_HEADER.pack(_MAGIC, _BYTE_ORDER_MARK,
+                                      FORMAT_VERSION, self.generation,
+                                      len(self), len(encoded)))
+        table_file.write(encoded)
+        for column in self.columns:
+            table_file.write(column.tobytes())
+
+    @classmethod
+    def load(cls, table_file: BinaryIO) -> 'PropertiesTable':
+        """Read a table written by :meth:`dump`."""
+        header = table_file.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            raise ValueError('Not a browscapy properties file')
+        magic, byte_order_mark, version, generation, length, \
+            metadata_size = cast(Tuple[bytes, int, int, int, int, int],
+                                 _HEADER.unpack(header))
+        if magic != _MAGIC:
+            raise ValueError('Not a browscapy properties file')
+        if byte_order_mark != _BYTE_ORDER_MARK or version != FORMAT_VERSION:
+            raise ValueError(f'Incompatible properties file (version '
+                             f'{version}), please rebuild it')
+        metadata = cast(Dict[str, object],
+                        json.loads(table_file.read(metadata_size).decode()))
+        if tuple(cast(List[str], metadata['fields'])) != FIELDS:
+            raise ValueError('Properties file has different fields')
+        columns: List['array[int]'] = []
+        for typecode in cast(List[str], metadata['typecodes']):
+            column = array(typecode)
+            column.frombytes(table_file.read(length * column.itemsize))
+            if len(column) != length:
+                raise ValueError('Truncated properties file')
+            columns.append(column)
+        return cls(cast(List[List[str]], metadata['values']), columns,
+                   generation)
+
+    def _encode(self, index: int, value: str) -> int:
+        """Return the code of a column value, adding it if new."""
+        if not self._codes:
+            self._codes = [{item: code for code, item in enumerate(values)}
+                           for values in self.values]
+        codes = self._codes[index]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self.values[index].append(value)
+            self._widen_column(index, code)
+        return code
+
+    def _widen_column(self, index: int, code: int) -> None:
+        """Change a column's type code if it can't store the new code."""
+        column = self.columns[index]
+        if code < 1 << (8 * column.itemsize):
+            return
+        for typecode, limit in _TYPECODES:
+            if code < limit:
+                self.columns[index] = array(typecode, column)
+                return
+        raise OverflowError(f'Too many values for property {FIELDS[index]}')
+
+
+class PropertiesView:  # pylint: disable=too-few-public-methods
+    """Decode properties of a record only when they are accessed.
+
+    Attributes have the same names as :class:`Properties` fields.
+    """
+
+    __slots__ = ('_table', '_record')
+
+    def __init__(self, table: PropertiesTable, record: int) -> None:
+        """Refer to a table record."""
+        self._table = table
+        self._record = record
+
+    def __getattr__(self, field: str) -> str:
+        """Decode one property."""
+        if field not in FIELD_INDEXES:
+            raise AttributeError(field)
+        return self._table.get(self._record, field)
+
+    def materialize(self) -> Properties:
+        """Decode all properties."""
+        return self._table[self._record]
@@ -0,0 +1,89 @@
+"""Update the database with a new browscap.csv release.
+
+Releases change few patterns, so instead of building everything again, the
+new rows are compared with the stored ones by PropertyName:
+
+- New patterns are appended to the table and inserted in the tree;
+- Removed patterns are removed from the tree. Their records stay in the
+  table, so processes still using the previous tree can fetch them;
+- Changed properties are rewritten in their records;
+- Unchanged patterns cost only the comparison.
+
+The table is saved before the tree, both atomically, and the generation of
+the build is kept. Readers of the previous tree find all of its records in
+the new table (see :mod:`browscapy.database`).
+"""
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from .build import Progress, read_properties
+from .database import Database
+from .mapped import MappedTree, dump
+from .node import FullPattern, Tree
+from .properties import Properties
+from .storage import Store
+
+
+class Changes(NamedTuple):  # pylint: disable=too-few-public-methods
+    """Number of patterns by kind of change."""
+
+    added: int
+    removed: int
+    changed: int
+    unchanged: int
+
+
+def update(tree: Tree, table: Store, records: Dict[str, int],
+           rows: Iterable[Properties],
+           progress: Optional[Progress] = None,
+           progress_interval: int = 10000) -> Changes:
+    """Apply the differences between the stored and the new rows.
+
+    Args:
+        tree: Tree with the stored patterns, changed in place.
+        table: Properties of the tree records, changed in place.
+        records: Record of each pattern in the tree.
+        rows: Resolved properties of the new release.
+        progress: Called periodically with the number of rows compared.
+        progress_interval: Number of rows between progress calls.
+
+    """
+    # pylint: disable=too-many-arguments
+    added, changed, count = 0, 0, 0
+    seen = set()
+    for count, row in enumerate(rows, 1):
+        pattern = row.PropertyName
+        seen.add(pattern)
+        record = records.get(pattern)
+        if record is None:
+            tree.add_node(FullPattern(row, table))
+            added += 1
+        elif table[record] != row:
+            table[record] = row
+            changed += 1
+        if progress is not None and count % progress_interval == 0:
+            progress(count)
+
+    removed = 0
+    for pattern in records.keys() - seen:
+        tree.remove_node(pattern)
+        removed += 1
+    return Changes(added, removed, changed, count - added - changed)
+
+
+def update_database(csv_path: str, progress: Optional[Progress] = None) \
+        -> Changes:
+    """Update the user's database with a new browscap.csv file."""
+    database = Database(readonly=False, load_table=True)
+    tree_filename = str(database.tree_filename)
+    with MappedTree(tree_filename) as mapped:
+        if mapped.generation != database.table.generation:
+            raise ValueError('The tree and the table are from different '
+                             'builds, please build the database again')
+        tree = mapped.thaw(database.table)
+        records = {pattern: record for pattern, record in mapped.patterns()}
+    changes = update(tree, database.table, records,
+                     read_properties(csv_path), progress)
+    # Tree records must exist in the table when readers open the new tree
+    database.close()
+    dump(tree.freeze(), tree_filename, database.table.generation)
+    return changes
@@ -0,0 +1,320 @@
+"""Benchmark building, storing and looking up user agents.
+
+Results are printed as JSON, to be compared between runs. By default, a
+synthetic set of browscap-like patterns is generated. Use ``--csv`` to build
+from a real browscap.csv file instead. In both cases, the user agents are
+generated from the patterns, so most of them match, and requested with a Zipf
+distribution, as a few user agents make most of the real traffic.
+
+All random choices come from ``--seed``, so runs with the same arguments use
+the same patterns and requests.
+
+Example::
+
+    python benchmark.py --requests 100000 --output before.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from browscapy import Classifier, stats
+from browscapy.aho import AhoCorasick
+from browscapy.build import build
+from browscapy.mapped import MappedTree, dump
+from browscapy.node import Tree
+from browscapy.properties import Properties
+from browscapy.table import FIELDS, PropertiesTable
+
+# pylint: disable=invalid-name
+#: Benchmark results by name.
+Results = Dict[str, object]
+# pylint: enable=invalid-name
+
+#: Percentiles of the lookup latency.
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Pattern families: template, browser and its numbered fields ranges
+_FAMILIES: Tuple[Tuple[str, str, Tuple[Tuple[int, int], ...]], ...] = (
+    ('Mozilla/5.0 (Windows NT {}.{}*) AppleWebKit* (KHTML* like Gecko) '
+     'Chrome/{}.*Safari/*', 'Chrome', ((5, 10), (0, 3), (30, 120))),
+    ('Mozilla/5.0 (*Linux*Android {}.{}*) AppleWebKit* (KHTML* like Gecko) '
+     'Chrome/{}.*Mobile Safari/*', 'Chrome', ((4, 14), (0, 4), (30, 120))),
+    ('Mozilla/5.0 (iPhone*CPU iPhone OS {}_{}* like Mac OS X*) AppleWebKit* '
+     '(KHTML* like Gecko) Version/{}.*Mobile/*Safari/*', 'Safari',
+     ((7, 17), (0, 4), (7, 17))),
+    ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10?{}*) AppleWebKit* '
+     '(KHTML* like Gecko) Version/{}.{}*Safari/*', 'Safari',
+     ((9, 15), (7, 17), (0, 2))),
+    ('Mozilla/5.0 (Windows NT {}.{}*; rv:{}.0) Gecko/* Firefox/*', 'Firefox',
+     ((5, 10), (0, 3), (20, 120))),
+    ('Mozilla/4.0 (compatible; MSIE {}.0; Windows NT {}.{}*', 'IE',
+     ((5, 11), (5, 10), (0, 3))),
+    ('*Googlebot/{}.{}*', 'Googlebot', ((1, 3), (0, 9))),
+    ('*bingbot/{}.{}*', 'BingBot', ((1, 3), (0, 9))),
+    ('*Crawler{}/{}.{}*', 'Crawler', ((0, 999), (0, 9), (0, 9))),
+    ('curl/{}.{}*', 'cURL', ((7, 8), (0, 90))),
+    ('python-requests/{}.{}*', 'Python Requests', ((1, 2), (0, 31))),
+)
+# Run in a new interpreter to time the import and the first lookup. Arguments:
+# tree path, table path and user agent.
+_STARTUP_SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import browscapy
+imported = time.perf_counter()
+from browscapy.mapped import MappedTree
+from browscapy.table import PropertiesTable
+
+def load():
+    with open(sys.argv[2], 'rb') as table_file:
+        return MappedTree(sys.argv[1]), PropertiesTable.load(table_file)
+
+browscapy.LazyClassifier(load).lookup(sys.argv[3])
+print(imported - start, time.perf_counter() - imported)
+'''
+# Replacements of "*" when creating user agents from patterns
+_WILDCARD_TEXTS = ('', 'x', ' U; en-US', 'Win64; x64', '537.36', ' (KHTML)')
+
+
+def generate_patterns(count: int, rand: random.Random) \
+        -> List[Tuple[str, str]]:
+    """Return distinct synthetic patterns and their browsers.
+
+    The default "*" pattern is always included.
+    """
+    patterns = {'*': 'Default Browser'}
+    while len(patterns) < count:
+        template, browser, ranges = rand.choice(_FAMILIES)
+        numbers = [rand.randint(start, end) for start, end in ranges]
+        patterns[template.format(*numbers)] = browser
+    return sorted(patterns.items())
+
+
+def build_synthetic(patterns: Iterable[Tuple[str, str]],
+                    table: PropertiesTable) -> Tree:
+    """Build a tree from synthetic patterns, storing their properties."""
+    browser_index = FIELDS.index('Browser')
+    tree = Tree(store=table)
+    for pattern, browser in patterns:
+        values = [''] * len(FIELDS)
+        values[0], values[browser_index] = pattern, browser
+        tree.add_properties(Properties(*values))
+    return tree
+
+
+def generate_user_agents(patterns: List[str], count: int,
+                         rand: random.Random) -> List[str]:
+    """Return distinct user agents, most of them matching some pattern."""
+    user_agents = set()
+    while len(user_agents) < count:
+        if rand.random() < 0.05:
+            user_agents.add(f'Unknown/{rand.randint(0, 1 << 30)}')
+            continue
+        pattern = rand.choice(patterns)
+        pieces = []
+        for char in pattern:
+            if char == '*':
+                pieces.append(rand.choice(_WILDCARD_TEXTS))
+            elif char == '?':
+                pieces.append(rand.choice('._0'))
+            else:
+                pieces.append(char)
+        user_agents.add(''.join(pieces))
+    return sorted(user_agents)
+
+
+def generate_requests(user_agents: List[str], count: int, exponent: float,
+                      rand: random.Random) -> List[str]:
+    """Return user agents requested with a Zipf distribution.
+
+    The user agent of rank r (from 1) has a probability proportional to
+    1 / r ** exponent.
+    """
+    ranked = list(user_agents)
+    rand.shuffle(ranked)
+    cum_weights: List[float] = []
+    total = 0.0
+    for rank in range(1, len(ranked) + 1):
+        total += 1 / rank ** exponent
+        cum_weights.append(total)
+    return rand.choices(ranked, cum_weights=cum_weights, k=count)
+
+
+def get_peak_rss() -> int:
+    """Return the peak resident memory of this process in bytes."""
+    # Linux reports kibibytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure_lookups(lookup: Callable[[str], object],
+                    user_agents: List[str]) -> Dict[str, float]:
+    """Return latency percentiles in microseconds and the throughput."""
+    latencies: List[float] = []
+    timer = time.perf_counter
+    start = timer()
+    for user_agent in user_agents:
+        before = timer()
+        lookup(user_agent)
+        latencies.append(timer() - before)
+    elapsed = timer() - start
+
+    latencies.sort()
+    results = {f'p{percentile}_us': latencies[min(
+        len(latencies) - 1, int(len(latencies) * percentile / 100))] * 1e6
+               for percentile in PERCENTILES}
+    results['mean_us'] = sum(latencies) / len(latencies) * 1e6
+    results['lookups_per_second'] = len(user_agents) / elapsed
+    return results
+
+
+def measure_startup(tree_path: str, table_path: str, user_agent: str,
+                    runs: int = 5) -> Dict[str, float]:
+    """Return the best import and first lookup times of new interpreters.
+
+    The first lookup includes opening the tree and loading the table.
+    """
+    import_times, lookup_times = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', _STARTUP_SCRIPT, tree_path, table_path,
+             user_agent], check=True, stdout=subprocess.PIPE,
+            universal_newlines=True).stdout
+        import_seconds, lookup_seconds = map(float, output.split())
+        import_times.append(import_seconds)
+        lookup_times.append(lookup_seconds)
+    return {'import_seconds': min(import_times),
+            'first_lookup_seconds': min(lookup_times)}
+
+
+def run(args: argparse.Namespace) -> Results:
+    """Run all benchmarks and return their results."""
+    # pylint: disable=too-many-locals
+    rand = random.Random(args.seed)
+    results: Results = {'seed': args.seed, 'requests': args.requests,
+                        'zipf_exponent': args.zipf}
+    table = PropertiesTable()
+
+    start = time.perf_counter()
+    if args.csv:
+        tree = build(args.csv, table)
+        results['source'] = os.path.basename(args.csv)
+    else:
+        tree = build_synthetic(generate_patterns(args.patterns, rand), table)
+        results['source'] = 'synthetic'
+    results['build_seconds'] = time.perf_counter() - start
+    results['patterns'] = len(table)
+
+    start = time.perf_counter()
+    frozen = tree.freeze()
+    results['freeze_seconds'] = time.perf_counter() - start
+    filtered = tree.freeze(prefix_filter=True)
+    if filtered.prefix_filter is not None:
+        results['prefix_filter_bytes'] = len(filtered.prefix_filter.bloom)
+
+    patterns = [pattern for pattern, _ in frozen.patterns()]
+    user_agents = generate_user_agents(patterns, args.user_agents, rand)
+    requests = generate_requests(user_agents, args.requests, args.zipf, rand)
+    # Starting like literal patterns, but matched only by patterns starting
+    # with a wildcard, like the default
+    literal_patterns = [pattern for pattern in patterns
+                        if pattern[0] not in '*?']
+    unknown = [f'{rand.choice(literal_patterns)[:3]}Unknown/{number}'
+               for number in range(len(user_agents))]
+
+    with tempfile.TemporaryDirectory() as folder:
+        tree_path = os.path.join(folder, 'tree')
+        table_path = os.path.join(folder, 'properties')
+        start = time.perf_counter()
+        dump(frozen, tree_path)
+        with open(table_path, 'wb') as table_file:
+            table.dump(table_file)
+        results['dump_seconds'] = time.perf_counter() - start
+        results['tree_bytes'] = os.path.getsize(tree_path)
+        results['table_bytes'] = os.path.getsize(table_path)
+
+        start = time.perf_counter()
+        with open(table_path, 'rb') as table_file:
+            PropertiesTable.load(table_file)
+        results['table_load_seconds'] = time.perf_counter() - start
+        results['startup'] = measure_startup(tree_path, table_path,
+                                             user_agents[0])
+
+        with MappedTree(tree_path) as mapped:
+            start = time.perf_counter()
+            aho = AhoCorasick.from_frozen(frozen)
+            results['aho_build_seconds'] = time.perf_counter() - start
+
+            # Distinct user agents, without cache
+            backends: Dict[str, Callable[[str], object]] = {
+                'tree': tree.lookup, 'frozen': frozen.lookup,
+                'mapped': mapped.lookup, 'aho': aho.lookup,
+                'filtered': filtered.lookup}
+            for name, lookup in backends.items():
+                results[f'lookup_{name}'] = measure_lookups(lookup,
+                                                            user_agents)
+            for name in ('frozen', 'filtered'):
+                results[f'lookup_unknown_{name}'] = measure_lookups(
+                    backends[name], unknown)
+
+            classifier = Classifier(frozen, table, args.cache_size)
+            results['classifier'] = measure_lookups(classifier.lookup,
+                                                    requests)
+            info = classifier.cache_info()
+            if info is not None:
+                results['cache_hit_ratio'] = info.hits / len(requests)
+
+            if args.stats:
+                # Separate run, as instrumentation changes the timings
+                classifier = Classifier(frozen, table, args.cache_size)
+                enabled = stats.enable()
+                for user_agent in requests:
+                    classifier.lookup(user_agent)
+                stats.disable()
+                results['stats'] = enabled.as_dict()
+
+    results['peak_rss_bytes'] = get_peak_rss()
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--csv', help='build from a browscap.csv file '
+                        'instead of synthetic patterns')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--patterns', type=int, default=20000,
+                        help='number of synthetic patterns')
+    parser.add_argument('--user-agents', type=int, default=5000,
+                        help='number of distinct user agents')
+    parser.add_argument('--requests', type=int, default=100000,
+                        help='number of classifier lookups')
+    parser.add_argument('--zipf', type=float, default=1.1,
+                        help='exponent of the request distribution')
+    parser.add_argument('--cache-size', type=int, default=4096)
+    parser.add_argument('--stats', action='store_true',
+                        help='also report lookup counters (see '
+                        'browscapy.stats)')
+    parser.add_argument('--output', help='JSON file (default: stdout)')
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    """Run the benchmarks and write the JSON results."""
+    args = parse_args()
+    output = json.dumps(run(args), indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
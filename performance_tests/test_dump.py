@@ -1,11 +1,12 @@
 """Profile cache creation and dump."""
 import cProfile
-import csv
-import pickle
 import resource
+import time
 
-from browscapy.node import FullPattern, Properties, Tree
+from browscapy.build import build
 from browscapy.database import Database
+from browscapy.mapped import MappedTree, dump
+from browscapy.node import Tree
 
 TREE = Tree()
 
@@ -15,39 +16,34 @@ def get_memory() -> int:
     return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
 
 
-def init_database() -> Database:
-    """Prepare a database for writing."""
-    database = Database(readonly=False)
-    FullPattern.DATABASE = database.shelve
-    return database
+def print_progress(count: int) -> None:
+    """Print the number of patterns and the memory usage."""
+    print(count, 'patterns:', get_memory(), 'bytes')
 
 
-def build_tree() -> None:
+def build_tree(database: Database) -> None:
     """Build the whole tree."""
-    with open('../browscap.csv') as browscap:
-        csv_reader = csv.DictReader(browscap)
-        print('Before nodes:', get_memory(), 'bytes')
-        for row in csv_reader:
-            properties = Properties(**row)
-            node = FullPattern(properties)
-            TREE.add_node(node)
-        print('After nodes:', get_memory(), 'bytes')
+    global TREE  # pylint: disable=global-statement
+    print('Before nodes:', get_memory(), 'bytes')
+    TREE = build('../browscap.csv', database.table, print_progress)
+    print('After nodes:', get_memory(), 'bytes')
 
 
-def pickle_tree() -> None:
+def dump_tree() -> None:
     """Create and dump the browscap tree."""
-    database = init_database()
-
-    cProfile.run('build_tree()', sort=1)
+    database = Database(readonly=False)
 
-    with open('dump.pkl', 'wb') as dump_file:
-        print('Pickling')
-        pickler = pickle.Pickler(dump_file, pickle.HIGHEST_PROTOCOL)
-        pickler.dump(TREE)
+    cProfile.runctx('build_tree(database)', globals(), locals(), sort=1)
 
-    print('Writing shelve')
+    print('Writing properties')
     database.close()
 
+    print('Dumping')
+    dump(TREE.freeze(), 'dump.bin')
+    start = time.perf_counter()
+    with MappedTree('dump.bin'):
+        print('Opened in', time.perf_counter() - start, 'seconds')
+
 
 if __name__ == '__main__':
-    pickle_tree()
+    dump_tree()
@@ -77,6 +77,14 @@ setup(
     # simple. Or you can use find_packages().
     packages=['browscapy'],
 
+    # Shares one loaded database through a Unix socket (see
+    # browscapy.server)
+    entry_points={
+        'console_scripts': [
+            'browscapy-server=browscapy.server:main',
+        ],
+    },
+
     # List additional groups of dependencies here (e.g. development
     # dependencies). You can install these using the following syntax,
     # for example:
@@ -1,4 +1,65 @@
-"""Configure tests."""
+"""Configure tests and share their helpers."""
 import logging
+import random
+from typing import Dict, Iterable, List, Optional, Tuple, Union, cast
+
+from browscapy.classifier import Backend
+from browscapy.node import Tree
+from browscapy.properties import Properties
+from browscapy.table import FIELDS, PropertiesTable
 
 logging.basicConfig(level=logging.WARN)
+
+
+def get_properties(pattern: str, default: str = '', **values: str) \
+        -> Properties:
+    """Return properties of a pattern with some values by field name.
+
+    The other fields have the default value.
+    """
+    prop_values: List[str] = [default] * len(FIELDS)
+    prop_values[0] = pattern
+    for field, value in values.items():
+        prop_values[FIELDS.index(field)] = value
+    return Properties(*prop_values)
+
+
+def build_tree(rows: Iterable[Union[str, Properties]]) \
+        -> Tuple[Tree, PropertiesTable]:
+    """Return a tree and its own table with one record per row, in order.
+
+    Rows given as patterns have no other property.
+    """
+    table = PropertiesTable()
+    tree = Tree(store=table)
+    for row in rows:
+        tree.add_properties(get_properties(row) if isinstance(row, str)
+                            else row)
+    return tree, table
+
+
+def lookup_pattern(tree: Union[Tree, Backend], user_agent: str) \
+        -> Optional[str]:
+    """Return the pattern a tree or a backend finds, or None."""
+    if isinstance(tree, Tree):
+        node = tree.lookup(user_agent)
+        return None if node is None else node.pattern
+    record = tree.lookup(user_agent)
+    return None if record is None else tree.pattern(record)
+
+
+def lookup_properties(tree: Tree, user_agent: str) -> Optional[Properties]:
+    """Return the properties a tree finds, or None."""
+    node = tree.lookup(user_agent)
+    return None if node is None else node.properties
+
+
+def get_attributes(instance: object) -> Dict[str, object]:
+    """Return the attributes of an instance, to compare it with another."""
+    return cast(Dict[str, object], vars(instance))
+
+
+def get_random(rand: random.Random, alphabet: str, max_size: int) -> str:
+    """Return a random string of alphabet characters."""
+    size = rand.randint(0, max_size)
+    return ''.join(rand.choice(alphabet) for _ in range(size))
@@ -0,0 +1,48 @@
+"""Test the Aho-Corasick lookup backend."""
+import random
+from unittest import TestCase
+
+from browscapy import Classifier
+from browscapy.aho import AhoCorasick, Automaton
+from tests import build_tree, get_properties, get_random, lookup_pattern
+
+
+class TestAutomaton(TestCase):
+    """Find many strings in a single pass."""
+
+    def test_search(self) -> None:
+        """Should find overlapping strings and suffixes of others."""
+        automaton = Automaton(['he', 'she', 'his', 'hers'])
+        self.assertSetEqual({0, 1, 3}, automaton.search('ushers'))
+        self.assertSetEqual({2}, automaton.search('this'))
+        self.assertSetEqual(set(), automaton.search('hi'))
+
+
+class TestAhoCorasick(TestCase):
+    """Compare the backend lookups with the tree ones."""
+
+    CASES = 500
+
+    def test_random(self) -> None:
+        """Should agree with the tree lookup on random patterns."""
+        rand = random.Random(42)
+        patterns = {get_random(rand, 'aB /*?', 8) for _ in range(200)}
+        tree, _ = build_tree(patterns - {''})
+        engine = AhoCorasick.from_frozen(tree.freeze())
+        self.assertEqual(len(patterns - {''}), len(engine))
+        for _ in range(self.CASES):
+            user_agent = get_random(rand, 'Ab /', 10)
+            with self.subTest(user_agent=user_agent):
+                self.assertEqual(lookup_pattern(tree, user_agent),
+                                 lookup_pattern(engine, user_agent))
+
+    def test_classifier(self) -> None:
+        """Should be usable as the classifier backend."""
+        tree, table = build_tree(('*Chrome/*Safari/*', 'Mozilla/5.0*', '*'))
+        classifier = Classifier(AhoCorasick.from_frozen(tree.freeze()), table)
+        for user_agent, pattern in (
+                ('Mozilla/5.0 Chrome/62.0 Safari/537', '*Chrome/*Safari/*'),
+                ('curl', '*')):
+            with self.subTest(user_agent=user_agent):
+                self.assertEqual(get_properties(pattern),
+                                 classifier.lookup(user_agent))
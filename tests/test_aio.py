@@ -0,0 +1,128 @@
+"""Test the asyncio classifier."""
+import asyncio
+import os
+import tempfile
+import threading
+from typing import List, Optional, Sequence, Set, cast
+from unittest import TestCase
+from unittest.mock import patch
+
+from browscapy import Classifier, stats
+from browscapy.aio import AsyncClassifier
+from browscapy.mapped import dump
+from browscapy.properties import Properties
+from browscapy.storage import Store
+from browscapy.table import PropertiesTable
+from tests import build_tree, get_properties
+
+
+class ThreadStore(Store):
+    """Record the threads reading a table."""
+
+    def __init__(self, table: PropertiesTable) -> None:
+        """Read the table."""
+        self.table = table
+        self.threads: List[threading.Thread] = []
+
+    def __len__(self) -> int:
+        """Return the number of records."""
+        return len(self.table)
+
+    def __getitem__(self, record: int) -> Properties:
+        """Read the properties of a record in the table."""
+        self.threads.append(threading.current_thread())
+        return self.table[record]
+
+
+class TestAsyncClassifier(TestCase):
+    """Look up user agents in threads and processes."""
+
+    USER_AGENTS = ('Mozilla/5.0 (X11)', 'X Chrome/62', 'curl')
+
+    def setUp(self) -> None:
+        """Create a tree with two patterns."""
+        self.tree, self.table = build_tree(('Mozilla/5.0*', '*Chrome/*'))
+        self.expected = [get_properties('Mozilla/5.0*'),
+                         get_properties('*Chrome/*'), None]
+
+    def test_threads(self) -> None:
+        """Should find the same properties as the classifier."""
+        async_classifier = AsyncClassifier(
+            Classifier(self.tree.freeze(), self.table),
+            max_pending=1)
+        results = self._lookup_all(async_classifier, self.USER_AGENTS)
+        self.assertListEqual(self.expected, results)
+
+    def test_coalescing(self) -> None:
+        """Concurrent lookups of a user agent should search once."""
+        async_classifier = AsyncClassifier(
+            Classifier(self.tree.freeze(), self.table))
+        enabled = stats.enable()
+        try:
+            results = self._lookup_all(async_classifier, ['X Chrome/62'] * 5)
+            # Served by the cache
+            self._lookup_all(async_classifier, ['X Chrome/62'])
+        finally:
+            stats.disable()
+        expected = [get_properties('*Chrome/*')] * 5
+        self.assertListEqual(expected, results)
+        self.assertEqual(1, enabled.timings['FrozenTree.lookup'].count)
+
+    def test_bounded(self) -> None:
+        """Lookups of new user agents should wait for a free search."""
+        frozen = self.tree.freeze()
+        async_classifier = AsyncClassifier(Classifier(frozen, self.table),
+                                           max_pending=2)
+        released = threading.Event()
+        lookup = frozen.lookup
+
+        def wait_and_lookup(user_agent: str) -> Optional[int]:
+            released.wait()
+            return lookup(user_agent)
+
+        async def count_tasks() -> int:
+            lookups = [asyncio.ensure_future(async_classifier.lookup(
+                f'curl/{number}')) for number in range(20)]
+            await asyncio.sleep(0.05)
+            tasks = len(cast(Set[object], asyncio.all_tasks()))
+            released.set()
+            await asyncio.gather(*lookups)
+            return tasks
+
+        with patch.object(frozen, 'lookup', wait_and_lookup):
+            tasks = asyncio.run(count_tasks())
+        # This coroutine, the lookups and two searches
+        self.assertEqual(1 + 20 + 2, tasks)
+
+    def test_store_threads(self) -> None:
+        """Stores that are not in memory should be read in threads."""
+        store = ThreadStore(self.table)
+        async_classifier = AsyncClassifier(
+            Classifier(self.tree.freeze(), store))
+        results = self._lookup_all(async_classifier, self.USER_AGENTS)
+        self.assertListEqual(self.expected, results)
+        self.assertEqual(2, len(store.threads))
+        self.assertNotIn(threading.current_thread(), store.threads)
+
+    def test_processes(self) -> None:
+        """Workers should search the tree file."""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'tree')
+            dump(self.tree.freeze(), path)
+            async_classifier = AsyncClassifier.with_processes(
+                path, self.table, workers=1)
+            try:
+                results = self._lookup_all(async_classifier,
+                                           self.USER_AGENTS)
+            finally:
+                async_classifier.close()
+        self.assertListEqual(self.expected, results)
+
+    @staticmethod
+    def _lookup_all(async_classifier: AsyncClassifier,
+                    user_agents: Sequence[str]) -> List[Optional[Properties]]:
+        async def lookup_all() -> List[Optional[Properties]]:
+            return await asyncio.gather(*[
+                async_classifier.lookup(user_agent)
+                for user_agent in user_agents])
+        return asyncio.run(lookup_all())
@@ -0,0 +1,90 @@
+"""Test the Bloom filter of pattern heads."""
+import random
+from unittest import TestCase
+
+from browscapy.bloom import BloomFilter, PrefixFilter, get_head
+from tests import build_tree, get_attributes, get_random, lookup_pattern
+
+
+class TestBloomFilter(TestCase):
+    """No false negatives and about the requested false positive rate."""
+
+    def test_rate(self) -> None:
+        """Should keep false positives near the requested rate."""
+        bloom = BloomFilter(1000, 0.01)
+        for number in range(1000):
+            bloom.add(f'added {number}')
+        self.assertTrue(all(f'added {number}' in bloom
+                            for number in range(1000)))
+        false_positives = sum(f'other {number}' in bloom
+                              for number in range(10000))
+        self.assertLess(false_positives, 300)
+        self.assertAlmostEqual(0.01, bloom.get_false_positive_rate(1000),
+                               places=2)
+
+    def test_size(self) -> None:
+        """A fixed size should override the rate."""
+        bloom = BloomFilter(1000, size=64)
+        self.assertEqual(64, len(bloom))
+        self.assertEqual(512, bloom.bit_count)
+        self.assertRaises(ValueError, BloomFilter, 10, 1.5)
+        self.assertRaises(ValueError, BloomFilter, 10, 0, 64)
+
+    def test_hash_count(self) -> None:
+        """Larger fixed sizes should not probe more bits than the rate needs.
+
+        The 0.01 rate needs 7 hashes.
+        """
+        counts = {BloomFilter(1000, size=size).hash_count
+                  for size in (1 << 12, 1 << 16, 1 << 20)}
+        self.assertSetEqual({7}, counts)
+        self.assertEqual(7, BloomFilter(1000).hash_count)
+
+    def test_stable(self) -> None:
+        """Filters with the same strings should have the same bits."""
+        filters = [BloomFilter(10), BloomFilter(10)]
+        for bloom in filters:
+            bloom.add('mozilla/')
+        self.assertEqual(get_attributes(filters[0]),
+                         get_attributes(filters[1]))
+
+
+class TestPrefixFilter(TestCase):
+    """Tell whether a user agent may start with a pattern head."""
+
+    def test_heads(self) -> None:
+        """Heads should end before the first wildcard."""
+        self.assertEqual('mozilla/5.0 (', get_head('mozilla/5.0 (*linux*'))
+        self.assertEqual('curl', get_head('curl?7*'))
+        self.assertEqual('', get_head('*Googlebot*'))
+
+    def test_may_match(self) -> None:
+        """Should check short heads exactly and long ones in the filter."""
+        prefix_filter = PrefixFilter(
+            ['curl/*', 'Mozilla/5.0 (*Linux*', '*Googlebot*'], prefix_size=8)
+        self.assertSetEqual({'curl/'}, prefix_filter.short_heads)
+        for user_agent in ('curl/7.52.1', 'mozilla/5.0 (x11)'):
+            with self.subTest(user_agent=user_agent):
+                self.assertTrue(prefix_filter.may_match(user_agent))
+        for user_agent in ('curl', 'wget/1.19', 'mozilla', ''):
+            with self.subTest(user_agent=user_agent):
+                self.assertFalse(prefix_filter.may_match(user_agent))
+
+
+class TestFilteredLookup(TestCase):
+    """Frozen trees should find the same patterns with the filter."""
+
+    def test_random(self) -> None:
+        """Should agree with the tree lookup on random patterns."""
+        rand = random.Random(42)
+        patterns = {get_random(rand, 'ab /*?', 8) for _ in range(200)}
+        tree, _ = build_tree(patterns - {''})
+        frozen = tree.freeze()
+        # A tiny filter has many false positives, a large one has few
+        for size in (1, 1024):
+            frozen.build_prefix_filter(prefix_size=3, size=size)
+            for _ in range(300):
+                user_agent = get_random(rand, 'ab /c', 10)
+                with self.subTest(size=size, user_agent=user_agent):
+                    self.assertEqual(lookup_pattern(tree, user_agent),
+                                     lookup_pattern(frozen, user_agent))
@@ -0,0 +1,115 @@
+"""Test building the tree from a browscap.csv file."""
+import csv
+import os
+from tempfile import TemporaryDirectory
+from typing import List
+from unittest import TestCase
+from unittest.mock import patch
+
+from browscapy.build import (build, build_parallel, decode_subtree,
+                             encode_subtree, partition, read_parent_names)
+from browscapy.node import FullPattern, Tree
+from browscapy.table import FIELDS, PropertiesTable
+from tests import get_attributes, lookup_pattern
+
+
+class TestBuild(TestCase):
+    """Build a tree from a small browscap.csv file."""
+
+    def setUp(self) -> None:
+        """Write the CSV file."""
+        self.folder = TemporaryDirectory()
+        self.csv_path = os.path.join(self.folder.name, 'browscap.csv')
+        rows = [['GJK_Browscap_Version', 'GJK_Browscap_Version'],
+                ['6000026', 'Thu, 09 Nov 2017 08:53:12 +0000'],
+                # Columns in a different order
+                list(reversed(FIELDS))]
+        for name, parent, browser in (
+                ('DefaultProperties', '', 'Default Browser'),
+                ('Firefox 57.0', 'DefaultProperties', 'Firefox'),
+                ('Mozilla/5.0 (*Linux*) Gecko* Firefox/57.0*',
+                 'Firefox 57.0', ''),
+                ('*', 'DefaultProperties', '')):
+            rows.append(list(reversed(self._get_row(name, parent, browser))))
+        with open(self.csv_path, 'w', newline='') as csv_file:
+            csv.writer(csv_file, quoting=csv.QUOTE_ALL).writerows(rows)
+
+    def tearDown(self) -> None:
+        """Remove the CSV file."""
+        self.folder.cleanup()
+
+    def test_build(self) -> None:
+        """Should store resolved properties and report progress."""
+        table = PropertiesTable()
+        progress: List[int] = []
+        tree = build(self.csv_path, table, progress.append)
+        user_agent = 'Mozilla/5.0 (X11; Linux x86_64; rv:57.0) ' \
+            'Gecko/20100101 Firefox/57.0'
+        self.assertEqual('Mozilla/5.0 (*Linux*) Gecko* Firefox/57.0*',
+                         lookup_pattern(tree, user_agent))
+        self.assertEqual('*', lookup_pattern(tree, 'curl'))
+        # Resolved browsers, by record
+        browsers = [table.get(record, 'Browser')
+                    for record in range(len(table))]
+        self.assertSequenceEqual(('Default Browser', 'Firefox', 'Firefox',
+                                  'Default Browser'), browsers)
+        self.assertSequenceEqual((4,), progress)
+
+    def test_parent_names(self) -> None:
+        """Should find only the names used as parents."""
+        self.assertSetEqual({'', 'DefaultProperties', 'Firefox 57.0'},
+                            read_parent_names(self.csv_path))
+
+    def test_no_header(self) -> None:
+        """Should raise ValueError if there is no header."""
+        with open(self.csv_path, 'w') as csv_file:
+            csv_file.write('"GJK_Browscap_Version"\n')
+        self.assertRaises(ValueError, build, self.csv_path, PropertiesTable())
+
+    @staticmethod
+    def _get_row(name: str, parent: str, browser: str) -> List[str]:
+        row = [''] * len(FIELDS)
+        row[FIELDS.index('PropertyName')] = name
+        row[FIELDS.index('Parent')] = parent
+        row[FIELDS.index('Browser')] = browser
+        return row
+
+
+class TestBuildParallel(TestCase):
+    """Build trees in multiple processes."""
+
+    PATTERNS = ('*', '*Obigo/Q05*', '*Obigo/Q03*', 'M', 'Mozilla/5.0*',
+                'Mozilla/5.0 (*Linux*', 'Mozilla/4.0*', 'Mo', 'One',
+                'One Two', 'Opera', 'a?cd*', 'a?ce*', 'curl/*')
+
+    def test_same_as_serial(self) -> None:
+        """The parallel tree should be equal to the serial one."""
+        patterns = [(pattern, record)
+                    for record, pattern in enumerate(self.PATTERNS)]
+        serial = Tree()
+        for pattern, record in patterns:
+            serial.add_node(FullPattern.from_record(pattern, record))
+        expected = serial.freeze()
+        for partitions in 1, 3, 100:
+            with self.subTest(partitions=partitions):
+                with patch('browscapy.build.PARTITIONS_PER_WORKER',
+                           partitions):
+                    actual = build_parallel(patterns, workers=2).freeze()
+                self.assertEqual(get_attributes(expected),
+                                 get_attributes(actual))
+
+    def test_partition(self) -> None:
+        """Large groups should be split by the next character."""
+        patterns = [(pattern, 0) for pattern in ('ab', 'abc', 'ac', 'b')]
+        groups = [tuple(pattern for pattern, _ in group)
+                  for group in partition(patterns, max_size=2)]
+        self.assertSequenceEqual((('ab', 'abc'), ('ac',), ('b',)), groups)
+
+    def test_encode_decode(self) -> None:
+        """Should rebuild the same subtree."""
+        tree = Tree()
+        for record, pattern in enumerate(('ab', 'abc', 'abd', 'abdd')):
+            tree.add_node(FullPattern.from_record(pattern, record))
+        encoded = encode_subtree(tree.children[0])
+        self.assertListEqual(encoded,
+                             encode_subtree(decode_subtree(encoded)))
@@ -0,0 +1,45 @@
+"""Test the LRU cache."""
+from unittest import TestCase
+
+from browscapy.cache import CacheInfo, LRUCache
+
+
+class TestLRUCache(TestCase):
+    """Test cache eviction and statistics."""
+
+    def setUp(self) -> None:
+        """Create a cache for two keys."""
+        self.cache: LRUCache[str, int] = LRUCache(2)
+
+    def test_get_put(self) -> None:
+        """Should return stored values or the default."""
+        self.cache.put('a', 1)
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        default = self.cache.get('b', 0)
+        self.assertEqual(0, default)
+
+    def test_evict_least_recently_used(self) -> None:
+        """Reading a key should make it the most recently used."""
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.cache.get('a')
+        self.cache.put('c', 3)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertEqual(3, self.cache.get('c'))
+
+    def test_info(self) -> None:
+        """Should count hits, misses and evictions."""
+        for key in 'abc':
+            self.cache.put(key, 0)
+        self.cache.get('a')
+        self.cache.get('c')
+        self.assertEqual(CacheInfo(hits=1, misses=1, evictions=1, size=2,
+                                   maxsize=2), self.cache.info())
+        self.cache.clear()
+        self.assertEqual(CacheInfo(0, 0, 0, 0, 2), self.cache.info())
+
+    def test_invalid_size(self) -> None:
+        """Should not accept a non-positive size."""
+        self.assertRaises(ValueError, LRUCache, 0)
@@ -0,0 +1,76 @@
+"""Test the classifier."""
+from unittest import TestCase
+
+from browscapy import Classifier
+from browscapy.cache import CacheInfo
+from browscapy.normalize import Normalizer
+from tests import build_tree, get_properties
+
+
+class TestClassifier(TestCase):
+    """Look up user agents with and without cache."""
+
+    def setUp(self) -> None:
+        """Create a tree with two patterns."""
+        self.firefox = get_properties('Mozilla/5.0*', Browser='Firefox')
+        self.chrome = get_properties('*Chrome/*', Browser='Chrome')
+        tree, self.table = build_tree((self.firefox, self.chrome))
+        self.frozen = tree.freeze()
+        self.classifier = Classifier(self.frozen, self.table, cache_size=2)
+
+    def test_lookup(self) -> None:
+        """Should return the properties of the matching pattern."""
+        self.assertEqual(self.firefox,
+                         self.classifier.lookup('Mozilla/5.0 (X11)'))
+        self.assertIsNone(self.classifier.lookup('curl/7.52.1'))
+
+    def test_cache(self) -> None:
+        """Should count hits and misses, including no matches."""
+        for user_agent in ('X Chrome/62', 'X Chrome/62', 'curl', 'curl'):
+            self.classifier.lookup(user_agent)
+        self.assertEqual(CacheInfo(hits=2, misses=2, evictions=0, size=2,
+                                   maxsize=2), self.classifier.cache_info())
+
+    def test_no_cache(self) -> None:
+        """Should work without cache."""
+        classifier = Classifier(self.frozen, self.table,
+                                cache_size=0)
+        self.assertEqual(self.chrome, classifier.lookup('X Chrome/62'))
+        self.assertIsNone(classifier.cache_info())
+
+    def test_fields(self) -> None:
+        """Should return only the requested properties, sharing the cache."""
+        self.classifier.lookup('X Chrome/62')
+        expected = {'Browser': 'Chrome', 'PropertyName': '*Chrome/*'}
+        self.assertEqual(expected, self.classifier.lookup(
+            'X Chrome/62', fields=('Browser', 'PropertyName')))
+        self.assertIsNone(self.classifier.lookup('curl', fields=('Browser',)))
+        self.assertEqual(CacheInfo(hits=1, misses=2, evictions=0, size=2,
+                                   maxsize=2), self.classifier.cache_info())
+
+    def test_cached_properties(self) -> None:
+        """Full lookups should keep the properties, projections the record."""
+        self.classifier.lookup('X Chrome/62', fields=('Browser',))
+        properties = self.classifier.lookup('X Chrome/62')
+        self.assertEqual(self.chrome, properties)
+        self.assertIs(properties, self.classifier.lookup('X Chrome/62'))
+
+    def test_hot_fields(self) -> None:
+        """Kept properties should be read from memory, others from table."""
+        classifier = Classifier(self.frozen, self.table,
+                                hot_fields=('Browser',))
+        hot = {'Browser': 'Firefox'}
+        self.assertEqual(hot, classifier.lookup('Mozilla/5.0 (X11)',
+                                                fields=('Browser',)))
+        mixed = {'Browser': 'Firefox', 'Platform': ''}
+        self.assertEqual(mixed, classifier.lookup(
+            'Mozilla/5.0 (X11)', fields=('Browser', 'Platform')))
+
+    def test_normalizer(self) -> None:
+        """Variants of a user agent should share a cache entry."""
+        classifier = Classifier(self.frozen, self.table,
+                                normalizer=Normalizer())
+        for user_agent in ('X Chrome/62', 'x  chrome/62', 'X CHROME/62 '):
+            self.assertEqual(self.chrome, classifier.lookup(user_agent))
+        self.assertEqual(CacheInfo(hits=2, misses=1, evictions=0, size=1,
+                                   maxsize=4096), classifier.cache_info())
@@ -0,0 +1,106 @@
+"""Test opening the database while it is updated or rebuilt."""
+import csv
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, Optional
+from unittest import TestCase
+from unittest.mock import patch
+
+from browscapy import Classifier
+from browscapy.build import build_database
+from browscapy.database import Database, load
+from browscapy.table import FIELDS, PropertiesTable
+from browscapy.update import update_database
+
+
+class ReplacedDatabase(Database):
+    """Database replaced between mapping the tree and reading the table."""
+
+    def __init__(self, replace: Callable[[], object]) -> None:
+        """Call replace before the first read of the table."""
+        super().__init__(load_table=False)
+        self.replace: Optional[Callable[[], object]] = replace
+
+    def read_table(self) -> PropertiesTable:
+        """Replace the database the first time."""
+        replace, self.replace = self.replace, None
+        if replace is not None:
+            replace()
+        return super().read_table()
+
+
+class TestLoad(TestCase):
+    """Readers should get a table with the records of their tree."""
+
+    RELEASE = {'Mozilla/5.0*': 'Firefox', '*Chrome/*': 'Chrome',
+               '*': 'Default Browser'}
+
+    def setUp(self) -> None:
+        """Build a database in a temporary home folder."""
+        self.folder = TemporaryDirectory()
+        self.csv_path = os.path.join(self.folder.name, 'browscap.csv')
+        self.home = patch.object(Path, 'home',
+                                 return_value=Path(self.folder.name))
+        self.home.start()
+        self._write_csv(self.RELEASE)
+        build_database(self.csv_path)
+
+    def tearDown(self) -> None:
+        """Remove the home folder."""
+        self.home.stop()
+        self.folder.cleanup()
+
+    def test_update(self) -> None:
+        """The previous tree should find its records in the new table."""
+        release = {'* Edge/*': 'Edge', **self.RELEASE}
+        self._write_csv(release)
+        tree, table = load(ReplacedDatabase(
+            lambda: update_database(self.csv_path)))
+        with tree:
+            self._check(Classifier(tree, table), self.RELEASE)
+        tree, table = load()
+        with tree:
+            self._check(Classifier(tree, table), release)
+
+    def test_rebuild(self) -> None:
+        """Should open both files again if a build renumbered the records."""
+        # Other records for the same patterns
+        release = {pattern: f'New {browser}' for pattern, browser
+                   in reversed(list(self.RELEASE.items()))}
+        self._write_csv(release)
+        tree, table = load(ReplacedDatabase(
+            lambda: build_database(self.csv_path)))
+        with tree:
+            self.assertEqual(tree.generation, table.generation)
+            self._check(Classifier(tree, table), release)
+
+    def test_different_builds(self) -> None:
+        """Should give up if the files keep different generations."""
+        database = Database(readonly=False, load_table=True)
+        database.table.generation += 1
+        database.close()
+        with patch('browscapy.database.LOAD_INTERVAL', 0):
+            self.assertRaises(ValueError, load)
+
+    def _check(self, classifier: Classifier,
+               release: Dict[str, str]) -> None:
+        """Each pattern should have its browser."""
+        for pattern, browser in release.items():
+            user_agent = pattern.replace('*', ' X ')
+            with self.subTest(user_agent=user_agent):
+                expected: Dict[str, str] = {'Browser': browser}
+                self.assertEqual(expected, classifier.lookup(
+                    user_agent, ('Browser',)))
+
+    def _write_csv(self, release: Dict[str, str]) -> None:
+        """Write a browscap.csv file with a browser per pattern."""
+        rows = [['GJK_Browscap_Version', 'GJK_Browscap_Version'],
+                ['6000026', 'Thu, 09 Nov 2017 08:53:12 +0000'], list(FIELDS)]
+        for pattern, browser in release.items():
+            row = [''] * len(FIELDS)
+            row[FIELDS.index('PropertyName')] = pattern
+            row[FIELDS.index('Browser')] = browser
+            rows.append(row)
+        with open(self.csv_path, 'w', newline='') as csv_file:
+            csv.writer(csv_file, quoting=csv.QUOTE_ALL).writerows(rows)
@@ -0,0 +1,58 @@
+"""Test the frozen tree."""
+from unittest import TestCase
+from unittest.mock import patch
+
+from browscapy.frozen import NO_RECORD, FrozenTree
+from browscapy.node import Tree
+from tests import build_tree, lookup_pattern
+
+
+class TestFrozenTree(TestCase):
+    """Compare frozen tree lookups with the mutable tree ones."""
+
+    PATTERNS = ('*', 'Mozilla/5.0*', 'Mozilla/5.0 (*Linux*', 'mozilla/4.0*',
+                '*Obigo/Q05*', '*Obigo/Q03*', 'One', 'One Two', 'a?cd*',
+                'a?ce*', 'curl/*')
+    USER_AGENTS = ('Mozilla/5.0 (X11; Linux x86_64)', 'Mozilla/5.0',
+                   'mozilla/4.0 test', 'X Obigo/Q05 Y', 'One', 'One Two',
+                   'One Three', 'abce', 'abcd', 'curl/7.52.1', '')
+
+    tree: Tree
+    frozen: FrozenTree
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Build both trees."""
+        cls.tree, _ = build_tree(cls.PATTERNS)
+        cls.frozen = cls.tree.freeze()
+
+    def test_lookups(self) -> None:
+        """Both trees should find the same patterns."""
+        for user_agent in self.USER_AGENTS:
+            with self.subTest(user_agent=user_agent):
+                self.assertEqual(lookup_pattern(self.tree, user_agent),
+                                 lookup_pattern(self.frozen, user_agent))
+
+    def test_compiled(self) -> None:
+        """Should compile matched patterns only, keeping the recent ones."""
+        frozen = self.tree.freeze()
+        self.assertFalse(frozen.compiled)
+        with patch('browscapy.frozen.COMPILED_CACHE_SIZE', 2):
+            for user_agent in self.USER_AGENTS:
+                with self.subTest(user_agent=user_agent):
+                    self.assertEqual(lookup_pattern(self.tree, user_agent),
+                                     lookup_pattern(frozen, user_agent))
+                    self.assertLessEqual(len(frozen.compiled), 2)
+
+    def test_no_match(self) -> None:
+        """Should return None when no pattern matches."""
+        tree, _ = build_tree(['abc'])
+        self.assertIsNone(tree.freeze().lookup('abd'))
+
+    def test_records(self) -> None:
+        """Each pattern should have one record."""
+        records = [record for record in self.frozen.records
+                   if record != NO_RECORD]
+        self.assertEqual(len(self.PATTERNS), len(records))
+        patterns = {self.frozen.pattern(record) for record in records}
+        self.assertSetEqual(set(self.PATTERNS), patterns)
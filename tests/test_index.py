@@ -0,0 +1,52 @@
+"""Test the substring index of patterns starting with wildcards."""
+import random
+from unittest import TestCase
+
+from browscapy.index import TokenIndex, get_tokens
+from browscapy.matcher import Pattern
+from tests import build_tree, get_random, lookup_pattern
+
+
+class TestTokenIndex(TestCase):
+    """Index patterns by substrings of their literal segments."""
+
+    def test_tokens(self) -> None:
+        """Tokens should not contain wildcards."""
+        self.assertSetEqual({'obig', 'bigo', 'igo/', 'go/q', 'o/q0'},
+                            get_tokens('*obigo/q0?*'))
+        self.assertSetEqual({'msie'}, get_tokens('*msie*?ie*'))
+        self.assertSetEqual(set(), get_tokens('*ie*'))
+
+    def test_unindexed(self) -> None:
+        """Patterns without tokens should always be candidates."""
+        index = TokenIndex([('*IE*', 0), ('*MSIE*', 1)])
+        self.assertSequenceEqual(((Pattern('*ie*'), 0),),
+                                 index.get_candidates('curl'))
+
+    def test_search(self) -> None:
+        """Should return the best pattern among the candidates."""
+        index = TokenIndex([('*Obigo/Q0?*', 0), ('*Obigo/Q05*', 1),
+                            ('*Googlebot*', 2)])
+        self.assertEqual(3, len(index))
+        self.assertEqual(1, index.lookup('X Obigo/Q05 Y'))
+        self.assertEqual(0, index.lookup('X Obigo/Q03 Y'))
+        self.assertEqual(2, index.lookup('Googlebot/2.1'))
+        self.assertIsNone(index.lookup('curl/7.52.1'))
+
+
+class TestIndexedLookup(TestCase):
+    """Frozen trees should find the same patterns with the index."""
+
+    CASES = 500
+
+    def test_random(self) -> None:
+        """Should agree with the tree lookup on random patterns."""
+        rand = random.Random(42)
+        patterns = {get_random(rand, 'ab /*?', 8) for _ in range(200)}
+        tree, _ = build_tree(patterns - {''})
+        frozen = tree.freeze(token_index=True)
+        for _ in range(self.CASES):
+            user_agent = get_random(rand, 'ab /', 10)
+            with self.subTest(user_agent=user_agent):
+                self.assertEqual(lookup_pattern(tree, user_agent),
+                                 lookup_pattern(frozen, user_agent))
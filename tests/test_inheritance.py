@@ -0,0 +1,58 @@
+"""Test the inheritance resolution."""
+from typing import Tuple
+from unittest import TestCase
+
+from browscapy.inheritance import Resolver
+from browscapy.properties import Properties
+from tests import get_properties
+
+
+class TestResolver(TestCase):
+    """Resolve parents of browscap rows."""
+
+    def test_inherit_chain(self) -> None:
+        """Empty properties should come from the closest ancestor."""
+        rows = [self._get_row('Default', '', 'Default Browser', 'unknown'),
+                self._get_row('Firefox', 'Default', 'Firefox', ''),
+                self._get_row('Firefox/57*', 'Firefox', '', 'Linux')]
+        resolved = list(Resolver().resolve(rows))
+        self.assertEqual(('Firefox', 'unknown'), self._get_values(resolved[1]))
+        self.assertEqual(('Firefox', 'Linux'), self._get_values(resolved[2]))
+        self.assertEqual('Firefox', resolved[2].Parent)
+
+    def test_child_before_parent(self) -> None:
+        """A child should be resolved when its parent is found."""
+        rows = [self._get_row('Firefox/57*', 'Firefox', '', ''),
+                self._get_row('Firefox', '', 'Firefox', 'unknown')]
+        resolved = list(Resolver({'Firefox'}).resolve(rows))
+        names = [row.PropertyName for row in resolved]
+        self.assertSequenceEqual(('Firefox', 'Firefox/57*'), names)
+        self.assertEqual(('Firefox', 'unknown'), self._get_values(resolved[1]))
+
+    def test_unknown_parent(self) -> None:
+        """Should raise ValueError when a parent is missing."""
+        rows = [self._get_row('Firefox/57*', 'Firefox', '', '')]
+        with self.assertRaisesRegex(ValueError, 'Unknown parents: Firefox'):
+            list(Resolver().resolve(rows))
+
+    def test_cycle(self) -> None:
+        """Should raise ValueError when there's a cycle."""
+        rows = [self._get_row('a', 'b', '', ''),
+                self._get_row('b', 'a', '', '')]
+        with self.assertRaisesRegex(ValueError, 'cycle: a -> b -> a'):
+            list(Resolver().resolve(rows))
+
+    def test_own_parent(self) -> None:
+        """Should raise ValueError when a row is its own parent."""
+        rows = [self._get_row('a', 'a', '', '')]
+        self.assertRaises(ValueError, list, Resolver().resolve(rows))
+
+    @staticmethod
+    def _get_values(row: Properties) -> Tuple[str, str]:
+        return row.Browser, row.Platform
+
+    @staticmethod
+    def _get_row(name: str, parent: str, browser: str,
+                 platform: str) -> Properties:
+        return get_properties(name, Parent=parent, Browser=browser,
+                              Platform=platform)
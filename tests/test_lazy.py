@@ -0,0 +1,81 @@
+"""Test loading the classifier on first use."""
+import subprocess
+import sys
+import threading
+from typing import Dict, List, Tuple
+from unittest import TestCase
+
+from browscapy.classifier import Backend
+from browscapy.lazy import LazyClassifier
+from browscapy.storage import Store
+from tests import build_tree, get_properties
+
+
+class TestLazyClassifier(TestCase):
+    """Load once, when needed or in the background."""
+
+    def setUp(self) -> None:
+        """Count the loads of a tree with one pattern."""
+        self.loads = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def test_first_lookup(self) -> None:
+        """Should load on the first lookup only."""
+        lazy = LazyClassifier(self._load)
+        self.assertFalse(lazy.is_loaded())
+        self.assertEqual(0, self.loads)
+        self.assertEqual(get_properties('Mozilla/5.0*', Browser='Firefox'),
+                         lazy.lookup('Mozilla/5.0 (X11)'))
+        expected: Dict[str, str] = {'Browser': 'Firefox'}
+        self.assertEqual(expected,
+                         lazy.lookup('Mozilla/5.0', fields=('Browser',)))
+        self.assertTrue(lazy.is_loaded())
+        self.assertEqual(1, self.loads)
+
+    def test_preload(self) -> None:
+        """Lookups should wait for the background load."""
+        self.release.clear()
+        lazy = LazyClassifier(self._load)
+        future = lazy.preload()
+        self.assertIs(future, lazy.preload())
+        results: List[object] = []
+        thread = threading.Thread(
+            target=lambda: results.append(lazy.lookup('curl')))
+        thread.start()
+        self.assertFalse(future.done())
+        self.release.set()
+        thread.join()
+        self.assertIs(lazy.classifier, future.result())
+        self.assertSequenceEqual((None,), results)
+        self.assertEqual(1, self.loads)
+
+    def test_failure(self) -> None:
+        """Should raise the loader's error and load again next time."""
+        lazy = LazyClassifier(self._fail_once)
+        self.assertRaises(FileNotFoundError, lazy.lookup, 'curl')
+        self.assertIsNone(lazy.lookup('curl'))
+        self.assertEqual(2, self.loads)
+
+    def test_import(self) -> None:
+        """Importing browscapy should import neither backends nor stores."""
+        code = ('import sys, browscapy; '
+                'print(*sorted(name for name in sys.modules if name in '
+                '("browscapy.classifier", "browscapy.storage", "sqlite3", '
+                '"mmap", "concurrent.futures")))')
+        imported = subprocess.run([sys.executable, '-c', code], check=True,
+                                  capture_output=True, text=True).stdout
+        self.assertEqual('', imported.strip())
+
+    def _load(self) -> Tuple[Backend, Store]:
+        self.release.wait()
+        self.loads += 1
+        tree, table = build_tree(
+            [get_properties('Mozilla/5.0*', Browser='Firefox')])
+        return tree.freeze(), table
+
+    def _fail_once(self) -> Tuple[Backend, Store]:
+        if not self.loads:
+            self.loads += 1
+            raise FileNotFoundError('tree')
+        return self._load()
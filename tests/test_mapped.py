@@ -0,0 +1,50 @@
+"""Test the memory-mapped tree file."""
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from browscapy.mapped import MappedTree, dump
+from tests import build_tree, lookup_pattern
+
+
+class TestMappedTree(TestCase):
+    """Dump a frozen tree and query the file."""
+
+    PATTERNS = ('*', 'Mozilla/5.0*', 'Mozilla/5.0 (*Linux*', '*Obigo/Q05*',
+                '*Obigo/Q03*', 'One', 'One Two', 'Señor*')
+    USER_AGENTS = ('Mozilla/5.0 (X11; Linux x86_64)', 'X Obigo/Q05 Y', 'One',
+                   'One Two', 'One Three', 'señor bot')
+
+    def setUp(self) -> None:
+        """Dump a frozen tree to a temporary folder."""
+        tree, _ = build_tree(self.PATTERNS)
+        self.frozen = tree.freeze()
+        self.folder = TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, 'tree')
+        dump(self.frozen, self.path)
+
+    def tearDown(self) -> None:
+        """Remove the temporary folder."""
+        self.folder.cleanup()
+
+    def test_lookups(self) -> None:
+        """The mapped tree should find the same records."""
+        with MappedTree(self.path) as mapped:
+            for user_agent in self.USER_AGENTS:
+                with self.subTest(user_agent=user_agent):
+                    self.assertEqual(self.frozen.lookup(user_agent),
+                                     mapped.lookup(user_agent))
+                    self.assertEqual(lookup_pattern(self.frozen, user_agent),
+                                     lookup_pattern(mapped, user_agent))
+
+    def test_not_a_tree_file(self) -> None:
+        """Should raise ValueError for other files."""
+        with open(self.path, 'wb') as tree_file:
+            tree_file.write(b'not a tree file' * 3)
+        self.assertRaises(ValueError, MappedTree, self.path)
+
+    def test_truncated_file(self) -> None:
+        """Should raise ValueError if the file is incomplete."""
+        with open(self.path, 'r+b') as tree_file:
+            tree_file.truncate(os.path.getsize(self.path) - 1)
+        self.assertRaises(ValueError, MappedTree, self.path)
@@ -1,7 +1,11 @@
 """Tests for the matcher algorithm."""
+import random
+from fnmatch import fnmatchcase
 from unittest import TestCase
 
-from browscapy.matcher import match
+from browscapy.matcher import compile as compile_pattern
+from browscapy.matcher import match, match_prefix
+from tests import get_random
 
 
 class TestMatcher(TestCase):
@@ -69,3 +73,73 @@ class TestMatcher(TestCase):
         actual_does_match, actual_length = match(pattern, user_agent)
         self.assertEqual(does_match, actual_does_match)
         self.assertEqual(length, actual_length)
+
+
+class TestCompiledPattern(TestMatcher):
+    """Run the same tests with a compiled pattern."""
+
+    def test_repeated_chars_after_star(self) -> None:
+        """Should find a segment after a partial occurrence."""
+        self._test_match('*obigo/q03*', 'Browser Obigo/Q03 Test', True, 9)
+
+    def test_question_mark_in_segment(self) -> None:
+        """Should find a segment with a question mark after a star."""
+        self._test_match('*a?c*', 'xxabxaxc', True, 2)
+        self._test_match('*a?c*', 'xxabxaxd', False, 0)
+
+    def _test_match(self, pattern, user_agent, does_match, length):
+        """Assert user_agent matches the compiled pattern."""
+        compiled = compile_pattern(pattern)
+        actual = compiled.match(user_agent.lower())
+        self.assertEqual((does_match, length), actual)
+
+
+class TestMatchPrefix(TestCase):
+    """Test matching the beginning of a string."""
+
+    def test_literal_prefix(self) -> None:
+        """Should match a literal prefix, but not a different one."""
+        self.assertTrue(match_prefix('mozilla/', 'mozilla/5.0'))
+        self.assertFalse(match_prefix('mozilla/4', 'mozilla/5.0'))
+
+    def test_longer_pattern(self) -> None:
+        """A pattern longer than the string shouldn't match."""
+        self.assertFalse(match_prefix('abcd', 'abc'))
+
+    def test_star_backtracking(self) -> None:
+        """Star should consume as many chars as needed."""
+        self.assertTrue(match_prefix('*a*b', 'aaacab'))
+        self.assertFalse(match_prefix('*a*b', 'aaaca'))
+
+    def test_question_mark(self) -> None:
+        """Question mark should match exactly one char."""
+        self.assertTrue(match_prefix('a?c', 'abcd'))
+        self.assertFalse(match_prefix('a?c', 'ab'))
+
+
+class TestDifferential(TestCase):
+    """Compare the matcher with Python's fnmatch on random inputs."""
+
+    CASES = 2000
+
+    def test_fnmatch(self) -> None:
+        """Should agree with fnmatch on random patterns and strings."""
+        rand = random.Random(42)
+        for _ in range(self.CASES):
+            pattern = get_random(rand, 'ab*?', 8)
+            string = get_random(rand, 'ab', 10)
+            with self.subTest(pattern=pattern, string=string):
+                self.assertEqual(fnmatchcase(string, pattern),
+                                 match(pattern, string)[0])
+                self.assertEqual(fnmatchcase(string, pattern + '*'),
+                                 match_prefix(pattern, string))
+
+    def test_score(self) -> None:
+        """A match should count all characters that are not wildcards."""
+        self.assertEqual((True, 4), match('*a*a?*b*b', 'aaaaaabbbb'))
+
+    def test_many_stars(self) -> None:
+        """Should not take exponential time with many stars."""
+        pattern = '*a' * 30 + '*b'
+        self.assertFalse(match(pattern, 'a' * 5000)[0])
+        self.assertFalse(match_prefix(pattern, 'a' * 5000))
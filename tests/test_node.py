@@ -1,10 +1,10 @@
 """Test Node class."""
-from typing import List, Sequence
+from typing import Sequence
 from unittest import TestCase
-from unittest.mock import MagicMock
 
 from browscapy.node import FullPattern, Parent, PartialPattern, Tree
-from browscapy.properties import Properties
+from browscapy.table import PropertiesTable
+from tests import get_properties, lookup_pattern
 
 
 class TestNode(TestCase):
@@ -12,8 +12,8 @@ class TestNode(TestCase):
 
     @classmethod
     def setUpClass(cls) -> None:
-        """Mock the database."""
-        FullPattern.DATABASE = MagicMock()
+        """Use an in-memory database."""
+        FullPattern.DATABASE = PropertiesTable()
 
     def test_add_nodes(self) -> None:
         """Add 2 nodes with a common prefix."""
@@ -65,12 +65,77 @@ class TestNode(TestCase):
         tree = self._add_patterns('ab', 'ac', 'a')
         self.assertIsInstance(tree.children[0], FullPattern)
 
+    def test_add_prefix_of_full(self) -> None:
+        """A shorter pattern should become the parent of a longer one."""
+        self._test_addition(['One Two', 'One'], ['One'], ['One Two'])
+
+    def test_add_prefix_of_partial(self) -> None:
+        """A pattern shorter than a partial one should be its parent."""
+        tree = self._add_patterns('abc', 'abd', 'a')
+        child = tree.children[0]
+        self.assertIsInstance(child, FullPattern)
+        self.assertEqual('a', child.pattern)
+        patterns = [node.pattern for node in child.children]
+        self.assertSequenceEqual(('ab',), patterns)
+
     def test_partial_change(self) -> None:
         """Create another PartialPattern from a PartialPattern."""
         patterns = '*Obigo/Q05*', '*Obigo/Q03*', '*Obigo/WAP2.0*'
         self._test_addition(patterns, ['*Obigo/'],
                             ['*Obigo/Q0', patterns[-1]])
 
+    def test_lookup_literal(self) -> None:
+        """Should find the pattern equal to the user agent."""
+        tree = self._add_patterns('abc', 'abd', 'ab')
+        self.assertEqual('abd', lookup_pattern(tree, 'abd'))
+
+    def test_lookup_no_match(self) -> None:
+        """Should return None when no pattern matches."""
+        tree = self._add_patterns('abc', 'abd')
+        self.assertIsNone(tree.lookup('abe'))
+
+    def test_lookup_case_insensitive(self) -> None:
+        """Should ignore case in both patterns and user agents."""
+        tree = self._add_patterns('Mozilla/5.0*', 'curl*')
+        self.assertEqual('Mozilla/5.0*',
+                         lookup_pattern(tree, 'mozilla/5.0 X'))
+
+    def test_lookup_wildcard_prefix(self) -> None:
+        """Should descend PartialPatterns that have a star."""
+        tree = self._add_patterns('*Obigo/Q05*', '*Obigo/Q03*',
+                                  '*Obigo/WAP2.0*', '*')
+        user_agent = 'Browser Obigo/Q03 Test'
+        self.assertEqual('*Obigo/Q03*', lookup_pattern(tree, user_agent))
+
+    def test_lookup_question_mark(self) -> None:
+        """Should match question marks in the middle of a prefix."""
+        tree = self._add_patterns('a?cd*', 'a?ce*')
+        self.assertEqual('a?ce*', lookup_pattern(tree, 'abcef'))
+
+    def test_lookup_precedence(self) -> None:
+        """The pattern with more characters in common should win."""
+        tree = self._add_patterns('*', 'Mozilla/5.0*',
+                                  'Mozilla/5.0 (*Linux*')
+        user_agent = 'Mozilla/5.0 (X11; Linux x86_64)'
+        self.assertEqual('Mozilla/5.0 (*Linux*',
+                         lookup_pattern(tree, user_agent))
+        self.assertEqual('*', lookup_pattern(tree, 'curl'))
+
+    def test_lookup_many(self) -> None:
+        """Should return the same as lookup, in the input order."""
+        tree = self._add_patterns('*', 'Mozilla/5.0*', 'Mozilla/5.0 (*Linux*',
+                                  'Mozilla/4.0*', '*Obigo/Q03*', 'a?ce*')
+        user_agents = ['Mozilla/5.0 (X11; Linux)', 'curl', 'mozilla/4.0 x',
+                       'X Obigo/Q03 Test', 'abce', 'Mozilla/5.0 (X11; Linux)',
+                       'MOZILLA/5.0 (Windows)']
+        expected = [lookup_pattern(tree, user_agent)
+                    for user_agent in user_agents]
+        for chunk_size in 1, 3, 100:
+            with self.subTest(chunk_size=chunk_size):
+                actual = [None if node is None else node.pattern for node
+                          in tree.lookup_many(user_agents, chunk_size)]
+                self.assertListEqual(expected, actual)
+
     def _test_addition(self, patterns: Sequence[str],
                        *level_patterns: Sequence[str]) -> None:
         """Add patterns and compare resulting patterns of each level."""
@@ -90,11 +155,5 @@ class TestNode(TestCase):
 
     @classmethod
     def _get_full_pattern(cls, pattern: str) -> FullPattern:
-        properties = cls._get_properties(pattern)
+        properties = get_properties(pattern)
         return FullPattern(properties)
-
-    @staticmethod
-    def _get_properties(pattern: str) -> Properties:
-        prop_values: List[str] = [None] * len(Properties._fields)
-        prop_values[0] = pattern
-        return Properties(*prop_values)
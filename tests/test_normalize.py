@@ -0,0 +1,31 @@
+"""Test the normalization of user agents."""
+from unittest import TestCase
+
+from browscapy.normalize import BUILD_ID_RULE, Normalizer, rule
+
+
+class TestNormalizer(TestCase):
+    """Variants of a user agent should have the same canonical form."""
+
+    def test_default(self) -> None:
+        """Should fold case, remove GUIDs and collapse whitespace."""
+        normalizer = Normalizer()
+        variants = (
+            'Mozilla/5.0 (Windows NT 10.0)  App/1.2',
+            ' mozilla/5.0 (windows nt 10.0)\tapp/1.2 ',
+            'Mozilla/5.0 (Windows NT 10.0) '
+            '{4B0C5A1E-93D7-4F21-9E11-2D7A4A6C0B3F} App/1.2',
+            'Mozilla/5.0 (Windows NT 10.0) '
+            '4b0c5a1e-93d7-4f21-9e11-2d7a4a6c0b3f App/1.2')
+        for variant in variants:
+            with self.subTest(variant=variant):
+                self.assertEqual('mozilla/5.0 (windows nt 10.0) app/1.2',
+                                 normalizer(variant))
+
+    def test_rules(self) -> None:
+        """Should apply the given rules in order."""
+        normalizer = Normalizer((BUILD_ID_RULE, rule(r'session=\w+')),
+                                collapse_whitespace=False)
+        self.assertEqual('mozilla/5.0 (linux; nexus 5 build/)  x',
+                         normalizer('Mozilla/5.0 (Linux; Nexus 5 '
+                                    'Build/KOT49H) session=a1B2 x'))
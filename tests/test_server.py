@@ -0,0 +1,110 @@
+"""Test the lookup server and client."""
+import asyncio
+import os
+import tempfile
+import threading
+from typing import Awaitable, List, Optional, Set, Tuple, cast
+from unittest import TestCase
+
+from browscapy.properties import Properties
+from browscapy.server import Client, Server, pack, unpack
+from tests import build_tree, get_properties
+
+
+def get_names(results: List[Optional[Properties]]) -> List[Optional[str]]:
+    """Return the pattern of each result, or None."""
+    return [None if result is None else result.PropertyName
+            for result in results]
+
+
+class TestProtocol(TestCase):
+    """Encode and decode message bodies."""
+
+    def test_round_trip(self) -> None:
+        """Should decode the encoded items."""
+        items = [b'', b'Mozilla/5.0', 'Agente é'.encode()]
+        self.assertListEqual(items, unpack(pack(items)))
+
+    def test_malformed(self) -> None:
+        """Should reject bodies with extra bytes."""
+        with self.assertRaises(ValueError):
+            unpack(pack([b'a']) + b'b')
+
+
+class TestServer(TestCase):
+    """Look up user agents through a Unix socket."""
+
+    PATTERNS = ('Mozilla/5.0*', '*Chrome/*')
+
+    def setUp(self) -> None:
+        """Start a server in another thread."""
+        # Values as long as the usual ones, for responses of a usual size
+        tree, table = build_tree(
+            get_properties(pattern, 'Value of a usual size')
+            for pattern in self.PATTERNS)
+        server = Server(tree.freeze(), table)
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, 'socket')
+        self.loop = asyncio.new_event_loop()
+        self.unix_server = self.loop.run_until_complete(
+            asyncio.start_unix_server(server.handle, self.path))
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        self.client = Client(self.path, pool_size=1)
+
+    def tearDown(self) -> None:
+        """Stop the server."""
+        self.client.close()
+        asyncio.run_coroutine_threadsafe(self._wait_handlers(),
+                                         self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.unix_server.close()
+        self.loop.run_until_complete(self.unix_server.wait_closed())
+        self.loop.close()
+        self.folder.cleanup()
+
+    def test_lookup(self) -> None:
+        """Should return the properties of the matching pattern."""
+        self.assertEqual(get_properties('Mozilla/5.0*',
+                                        'Value of a usual size'),
+                         self.client.lookup('Mozilla/5.0 (X11)'))
+        self.assertIsNone(self.client.lookup('curl'))
+
+    def test_pipelining(self) -> None:
+        """Should keep the order of many batches in flight."""
+        user_agents = ['Mozilla/5.0', 'X Chrome/62', 'curl'] * 7
+        results = self.client.lookup_many(user_agents, batch_size=2,
+                                          window=3)
+        expected: Tuple[Optional[str], ...] = (
+            'Mozilla/5.0*', '*Chrome/*', None) * 7
+        self.assertSequenceEqual(expected, get_names(results))
+
+    def test_full_window(self) -> None:
+        """Should answer while the client is still sending its window.
+
+        The batches and their responses are larger than the socket buffers.
+        """
+        user_agents = [
+            f'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+            f'(KHTML, like Gecko) Chrome/{number}.0 Safari/537.36'
+            for number in range(20000)]
+        results = self.client.lookup_many(user_agents)
+        self.assertEqual(len(user_agents), len(results))
+        self.assertSetEqual({'Mozilla/5.0*'}, set(get_names(results)))
+
+    def test_pool(self) -> None:
+        """Should reuse the idle connection."""
+        self.client.lookup('curl')
+        connection = self.client._pool.queue[0]
+        self.client.lookup('curl')
+        self.assertSequenceEqual((connection,), self.client._pool.queue)
+
+    @staticmethod
+    async def _wait_handlers() -> None:
+        """Wait for the handlers of the closed connections to return."""
+        current = cast(object, asyncio.current_task())
+        for task in cast(Set[Awaitable[object]], asyncio.all_tasks()):
+            if task is not current:
+                await task
@@ -0,0 +1,78 @@
+"""Test the lookup and build instrumentation."""
+from typing import Dict, List, Tuple
+from unittest import TestCase
+
+from browscapy import Classifier, stats
+from browscapy.node import Node
+from tests import build_tree
+
+
+class TestStats(TestCase):
+    """Count events and time calls only while enabled."""
+
+    def setUp(self) -> None:
+        """Enable statistics with a hook."""
+        self.calls: List[Tuple[str, str, Dict[str, int]]] = []
+        self.stats = stats.enable(self._hook)
+        self.tree, self.table = build_tree(
+            ('Mozilla/5.0*', 'Mozilla/5.0 (*Linux*', '*'))
+
+    def tearDown(self) -> None:
+        """Restore the original functions."""
+        stats.disable()
+
+    def test_build(self) -> None:
+        """Should time insertions and count pattern comparisons."""
+        self.assertEqual(3, self.stats.timings['Tree.add_node'].count)
+        self.assertGreater(self.stats.counters['get_score'], 0)
+        self.assertEqual('Mozilla/5.0*', self.calls[0][1])
+
+    def test_lookup(self) -> None:
+        """Should pass the counters of each lookup to the hook."""
+        self.calls.clear()
+        self.tree.lookup('Mozilla/5.0 (X11; Linux)')
+        name, user_agent, counters = self.calls[0]
+        self.assertEqual('Tree.lookup', name)
+        self.assertEqual('Mozilla/5.0 (X11; Linux)', user_agent)
+        self.assertEqual(3, counters['match'])
+        self.assertEqual(4, counters['nodes_visited'])
+
+    def test_lookup_many(self) -> None:
+        """Should count the nodes visited by batch lookups."""
+        list(self.tree.lookup_many(['Mozilla/5.0 (X11; Linux)', 'curl']))
+        self.assertGreater(self.stats.counters['nodes_visited'], 0)
+
+    def test_classifier(self) -> None:
+        """Should count cache results and table reads."""
+        classifier = Classifier(self.tree.freeze(), self.table)
+        for user_agent in ('curl', 'curl', 'Mozilla/5.0'):
+            classifier.lookup(user_agent)
+        counters = self.stats.counters
+        self.assertEqual((1, 2, 2), (counters['cache_hits'],
+                                     counters['cache_misses'],
+                                     counters['table_reads']))
+        timings = self.stats.timings
+        self.assertEqual(3, timings['Classifier.lookup'].count)
+        self.assertEqual(2, timings['FrozenTree.lookup'].count)
+
+    def test_disable(self) -> None:
+        """Should restore the original functions."""
+        stats.disable()
+        self.assertIsNone(stats.STATS)
+        self.assertFalse(hasattr(Node.get_score, '__wrapped__'))
+        self.tree.lookup('Mozilla/5.0')
+        self.assertEqual(0, self.stats.counters['match'])
+
+    def test_histogram(self) -> None:
+        """Percentiles should be bucket upper bounds."""
+        histogram = stats.Histogram()
+        for seconds in (0.5e-6, 3e-6, 3e-6, 100e-6):
+            histogram.add(seconds)
+        self.assertSequenceEqual((1, 0, 2, 0, 0, 0, 0, 1),
+                                 histogram.buckets)
+        self.assertAlmostEqual(4e-6, histogram.percentile(50))
+        self.assertAlmostEqual(100e-6, histogram.percentile(100))
+
+    def _hook(self, name: str, argument: str, _seconds: float,
+              counters: Dict[str, int]) -> None:
+        self.calls.append((name, argument, counters))
@@ -0,0 +1,134 @@
+"""Test the properties storage backends."""
+import os
+import threading
+from tempfile import TemporaryDirectory
+from typing import List
+from unittest import TestCase
+
+from browscapy.node import Tree
+from browscapy.properties import Properties
+from browscapy.storage import HotFields, RecordFileStore, SQLiteStore, Store
+from browscapy.table import PropertiesTable
+from tests import get_properties, lookup_properties
+
+
+ROWS = [get_properties('Mozilla/5.0*', Browser='Firefox'),
+        get_properties('*Chrome/*', Browser='Chrome'),
+        get_properties('*', Browser='Défaut')]
+
+
+class TestStores(TestCase):
+    """All backends should return the stored records."""
+
+    def setUp(self) -> None:
+        """Create a folder for the store files."""
+        self.folder = TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        """Remove the store files."""
+        self.folder.cleanup()
+
+    def test_table(self) -> None:
+        """The in-memory table is a store."""
+        table = PropertiesTable()
+        self._check_writable(table)
+
+    def test_sqlite(self) -> None:
+        """Should write records and read them in another connection."""
+        path = os.path.join(self.folder.name, 'properties.sqlite')
+        store = SQLiteStore(path)
+        self._check_writable(store)
+        store.commit()
+        reader = SQLiteStore(path, readonly=True)
+        try:
+            self._check_records(reader)
+            self.assertRaises(TypeError, reader.append, ROWS[0])
+        finally:
+            reader.close()
+            store.close()
+
+    def test_sqlite_threads(self) -> None:
+        """Each thread should have its own connection."""
+        path = os.path.join(self.folder.name, 'properties.sqlite')
+        store = SQLiteStore(path)
+        for row in ROWS:
+            store.append(row)
+        store.close()
+        reader = SQLiteStore(path, readonly=True)
+        results: List[Properties] = []
+        thread = threading.Thread(target=lambda: results.append(reader[1]))
+        thread.start()
+        thread.join()
+        self.assertSequenceEqual((ROWS[1],), results)
+
+    def test_record_file(self) -> None:
+        """Should read the records written from another store."""
+        table = PropertiesTable()
+        for row in ROWS:
+            table.append(row)
+        path = os.path.join(self.folder.name, 'records')
+        RecordFileStore.dump(table, path)
+        store = RecordFileStore(path)
+        try:
+            self._check_records(store)
+            self.assertRaises(IndexError, store.__getitem__, len(ROWS))
+            self.assertRaises(TypeError, store.append, ROWS[0])
+        finally:
+            store.close()
+
+    def test_record_file_corrupt(self) -> None:
+        """Should reject files in other formats."""
+        path = os.path.join(self.folder.name, 'records')
+        with open(path, 'wb') as records_file:
+            records_file.write(b'BRCT' + bytes(100))
+        self.assertRaises(ValueError, RecordFileStore, path)
+
+    def test_trees(self) -> None:
+        """Trees in the same process may use different stores."""
+        trees = [Tree(store=PropertiesTable()), Tree(store=PropertiesTable())]
+        for tree, browser in zip(trees, ('Firefox', 'Iceweasel')):
+            tree.add_properties(get_properties('Mozilla/5.0*',
+                                               Browser=browser))
+        found = [lookup_properties(tree, 'Mozilla/5.0 (X11)')
+                 for tree in trees]
+        self.assertSequenceEqual(
+            (get_properties('Mozilla/5.0*', Browser='Firefox'),
+             get_properties('Mozilla/5.0*', Browser='Iceweasel')), found)
+
+    def test_project(self) -> None:
+        """All backends should return the same projections."""
+        table = PropertiesTable()
+        for row in ROWS:
+            table.append(row)
+        path = os.path.join(self.folder.name, 'records')
+        RecordFileStore.dump(table, path)
+        sqlite = SQLiteStore(os.path.join(self.folder.name, 'db.sqlite'))
+        for row in ROWS:
+            sqlite.append(row)
+        fields = ('Browser', 'PropertyName', 'Platform')
+        expected = [{'Browser': row.Browser, 'PropertyName': row.PropertyName,
+                     'Platform': ''} for row in ROWS]
+        record_file = RecordFileStore(path)
+        try:
+            for store in (table, record_file, sqlite, HotFields(table,
+                                                                fields)):
+                with self.subTest(store=type(store).__name__):
+                    projections = [store.project(record, fields)
+                                   for record in range(len(ROWS))]
+                    self.assertListEqual(expected, projections)
+                    self.assertRaises(KeyError, store.project, 0,
+                                      ('Browser', 'Unknown'))
+        finally:
+            record_file.close()
+            sqlite.close()
+
+    def _check_writable(self, store: Store) -> None:
+        for row in ROWS:
+            store.append(row)
+        store[2] = ROWS[2]
+        self._check_records(store)
+
+    def _check_records(self, store: Store) -> None:
+        self.assertEqual(len(ROWS), len(store))
+        records = list(store)
+        self.assertListEqual(ROWS, records)
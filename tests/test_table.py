@@ -0,0 +1,71 @@
+"""Test the columnar properties table."""
+from io import BytesIO
+from unittest import TestCase
+
+from browscapy.properties import Properties
+from browscapy.table import FIELDS, PropertiesTable
+from tests import get_properties
+
+
+class TestPropertiesTable(TestCase):
+    """Store and retrieve properties."""
+
+    def setUp(self) -> None:
+        """Create a table with two records."""
+        self.table = PropertiesTable()
+        self.first = self._get_properties('Mozilla/5.0*', 'Firefox')
+        self.second = self._get_properties('*Chrome*', 'Chrome')
+        self.table.append(self.first)
+        self.table.append(self.second)
+
+    def test_get_records(self) -> None:
+        """Should decode the same properties."""
+        self.assertEqual(self.first, self.table[0])
+        self.assertEqual(self.second, self.table[1])
+
+    def test_interned_values(self) -> None:
+        """Repeated values should be stored once."""
+        self.assertSequenceEqual(('unknown',), self.table.values[-1])
+        self.assertEqual(2, len(self.table.values[0]))
+
+    def test_replace(self) -> None:
+        """Should replace the properties of a record."""
+        third = self._get_properties('*Chrome*', 'Chromium')
+        self.table[1] = third
+        self.assertEqual(third, self.table[1])
+        self.assertEqual(2, len(self.table))
+
+    def test_view(self) -> None:
+        """A view should decode the accessed field."""
+        view = self.table.view(0)
+        self.assertEqual('Firefox', view.Browser)
+        self.assertEqual(self.first, view.materialize())
+        with self.assertRaises(AttributeError):
+            view.Unknown  # pylint: disable=pointless-statement
+
+    def test_widen_column(self) -> None:
+        """Should store more codes than a byte allows."""
+        for number in range(300):
+            self.table.append(self._get_properties(str(number), 'Bot'))
+        self.assertEqual('H', self.table.columns[0].typecode)
+        self.assertEqual('299', self.table.get(301, 'PropertyName'))
+
+    def test_dump_and_load(self) -> None:
+        """A loaded table should have the same records."""
+        table_file = BytesIO()
+        self.table.dump(table_file)
+        table_file.seek(0)
+        loaded = PropertiesTable.load(table_file)
+        self.assertEqual(self.second, loaded[1])
+        record = loaded.append(self._get_properties('curl*', 'Firefox'))
+        self.assertEqual(2, record)
+        self.assertEqual(2, len(loaded.values[FIELDS.index('Browser')]))
+
+    def test_load_other_file(self) -> None:
+        """Should raise ValueError when loading another file type."""
+        table_file = BytesIO(b'something else entirely')
+        self.assertRaises(ValueError, PropertiesTable.load, table_file)
+
+    @staticmethod
+    def _get_properties(pattern: str, browser: str) -> Properties:
+        return get_properties(pattern, 'unknown', Browser=browser)
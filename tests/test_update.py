@@ -0,0 +1,97 @@
+"""Test updating trees and tables with a new release."""
+import random
+from typing import Dict, List
+from unittest import TestCase
+
+from browscapy import Classifier
+from browscapy.node import FullPattern, Tree
+from browscapy.update import Changes, update
+from tests import build_tree, get_attributes, get_properties
+
+
+class TestRemoveNode(TestCase):
+    """The tree should be the same as if the pattern was never added."""
+
+    PATTERNS = ('*', '*Obigo/Q05*', '*Obigo/Q03*', 'M', 'Mozilla/5.0*',
+                'Mozilla/5.0 (*Linux*', 'Mozilla/4.0*', 'Mo', 'One',
+                'One Two', 'Opera', 'a?cd*', 'a?ce*', 'curl/*')
+
+    def test_each_pattern(self) -> None:
+        """Removing any pattern should leave the tree of the others."""
+        for pattern in self.PATTERNS:
+            with self.subTest(pattern=pattern):
+                tree = self._build(list(self.PATTERNS))
+                node = tree.remove_node(pattern)
+                self.assertEqual(pattern, node.pattern)
+                others = [other for other in self.PATTERNS
+                          if other != pattern]
+                self.assertEqual(get_attributes(self._build(others).freeze()),
+                                 get_attributes(tree.freeze()))
+
+    def test_random(self) -> None:
+        """Removing random patterns should keep the canonical tree."""
+        rand = random.Random(42)
+        for _ in range(50):
+            patterns = list({''.join(rand.choice('ab*')
+                                     for _ in range(rand.randint(1, 6)))
+                             for _ in range(20)})
+            removed = set(rand.sample(patterns, len(patterns) // 2))
+            tree = self._build(patterns)
+            for pattern in removed:
+                tree.remove_node(pattern)
+            kept = [pattern for pattern in patterns if pattern not in removed]
+            with self.subTest(patterns=patterns, removed=removed):
+                self.assertEqual(get_attributes(self._build(kept).freeze()),
+                                 get_attributes(tree.freeze()))
+
+    def test_missing(self) -> None:
+        """Should raise KeyError for partial or missing patterns."""
+        tree = self._build(['One', 'Opera'])
+        for pattern in ('O', 'Two', 'One Two', ''):
+            with self.subTest(pattern=pattern):
+                self.assertRaises(KeyError, tree.remove_node, pattern)
+
+    def test_thaw(self) -> None:
+        """A thawed tree should freeze to the same arrays."""
+        frozen = self._build(list(self.PATTERNS)).freeze()
+        self.assertEqual(get_attributes(frozen),
+                         get_attributes(frozen.thaw().freeze()))
+
+    def _build(self, patterns: List[str]) -> Tree:
+        """Use the same record for a pattern in all trees."""
+        tree = Tree()
+        for pattern in patterns:
+            record = self.PATTERNS.index(pattern) \
+                if pattern in self.PATTERNS else len(pattern) + 100
+            tree.add_node(FullPattern.from_record(pattern, record))
+        return tree
+
+
+class TestUpdate(TestCase):
+    """Apply the differences of a new release."""
+
+    def test_update(self) -> None:
+        """Should add, remove and rewrite only the changed patterns."""
+        old = {'Mozilla/5.0*': 'Firefox', '*Chrome/*': 'Chrome',
+               'Opera*': 'Opera', '*': 'Default'}
+        tree, table = build_tree(get_properties(pattern, Browser=browser)
+                                 for pattern, browser in old.items())
+        records: Dict[str, int] = {pattern: record for pattern, record
+                                   in tree.freeze().patterns()}
+
+        new = {'Mozilla/5.0*': 'Firefox', '*Chrome/*': 'Chromium',
+               '*Edge/*': 'Edge', '*': 'Default'}
+        changes = update(tree, table, records,
+                         [get_properties(pattern, Browser=browser)
+                          for pattern, browser in new.items()])
+
+        self.assertEqual(Changes(added=1, removed=1, changed=1, unchanged=2),
+                         changes)
+        self.assertEqual(5, len(table))
+        classifier = Classifier(tree.freeze(), table)
+        for user_agent, pattern in (('X Chrome/62', '*Chrome/*'),
+                                    ('X Edge/16', '*Edge/*'),
+                                    ('Opera/9.80', '*')):
+            with self.subTest(user_agent=user_agent):
+                self.assertEqual(get_properties(pattern, Browser=new[pattern]),
+                                 classifier.lookup(user_agent))